@@ -0,0 +1,68 @@
+# Compares copying an experiment holding a large table for every specification with sharing the table
+# through get_shared_attributes, in the main process and in MultiprocessingRunner workers.
+# Run from the repository root: python -m benchmarks.copy_experiment_benchmark
+import time
+import tracemalloc
+import typing
+
+import numpy as np
+
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner.runner_methods import copy_experiment
+from smallab.runner_implementations.main_process_runner import MainRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.smallab_types import Specification
+from examples.example_utils import delete_experiments_folder
+
+
+class LargeTableExperiment(Experiment):
+    def __init__(self, rows):
+        self.table = np.random.RandomState(0).random_sample((rows, 1000))
+
+    def main(self, specification: Specification) -> typing.Dict:
+        return {"mean": float(self.table[specification["seed"]].mean())}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class SharedLargeTableExperiment(LargeTableExperiment):
+    def get_shared_attributes(self):
+        return ["table"]
+
+
+def time_copies(experiment, copies):
+    tracemalloc.start()
+    start = time.time()
+    for _ in range(copies):
+        copy_experiment(experiment)
+    elapsed = time.time() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return elapsed / copies, peak
+
+
+def time_batch(experiment, number_of_specifications, specification_runner):
+    runner = ExperimentRunner()
+    runner.attach_callbacks([])
+    start = time.time()
+    runner.run("copy_benchmark", [{"seed": i} for i in range(number_of_specifications)], experiment,
+               specification_runner=specification_runner, use_dashboard=False)
+    elapsed = time.time() - start
+    delete_experiments_folder("copy_benchmark")
+    return elapsed
+
+
+if __name__ == "__main__":
+    rows = 25000  # 200MB of float64
+    number_of_specifications = 20
+    for label, experiment in [("deepcopy", LargeTableExperiment(rows)),
+                              ("shared attributes", SharedLargeTableExperiment(rows))]:
+        seconds_per_copy, peak = time_copies(experiment, 5)
+        main_seconds = time_batch(experiment, number_of_specifications, MainRunner(show_progress=False))
+        multiprocessing_seconds = time_batch(experiment, number_of_specifications, MultiprocessingRunner(2))
+        print("{:>18}: {:8.4f}s per copy, {:8.1f}MB peak copy memory, {:6.2f}s for {} specifications in the main "
+              "process, {:6.2f}s on 2 workers".format(label, seconds_per_copy, peak / 1e6, main_seconds,
+                                                       number_of_specifications, multiprocessing_seconds))
@@ -0,0 +1,61 @@
+# Compares putting dashboard events straight onto a manager queue, one round trip to the manager per event, with
+# buffering them per process in a BufferedEventQueue. Run from the repository root:
+# python -m benchmarks.event_queue_benchmark
+import multiprocessing
+import time
+
+from smallab.dashboard.dashboard_events import ProgressEvent
+from smallab.dashboard.utils import BufferedEventQueue, put_in_event_queue, flush_event_queue, unpack_events
+
+
+def put_events(event_queue, number_of_events):
+    for i in range(number_of_events):
+        put_in_event_queue(event_queue, ProgressEvent("specification", i, number_of_events))
+    flush_event_queue(event_queue)
+
+
+def drain(queue, stop, totals):
+    received = 0
+    dropped = 0
+    while not stop.is_set() or not queue.empty():
+        while not queue.empty():
+            events, batch_dropped = unpack_events(queue.get())
+            received += len(events)
+            dropped += batch_dropped
+        time.sleep(0.01)
+    totals.put((received, dropped))
+
+
+def time_events(make_event_queue, number_of_processes, events_per_process):
+    ctx = multiprocessing.get_context("fork")
+    manager = ctx.Manager()
+    queue = manager.Queue(maxsize=2000)
+    event_queue = make_event_queue(queue)
+    stop = ctx.Event()
+    totals = ctx.SimpleQueue()
+    reader = ctx.Process(target=drain, args=(queue, stop, totals))
+    reader.start()
+    start = time.time()
+    processes = [ctx.Process(target=put_events, args=(event_queue, events_per_process))
+                 for _ in range(number_of_processes)]
+    for process in processes:
+        process.start()
+    for process in processes:
+        process.join()
+    elapsed = time.time() - start
+    stop.set()
+    received, dropped = totals.get()
+    reader.join()
+    manager.shutdown()
+    return number_of_processes * events_per_process / elapsed, received, dropped
+
+
+if __name__ == "__main__":
+    number_of_processes = 4
+    events_per_process = 20000
+    for label, make_event_queue in [("manager queue", lambda queue: queue),
+                                    ("buffered", lambda queue: BufferedEventQueue(queue))]:
+        events_per_second, received, dropped = time_events(make_event_queue, number_of_processes, events_per_process)
+        print("{:>14}: {:10.0f} events/s put, {} received, {} reported dropped, {} lost silently".format(
+            label, events_per_second, received, dropped,
+            number_of_processes * events_per_process - received - dropped))
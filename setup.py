@@ -14,7 +14,8 @@ required = [
     'humanhash3',
     'python-dateutil',
     'dill',
-    'scikit-learn'
+    'scikit-learn',
+    'threadpoolctl'
 ]
 
 setup(
@@ -31,6 +32,7 @@ setup(
     entry_points={
         'console_scripts': [
             'smdash=smallab.dashboard.dashboard:run_dash_from_command_line',
+            'smexport=smallab.dashboard.metrics_export:run_export_from_command_line',
     ],
     },
 )
@@ -0,0 +1,81 @@
+import collections
+import logging
+import typing
+
+
+def get_failure_signature(exception: BaseException) -> typing.AnyStr:
+    """
+    :return: A short description of a failure, used to group failures with the same cause
+    """
+    return "{}: {}".format(type(exception).__name__, exception)
+
+
+class CircuitBreaker(object):
+    """
+    Stops a batch early when its specifications are failing systematically, for example because of a bug.
+
+    The runner tells the breaker the outcome of every specification it runs. Once too many have failed the breaker
+    opens: the runner starts nothing new, lets what is running finish, and the most common failure is logged.
+    Specifications which were not started are neither completed nor failed, so they run on the next run call.
+
+    CircuitBreaker(max_failures=100, max_failure_rate=0.5, window=20)
+    """
+
+    def __init__(self, max_failures: int = None, max_failure_rate: float = None, window: int = 20):
+        """
+        :param max_failures: Open once more than this many specifications have failed
+        :param max_failure_rate: Open once more than this fraction of the first window specifications have failed
+        :param window: How many of the first specifications max_failure_rate looks at
+        """
+        self.max_failures = max_failures
+        self.max_failure_rate = max_failure_rate
+        self.window = window
+        self.reset()
+
+    def reset(self):
+        """
+        Called by ExperimentRunner.run at the start of each batch
+        """
+        self.completions = 0
+        self.failures = 0
+        self.window_failures = 0
+        self.failure_signatures = collections.Counter()
+        self.open = False
+
+    def record(self, exception_thrown: typing.Optional[BaseException]):
+        """
+        Called by the runner each time a specification finishes
+        :param exception_thrown: Why it failed, or None if it completed
+        """
+        self.completions += 1
+        if exception_thrown is not None:
+            self.failures += 1
+            if self.completions <= self.window:
+                self.window_failures += 1
+            self.failure_signatures[get_failure_signature(exception_thrown)] += 1
+        if not self.open and self._should_open():
+            self.open = True
+            signature, count = self.get_dominant_failure()
+            logging.getLogger("smallab.circuit_breaker").error(
+                "Stopping the batch after {} failures in {} specifications, the most common failure ({} times) is {}".format(
+                    self.failures, self.completions, count, signature))
+
+    def _should_open(self):
+        if self.max_failures is not None and self.failures > self.max_failures:
+            return True
+        # Checked as soon as the window can no longer stay under the rate, without waiting for it to fill
+        return self.max_failure_rate is not None and self.window_failures > self.max_failure_rate * self.window
+
+    def is_open(self) -> bool:
+        """
+        :return: True if the runner should not start any more specifications
+        """
+        return self.open
+
+    def get_dominant_failure(self) -> typing.Tuple[typing.Optional[typing.AnyStr], int]:
+        """
+        :return: The most common failure signature and how many specifications failed with it, or (None, 0)
+        """
+        if not self.failure_signatures:
+            return None, 0
+        return self.failure_signatures.most_common(1)[0]
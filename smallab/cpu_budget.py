@@ -0,0 +1,189 @@
+import logging
+import os
+import typing
+
+try:
+    from threadpoolctl import threadpool_limits
+except ImportError:
+    threadpool_limits = None
+
+THREAD_ENVIRONMENT_VARIABLES = ["OMP_NUM_THREADS", "MKL_NUM_THREADS", "OPENBLAS_NUM_THREADS"]
+
+# The budget of the worker process this module is loaded in, set by CpuBudget.initialize_worker
+_worker_budget = None
+
+
+class CpuBudget(object):
+    """
+    A machine wide budget of cores shared by all the worker processes of a runner.
+
+    Each worker gets an equal share of the cores and limits the thread pools of numpy/BLAS to that share, so
+    running num_parallel specifications that each use threads doesn't run num_parallel * cores threads.
+    A specification can ask for more cores with ExperimentBase.request_cores, which are granted from the cores
+    other workers are not using (for example once the batch is winding down and workers are idle).
+
+    Each worker records the cores it holds in a shared slot, so the cores of a worker which is killed or dies in the
+    middle of a specification are given back by release_worker, or by the worker which takes its slot.
+    """
+
+    def __init__(self, total_cores: int = None, pin_cpu_affinity: bool = False):
+        """
+        :param total_cores: The number of cores to share between workers. Defaults to every core on this computer
+        :param pin_cpu_affinity: If true, pin each worker to its own slice of cores (linux only)
+        """
+        self.total_cores = total_cores if total_cores is not None else os.cpu_count()
+        self.pin_cpu_affinity = pin_cpu_affinity
+        self.held = 0
+        self._limits = None
+
+    def bind(self, ctx, num_workers: int):
+        """
+        Called by the runner before it starts its workers to set up the shared counters
+        :param ctx: The multiprocessing context the workers will be started with
+        :param num_workers: The number of worker processes that share this budget
+        """
+        if threadpool_limits is None:
+            logging.getLogger("smallab.cpu_budget").warning(
+                "threadpoolctl is not installed, so workers can't limit the thread pools of libraries loaded before "
+                "they started (such as numpy imported by the main process) to their share of cores")
+        self.num_workers = num_workers
+        self.share = max(1, self.total_cores // num_workers)
+        self.free_cores = ctx.Value('i', self.total_cores)
+        # The pid of the worker in each slot and the cores it holds, guarded by the lock of free_cores
+        self.worker_pids = ctx.Array('i', num_workers, lock=False)
+        self.worker_held = ctx.Array('i', num_workers, lock=False)
+
+    def initialize_worker(self):
+        """
+        Called once in each worker process as it starts
+        """
+        global _worker_budget
+        # Only reaches libraries loaded after this, the ones already loaded are limited with threadpoolctl
+        for variable in THREAD_ENVIRONMENT_VARIABLES:
+            os.environ[variable] = str(self.share)
+        with self.free_cores.get_lock():
+            self.slot = self._claim_slot(os.getpid())
+        if self.pin_cpu_affinity and hasattr(os, "sched_setaffinity"):
+            available = sorted(os.sched_getaffinity(0))
+            self.all_cpus = available
+            self.worker_cpus = available[self.slot * self.share:(self.slot + 1) * self.share] or available
+            os.sched_setaffinity(0, self.worker_cpus)
+        self.held = 0
+        _worker_budget = self
+
+    def _claim_slot(self, pid) -> int:
+        # A worker replacing one which exited takes its slot, giving back what the exited worker still held
+        for slot in range(self.num_workers):
+            if self.worker_pids[slot] == 0 or not _process_exists(self.worker_pids[slot]):
+                self._release_slot(slot)
+                self.worker_pids[slot] = pid
+                return slot
+        raise Exception("More workers started than the budget was bound to")
+
+    def _release_slot(self, slot) -> int:
+        released = self.worker_held[slot]
+        self.free_cores.value += released
+        self.worker_held[slot] = 0
+        self.worker_pids[slot] = 0
+        return released
+
+    def release_worker(self, pid) -> int:
+        """
+        Called by the runner when it kills a worker, or a worker dies, to give back the cores the worker held
+        :return: The number of cores given back
+        """
+        with self.free_cores.get_lock():
+            for slot in range(self.num_workers):
+                if self.worker_pids[slot] == pid:
+                    return self._release_slot(slot)
+        return 0
+
+    def _take(self, number_of_cores: int) -> int:
+        with self.free_cores.get_lock():
+            granted = max(0, min(number_of_cores, self.free_cores.value))
+            self.free_cores.value -= granted
+            self.worker_held[self.slot] += granted
+        self.held += granted
+        return granted
+
+    def _limit_threads(self):
+        if threadpool_limits is not None:
+            if self._limits is not None:
+                self._limits.restore_original_limits()
+            self._limits = threadpool_limits(limits=max(1, self.held))
+
+    def begin_specification(self):
+        """
+        Take this worker's share of the cores before running a specification
+        """
+        self._take(self.share)
+        self._limit_threads()
+
+    def request(self, number_of_cores: int) -> int:
+        """
+        Try to grow the cores held by this worker to number_of_cores
+        :return: The number of cores this worker now holds
+        """
+        if number_of_cores > self.held:
+            granted = self._take(number_of_cores - self.held)
+            if granted > 0:
+                self._limit_threads()
+                if self.pin_cpu_affinity and hasattr(os, "sched_setaffinity"):
+                    os.sched_setaffinity(0, self.all_cpus)
+        return self.held
+
+    def end_specification(self):
+        """
+        Give every core held back to the budget after a specification finishes
+        """
+        with self.free_cores.get_lock():
+            self.free_cores.value += self.held
+            self.worker_held[self.slot] = 0
+        self.held = 0
+        if self._limits is not None:
+            self._limits.restore_original_limits()
+            self._limits = None
+        if self.pin_cpu_affinity and hasattr(os, "sched_setaffinity"):
+            os.sched_setaffinity(0, self.worker_cpus)
+
+
+def _process_exists(pid) -> bool:
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        pass
+    return True
+
+
+def request_cores(number_of_cores: int) -> int:
+    """
+    Ask the budget of the current worker for number_of_cores in total
+    :return: The number of cores which may be used. Without a budget every request is granted
+    """
+    if _worker_budget is None:
+        return number_of_cores
+    return _worker_budget.request(number_of_cores)
+
+
+def get_cores() -> int:
+    """
+    :return: The number of cores the current worker holds. Without a budget this is every core
+    """
+    if _worker_budget is None:
+        return os.cpu_count()
+    return _worker_budget.held
+
+
+def run_with_cpu_budget(run_and_save_fn: typing.Callable, specification):
+    """
+    Runs a specification while holding this worker's share of the budget
+    """
+    if _worker_budget is None:
+        return run_and_save_fn(specification)
+    _worker_budget.begin_specification()
+    try:
+        return run_and_save_fn(specification)
+    finally:
+        _worker_budget.end_specification()
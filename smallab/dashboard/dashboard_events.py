@@ -39,3 +39,18 @@ class RegistrationCompleteEvent():
 class FailedEvent():
     def __init__(self, specification_id):
         self.specification_id = specification_id
+
+
+class StopDashboardEvent():
+    def __init__(self):
+        pass
+
+
+class EventBatch():
+    def __init__(self, events, dropped=0):
+        """
+        :param events: The events one process put, in order
+        :param dropped: How many events that process dropped since its last batch because the queue was full
+        """
+        self.events = events
+        self.dropped = dropped
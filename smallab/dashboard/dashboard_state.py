@@ -0,0 +1,191 @@
+import time
+import typing
+
+import os
+
+from smallab.dashboard.event_log import (EventLogReader, line_to_record, START, REGISTER, REGISTRATION_COMPLETE,
+                                         BEGIN, COMPLETE, FAILED, PROGRESS, DROPPED)
+from smallab.dashboard.progress_table import ProgressTableReader
+from smallab.dashboard.time_estimator import load_specification_features
+from smallab.file_locations import get_dashboard_file, get_dashboard_event_log_file, get_dashboard_specifications_file
+
+
+class SimpleTimeEstimator():
+    def __init__(self):
+        self.total_number_of_iterations = 0
+        self.completed_iterations = 0
+        self.start_time = 0
+        self.specification_progress = dict()
+
+    def record_progress(self,specification,progress,maximum):
+        if specification not in self.specification_progress:
+            self.total_number_of_iterations += maximum
+            self.specification_progress[specification] = 0
+        previous_progress = self.specification_progress[specification]
+        self.completed_iterations += progress - previous_progress
+        self.specification_progress[specification] = progress
+
+    def compute_seconds_per_iteration(self):
+        current_time = time.time()
+        time_elapsed = current_time - self.start_time
+        if self.completed_iterations == 0:
+            seconds_per_iteration = float("inf")
+        else:
+            seconds_per_iteration = time_elapsed / self.completed_iterations
+
+        return seconds_per_iteration
+
+
+    def record_start_time(self,start_time):
+        self.start_time = start_time
+
+    def compute_expectation(self):
+        seconds_per_iteration = self.compute_seconds_per_iteration()
+
+        remaining_iterations = self.total_number_of_iterations - self.completed_iterations
+        return remaining_iterations * seconds_per_iteration
+
+
+class DashboardState(object):
+    """
+    What the dashboard shows about a batch, kept up to date from its event log (or, for runs written in the csv format,
+    its dashboard file).
+
+    update reads only what was written since the last update, and the state starts over when the file is replaced, by
+    a new run or by compaction. Specifications are kept in dictionaries in the order they entered each state, from
+    specification id to the time they entered it.
+
+    A time estimator given to it (see smallab.dashboard.time_estimator.TimeEstimator) is told when specifications
+    begin, progress and complete. It is kept when the state starts over, and it ignores what it was already told.
+    """
+
+    def __init__(self, name: typing.AnyStr, time_estimator=None):
+        """
+        :param name: The name of the batch
+        :param time_estimator: A TimeEstimator to keep up to date, or None
+        """
+        self.name = name
+        self.event_log_file = get_dashboard_event_log_file(name)
+        self.dashboard_file = get_dashboard_file(name)
+        self.specifications_file = get_dashboard_specifications_file(name)
+        self.specifications_modified = None
+        self.progress_table_reader = ProgressTableReader(name)
+        self.time_estimator = time_estimator
+        self.reset()
+
+    def reset(self):
+        self.file_id = None
+        self.offset = 0
+        self.event_log_reader = EventLogReader()
+        self.start_time = time.time()
+        self.registered = dict()
+        self.active = dict()
+        self.complete = dict()
+        self.failed = dict()
+        self.specification_progress = dict()
+        self.dropped = 0
+        self.progress_read_until = 0
+        self.registration_complete = False
+        self.timeestimator = SimpleTimeEstimator()
+
+    def exists(self) -> bool:
+        return os.path.exists(self.event_log_file) or os.path.exists(self.dashboard_file)
+
+    def update(self) -> int:
+        """
+        Read what was written since the last update
+        :return: The number of records read
+        """
+        if self.time_estimator is not None:
+            self._update_specifications()
+        is_event_log = os.path.exists(self.event_log_file)
+        try:
+            with open(self.event_log_file if is_event_log else self.dashboard_file, "rb") as f:
+                stat = os.fstat(f.fileno())
+                file_id = (stat.st_dev, stat.st_ino)
+                if file_id != self.file_id or stat.st_size < self.offset:
+                    self.reset()
+                    self.file_id = file_id
+                f.seek(self.offset)
+                written = f.read()
+        except FileNotFoundError:
+            return 0
+        if is_event_log:
+            records, end = self.event_log_reader.read(written)
+        else:
+            # The writer may be part way through a line
+            end = written.rfind(b"\n") + 1
+            records = [line_to_record(line) for line in written[:end].decode().splitlines()]
+        self.offset += end
+        for record in records:
+            if record is not None:
+                self.record(*record)
+        for specification_id, (progress, maximum, updated) in self.progress_table_reader.read(
+                self.progress_read_until).items():
+            self.record_progress(specification_id, progress, maximum, updated)
+            self.progress_read_until = max(self.progress_read_until, updated)
+        return len(records)
+
+    def _update_specifications(self):
+        try:
+            specifications_modified = os.stat(self.specifications_file).st_mtime_ns
+        except OSError:
+            return
+        if specifications_modified != self.specifications_modified:
+            self.specifications_modified = specifications_modified
+            self.time_estimator.update_specification_ids(load_specification_features(self.name))
+
+    def get_unfinished_progress(self) -> typing.Dict[typing.AnyStr, typing.Tuple[float, float]]:
+        """
+        :return: The (progress, maximum) of the specifications which are running or waiting
+        """
+        return {specification_id: progress for specification_id, progress in self.specification_progress.items()
+                if specification_id in self.active or specification_id in self.registered}
+
+    def record_progress(self, specification_id, progress, maximum, at: float = None):
+        """
+        :param at: When the progress was made, if known
+        """
+        self.specification_progress[specification_id] = (progress, maximum)
+        self.timeestimator.record_progress(specification_id, progress, maximum)
+        if self.time_estimator is not None:
+            self.time_estimator.record_iteration(specification_id, progress, at)
+
+    def record(self, kind: int, specification_id: typing.Optional[str], first: float, second: float):
+        """
+        Apply a record (see smallab.dashboard.event_log) to the state
+        """
+        if kind == BEGIN:
+            self.registered.pop(specification_id, None)
+            # Specifications which are retried begin again after failing
+            self.failed.pop(specification_id, None)
+            self.active[specification_id] = first or time.time()
+            if self.time_estimator is not None:
+                self.time_estimator.record_start(specification_id, self.active[specification_id])
+        elif kind == COMPLETE:
+            self.active.pop(specification_id, None)
+            self.complete[specification_id] = first or time.time()
+            if self.time_estimator is not None:
+                self.time_estimator.record_completion(specification_id, self.complete[specification_id])
+        elif kind == PROGRESS:
+            self.record_progress(specification_id, first, second)
+        elif kind == REGISTER:
+            self.registered[specification_id] = None
+        elif kind == FAILED:
+            self.active.pop(specification_id, None)
+            self.failed[specification_id] = first or time.time()
+        elif kind == DROPPED:
+            self.dropped += int(first)
+        elif kind == REGISTRATION_COMPLETE:
+            self.registration_complete = True
+        elif kind == START:
+            self.start_time = first
+            self.timeestimator.record_start_time(self.start_time)
+
+    def record_line(self, line: typing.AnyStr):
+        """
+        Apply a line of a csv dashboard file to the state
+        """
+        record = line_to_record(line)
+        if record is not None:
+            self.record(*record)
@@ -0,0 +1,156 @@
+import struct
+import typing
+
+from smallab.dashboard.dashboard_events import (BeginEvent, CompleteEvent, ProgressEvent, StartExperimentEvent,
+                                                RegisterEvent, RegistrationCompleteEvent, FailedEvent)
+
+# The kinds of record, shared by the binary event log and the csv dashboard file
+START = 1
+DEFINE = 2
+REGISTER = 3
+REGISTRATION_COMPLETE = 4
+BEGIN = 5
+COMPLETE = 6
+FAILED = 7
+PROGRESS = 8
+DROPPED = 9
+
+# Every record is (kind, specification index, two values). BEGIN, COMPLETE and FAILED records have the time they were
+# written as their first value, or 0 if it isn't known (csv dashboard files don't record it). A DEFINE record is followed by the utf-8 encoded
+# specification id, the number of bytes of which is its first value, and gives that id the index
+RECORD = struct.Struct("<BxxxIdd")
+MAGIC = b"SMALLAB-EVENTS-1\n"
+
+NO_SPECIFICATION = 2 ** 32 - 1
+
+
+def event_to_record(event, now: float = None) -> typing.Optional[typing.Tuple[int, typing.Optional[str], float, float]]:
+    """
+    :param now: The time to give a StartExperimentEvent, BeginEvent, CompleteEvent or FailedEvent
+    :return: The (kind, specification id, first value, second value) record of a dashboard event, or None for events which aren't recorded
+    """
+    if isinstance(event, BeginEvent):
+        return BEGIN, event.specification_id, now or 0.0, 0.0
+    elif isinstance(event, CompleteEvent):
+        return COMPLETE, event.specification_id, now or 0.0, 0.0
+    elif isinstance(event, ProgressEvent):
+        return PROGRESS, event.specification_id, float(event.progress), float(event.max)
+    elif isinstance(event, FailedEvent):
+        return FAILED, event.specification_id, now or 0.0, 0.0
+    elif isinstance(event, RegisterEvent):
+        return REGISTER, event.specification_id, 0.0, 0.0
+    elif isinstance(event, StartExperimentEvent):
+        return START, None, now, 0.0
+    elif isinstance(event, RegistrationCompleteEvent):
+        return REGISTRATION_COMPLETE, None, 0.0, 0.0
+    return None
+
+
+def line_to_record(line: typing.AnyStr) -> typing.Optional[typing.Tuple[int, typing.Optional[str], float, float]]:
+    """
+    :return: The record of a line of a csv dashboard file, or None if it isn't understood
+    """
+    split = line.split(",")
+    key = split[0]
+    if key == "BEGIN":
+        return BEGIN, split[1], 0.0, 0.0
+    elif key == "COMPLETE":
+        return COMPLETE, split[1], 0.0, 0.0
+    elif key == "PROGRESS":
+        return PROGRESS, split[1], float(split[2]), float(split[3])
+    elif key == "REGISTER":
+        return REGISTER, split[1], 0.0, 0.0
+    elif key == "FAILED":
+        return FAILED, split[1], 0.0, 0.0
+    elif key == "DROPPED":
+        return DROPPED, None, float(split[1]), 0.0
+    elif key in ("REGISTRATION_COMPLETE", "REGISRTATION_COMPLETE"):
+        return REGISTRATION_COMPLETE, None, 0.0, 0.0
+    elif key == "START":
+        return START, None, float(split[-1]), 0.0
+    return None
+
+
+class EventLogWriter(object):
+    """
+    Writes records to a binary event log, giving each specification id an index the first time it is written
+    """
+
+    def __init__(self, f):
+        """
+        :param f: An empty file opened for writing bytes
+        """
+        self.f = f
+        self.indexes = dict()
+        f.write(MAGIC)
+
+    def write(self, kind: int, specification_id: typing.Optional[str] = None, first: float = 0.0,
+              second: float = 0.0):
+        if specification_id is None:
+            index = NO_SPECIFICATION
+        else:
+            index = self.indexes.get(specification_id)
+            if index is None:
+                index = len(self.indexes)
+                self.indexes[specification_id] = index
+                encoded = specification_id.encode()
+                self.f.write(RECORD.pack(DEFINE, index, len(encoded), 0.0) + encoded)
+        self.f.write(RECORD.pack(kind, index, first, second))
+
+    def write_state(self, state) -> int:
+        """
+        Write records which bring an empty DashboardState to the same state as state
+        :return: The number of records written
+        """
+        records = [(START, None, state.start_time, 0.0)]
+        records.extend((REGISTER, specification_id, 0.0, 0.0) for specification_id in state.registered)
+        if state.registration_complete:
+            records.append((REGISTRATION_COMPLETE, None, 0.0, 0.0))
+        records.extend((BEGIN, specification_id, at, 0.0) for specification_id, at in state.active.items())
+        records.extend((COMPLETE, specification_id, at, 0.0) for specification_id, at in state.complete.items())
+        records.extend((FAILED, specification_id, at, 0.0) for specification_id, at in state.failed.items())
+        records.extend((PROGRESS, specification_id, float(progress), float(maximum))
+                       for specification_id, (progress, maximum) in state.specification_progress.items())
+        if state.dropped:
+            records.append((DROPPED, None, float(state.dropped), 0.0))
+        for record in records:
+            self.write(*record)
+        return len(records)
+
+
+class EventLogReader(object):
+    """
+    Reads the records of a binary event log as it is written
+    """
+
+    def __init__(self):
+        self.specification_ids = []
+        self.read_magic = False
+
+    def read(self, data: bytes) -> typing.Tuple[typing.List[typing.Tuple[int, typing.Optional[str], float, float]], int]:
+        """
+        :param data: Bytes of the event log following those already read
+        :return: The records in data, and how many bytes they took up. A record cut off at the end of data is left for the next read
+        """
+        offset = 0
+        if not self.read_magic:
+            if len(data) < len(MAGIC):
+                return [], 0
+            if data[:len(MAGIC)] != MAGIC:
+                raise ValueError("Not a smallab event log")
+            self.read_magic = True
+            offset = len(MAGIC)
+        records = []
+        while offset + RECORD.size <= len(data):
+            kind, index, first, second = RECORD.unpack_from(data, offset)
+            if kind == DEFINE:
+                end = offset + RECORD.size + int(first)
+                if end > len(data):
+                    break
+                self.specification_ids.append(data[offset + RECORD.size:end].decode())
+                offset = end
+                continue
+            offset += RECORD.size
+            specification_id = None if index == NO_SPECIFICATION else self.specification_ids[index]
+            records.append((kind, specification_id, first, second))
+        return records, offset
@@ -0,0 +1,230 @@
+import argparse
+import json
+import logging
+import math
+import threading
+import time
+import typing
+from http.server import ThreadingHTTPServer, BaseHTTPRequestHandler
+
+import os
+
+from smallab.dashboard.dashboard_state import DashboardState
+from smallab.dashboard.throughput import ThroughputRecorder
+from smallab.dashboard.time_estimator import TimeEstimator
+from smallab.file_locations import get_status_file
+
+
+def collect_status(state: DashboardState, time_estimator: TimeEstimator, throughput_recorder: ThroughputRecorder,
+                   now: float = None) -> typing.Dict:
+    """
+    :return: What the dashboard would show about a batch, as a dictionary which can be written as json
+    """
+    now = time.time() if now is None else now
+    expected, lower, upper = time_estimator.compute_time_stats(state.get_unfinished_progress(), state.active,
+                                                               state.registered)
+    stragglers = time_estimator.find_stragglers(state.active, now)
+    specifications = dict()
+    for status, specification_ids in (("running", state.active), ("waiting", state.registered),
+                                      ("failed", state.failed)):
+        for specification_id in specification_ids:
+            specification = {"status": status}
+            if specification_id in state.specification_progress:
+                specification["progress"], specification["maximum"] = state.specification_progress[specification_id]
+            specifications[specification_id] = specification
+    return {
+        "name": state.name,
+        "time": now,
+        "run_start_time": state.start_time,
+        "registration_complete": state.registration_complete,
+        "counts": {"registered": len(state.registered), "running": len(state.active),
+                   "complete": len(state.complete), "failed": len(state.failed)},
+        "dropped_events": state.dropped,
+        "iterations": {"completed": state.timeestimator.completed_iterations,
+                       "total": state.timeestimator.total_number_of_iterations},
+        "eta_seconds": {"expected": expected, "lower_quartile": lower, "upper_quartile": upper},
+        "throughput": throughput_recorder.latest,
+        # json has no infinity, stalled specifications have no number of standard deviations
+        "stragglers": {specification_id: {"reason": reason,
+                                          "deviations": deviations if math.isfinite(deviations) else None}
+                       for specification_id, (reason, deviations) in stragglers.items()},
+        "specifications": specifications,
+    }
+
+
+def _escape_label(value) -> str:
+    return str(value).replace("\\", "\\\\").replace("\"", "\\\"").replace("\n", "\\n")
+
+
+def format_prometheus(status: typing.Dict) -> str:
+    """
+    Format a status from collect_status in the Prometheus text format. To keep the number of series down, progress is
+    only given for running specifications.
+    """
+    batch = "batch=\"{}\"".format(_escape_label(status["name"]))
+    lines = []
+
+    def metric(name, metric_type, description, samples):
+        lines.append("# HELP {} {}".format(name, description))
+        lines.append("# TYPE {} {}".format(name, metric_type))
+        for labels, value in samples:
+            lines.append("{}{{{}}} {}".format(name, ",".join([batch] + labels), repr(float(value))))
+
+    metric("smallab_specifications", "gauge", "Number of specifications in each state",
+           [(["state=\"{}\"".format(state)], count) for state, count in status["counts"].items()])
+    metric("smallab_registration_complete", "gauge", "1 once every specification of the run is registered",
+           [([], status["registration_complete"])])
+    metric("smallab_dropped_events_total", "counter", "Dashboard events dropped because the event queue was full",
+           [([], status["dropped_events"])])
+    metric("smallab_iterations_completed", "gauge", "Iterations completed by the run",
+           [([], status["iterations"]["completed"])])
+    metric("smallab_iterations", "gauge", "Iterations the run's specifications report they will do",
+           [([], status["iterations"]["total"])])
+    metric("smallab_eta_seconds", "gauge", "Estimated seconds until the run finishes",
+           [(["estimate=\"{}\"".format(estimate)], seconds) for estimate, seconds in status["eta_seconds"].items()])
+    throughput = status["throughput"]
+    if throughput is not None:
+        metric("smallab_specifications_per_hour", "gauge", "Specifications completed per hour",
+               [([], throughput["specifications_per_hour"])])
+        metric("smallab_iterations_per_second", "gauge", "Iterations completed per second",
+               [([], throughput["iterations_per_second"])])
+        metric("smallab_worker_utilization", "gauge", "Fraction of workers running a specification",
+               [([], throughput["utilization"])])
+    metric("smallab_stragglers", "gauge", "Running specifications which are stalled or much slower than their peers",
+           [(["reason=\"{}\"".format(reason)],
+             sum(1 for straggler in status["stragglers"].values() if straggler["reason"] == reason))
+            for reason in ("slow", "stalled")])
+    metric("smallab_specification_progress", "gauge", "Fraction of its iterations a running specification has done",
+           [(["specification=\"{}\"".format(_escape_label(specification_id))],
+             specification["progress"] / specification["maximum"] if specification["maximum"] else 0.0)
+            for specification_id, specification in status["specifications"].items()
+            if specification["status"] == "running" and "progress" in specification])
+    return "\n".join(lines) + "\n"
+
+
+def write_status_file(location: typing.AnyStr, status: typing.Dict):
+    """
+    Replace the status file in one step, so readers never see it half written
+    """
+    os.makedirs(os.path.dirname(location), exist_ok=True)
+    temporary_location = "{}.saving-{}".format(location, os.getpid())
+    with open(temporary_location, "w") as f:
+        json.dump(status, f)
+    os.replace(temporary_location, location)
+
+
+class MetricsExporter(object):
+    """
+    Keeps what the dashboard would show about a batch up to date without a terminal, for monitoring headless machines.
+
+    Every refresh_interval seconds it reads the batch's new events, rewrites a json status file and formats the
+    status for Prometheus. If a port is given it serves the latest Prometheus text at /metrics and the latest status
+    at /status.json, so scraping it costs no more than sending what was formatted at the last refresh.
+    """
+
+    def __init__(self, name: typing.AnyStr, refresh_interval: float = 5.0, status_file: typing.AnyStr = None,
+                 port: int = None, host: str = "127.0.0.1", save_interval: float = 60.0):
+        """
+        :param name: The name of the batch
+        :param refresh_interval: The seconds between refreshes
+        :param status_file: Where to write the status, defaults to .status.json in the batch's save directory
+        :param port: The port to serve metrics on, 0 for any free port, or None to not serve them
+        :param host: The address to serve metrics on
+        :param save_interval: How often, in seconds, to save the time estimator's history for later runs
+        """
+        self.name = name
+        self.refresh_interval = refresh_interval
+        self.status_file = status_file if status_file is not None else get_status_file(name)
+        self.save_interval = save_interval
+        self.time_estimator = TimeEstimator(name)
+        self.state = DashboardState(name, self.time_estimator)
+        self.throughput_recorder = ThroughputRecorder(name)
+        self.metrics = b""
+        self.status = b"{}"
+        self.last_save = time.time()
+        self.server = None
+        if port is not None:
+            self.server = ThreadingHTTPServer((host, port), self._make_handler())
+            self.server.daemon_threads = True
+            threading.Thread(target=self.server.serve_forever, daemon=True).start()
+
+    def get_address(self) -> typing.Optional[typing.Tuple[str, int]]:
+        """
+        :return: The address metrics are served on, or None if they aren't
+        """
+        return None if self.server is None else self.server.server_address[:2]
+
+    def _make_handler(self):
+        exporter = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = self.path.split("?")[0]
+                if path in ("/", "/metrics"):
+                    body, content_type = exporter.metrics, "text/plain; version=0.0.4; charset=utf-8"
+                elif path == "/status.json":
+                    body, content_type = exporter.status, "application/json"
+                else:
+                    self.send_error(404)
+                    return
+                self.send_response(200)
+                self.send_header("Content-Type", content_type)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    def refresh(self) -> typing.Optional[typing.Dict]:
+        """
+        Read the batch's new events and update the status file and metrics
+        :return: The status, or None if the batch has no dashboard file yet
+        """
+        self.state.update()
+        if not self.state.exists():
+            return None
+        self.throughput_recorder.sample(self.state)
+        status = collect_status(self.state, self.time_estimator, self.throughput_recorder)
+        write_status_file(self.status_file, status)
+        self.status = json.dumps(status).encode()
+        self.metrics = format_prometheus(status).encode()
+        if time.time() - self.last_save >= self.save_interval:
+            self.last_save = time.time()
+            self.time_estimator.save()
+        return status
+
+    def run(self):
+        """
+        Refresh every refresh_interval seconds until interrupted
+        """
+        try:
+            while True:
+                try:
+                    self.refresh()
+                except Exception as e:
+                    logging.getLogger("smallab.dashboard").error("Metrics Export Error {}".format(e), exc_info=True)
+                time.sleep(self.refresh_interval)
+        except KeyboardInterrupt:
+            pass
+        finally:
+            self.close()
+
+    def close(self):
+        self.time_estimator.save()
+        if self.server is not None:
+            self.server.shutdown()
+            self.server.server_close()
+
+
+def run_export_from_command_line():
+    parser = argparse.ArgumentParser(description="Export the dashboard of a smallab batch for monitoring")
+    parser.add_argument("name", help="The name of the batch")
+    parser.add_argument("--port", type=int, default=None, help="Serve Prometheus metrics on this port")
+    parser.add_argument("--host", default="127.0.0.1", help="The address to serve metrics on")
+    parser.add_argument("--status-file", default=None, help="Where to write the json status file")
+    parser.add_argument("--interval", type=float, default=5.0, help="Seconds between refreshes")
+    args = parser.parse_args()
+    MetricsExporter(args.name, args.interval, args.status_file, args.port, args.host).run()
@@ -0,0 +1,132 @@
+import json
+import time
+import typing
+import uuid
+
+import numpy as np
+import os
+
+from smallab.file_locations import get_progress_table_file, get_progress_table_ids_file
+
+PROGRESS = 0
+MAXIMUM = 1
+UPDATED = 2
+
+# Tables mapped in this process, by location, so each process maps a table once per run
+_opened = dict()
+
+
+class ProgressTable(object):
+    """
+    The progress of every registered specification of a batch, in a memory mapped file next to the dashboard file
+    which the workers and the dashboard map. Each specification has a row of (progress, maximum, time of the last
+    update), in registration order, which only the worker running it writes to. Publishing progress is a write to
+    memory instead of an event, and the dashboard reads the rows when it refreshes.
+
+    Only the location is pickled, each process maps the table the first time it publishes to it.
+    """
+
+    def __init__(self, location: typing.AnyStr, ids_location: typing.AnyStr, token: typing.AnyStr):
+        self.location = location
+        self.ids_location = ids_location
+        self.token = token
+
+    @staticmethod
+    def create(name: typing.AnyStr, specification_ids: typing.List[typing.AnyStr]):
+        """
+        Called by ExperimentRunner.run once the specifications to run are known
+        :param name: The name of the batch
+        :param specification_ids: The ids of the specifications to run, in the order they are registered
+        """
+        location = get_progress_table_file(name)
+        ids_location = get_progress_table_ids_file(name)
+        token = uuid.uuid4().hex
+        os.makedirs(os.path.dirname(location), exist_ok=True)
+        temporary_location = "{}.saving-{}.npy".format(location, token)
+        table = np.lib.format.open_memmap(temporary_location, mode="w+", dtype=np.float64,
+                                          shape=(len(specification_ids), 3))
+        table.flush()
+        del table
+        temporary_ids_location = "{}.saving-{}".format(ids_location, token)
+        with open(temporary_ids_location, "w") as f:
+            json.dump({"token": token, "specification_ids": list(specification_ids)}, f)
+        os.replace(temporary_location, location)
+        os.replace(temporary_ids_location, ids_location)
+        return ProgressTable(location, ids_location, token)
+
+    def _open(self):
+        """
+        :return: The token, rows by specification id and the mapped table, or None if a later run replaced the table
+        """
+        opened = _opened.get(self.location)
+        if opened is None or opened[0] != self.token:
+            with open(self.ids_location) as f:
+                ids = json.load(f)
+            if ids["token"] != self.token:
+                return None
+            rows = {specification_id: row for row, specification_id in enumerate(ids["specification_ids"])}
+            opened = (self.token, rows, np.load(self.location, mmap_mode="r+"))
+            _opened[self.location] = opened
+        return opened
+
+    def publish(self, specification_id: typing.AnyStr, progress, maximum) -> bool:
+        """
+        Write the progress of a specification to its row
+        :return: False if the specification has no row, because it wasn't registered
+        """
+        try:
+            opened = self._open()
+        except (OSError, ValueError):
+            return False
+        if opened is None:
+            return False
+        _, rows, table = opened
+        row = rows.get(specification_id)
+        if row is None:
+            return False
+        table[row, PROGRESS] = progress
+        table[row, MAXIMUM] = maximum
+        # Written last so a row with a time has its progress
+        table[row, UPDATED] = time.time()
+        return True
+
+    def close(self):
+        """
+        Unmap the table in this process
+        """
+        opened = _opened.get(self.location)
+        if opened is not None and opened[0] == self.token:
+            del _opened[self.location]
+
+
+class ProgressTableReader(object):
+    """
+    Reads a batch's ProgressTable for the dashboard, mapping it again only when a new run replaces it
+    """
+
+    def __init__(self, name: typing.AnyStr):
+        self.location = get_progress_table_file(name)
+        self.ids_location = get_progress_table_ids_file(name)
+        self.ids_modified = None
+        self.specification_ids = []
+        self.table = None
+
+    def read(self, since: float = 0) -> typing.Dict[typing.AnyStr, typing.Tuple[float, float, float]]:
+        """
+        :param since: Only read the specifications whose progress was published after this time
+        :return: The (progress, maximum, time of the last update) of every specification whose progress was published
+        """
+        try:
+            ids_modified = os.stat(self.ids_location).st_mtime_ns
+            if ids_modified != self.ids_modified:
+                with open(self.ids_location) as f:
+                    self.specification_ids = json.load(f)["specification_ids"]
+                self.table = np.load(self.location, mmap_mode="r")
+                self.ids_modified = ids_modified
+        except (OSError, ValueError, KeyError):
+            return dict()
+        if self.table is None or len(self.table) != len(self.specification_ids):
+            return dict()
+        updated = np.flatnonzero(self.table[:, UPDATED] > since)
+        rows = np.array(self.table[updated])
+        return {self.specification_ids[row]: tuple(values) for row, values in zip(updated, rows)}
@@ -0,0 +1,81 @@
+import csv
+import time
+import typing
+
+import os
+
+from smallab.file_locations import get_throughput_file
+
+FIELDS = ["time", "run_start_time", "specifications_per_hour", "iterations_per_second", "active", "utilization"]
+
+
+class ThroughputRecorder(object):
+    """
+    Samples the throughput of a batch from its DashboardState every interval seconds, and appends the samples to a csv
+    file next to the dashboard file. The file is kept across runs, the run_start_time column tells them apart, so it
+    can be used to plan how much capacity a batch needs.
+
+    Utilization is the number of running specifications over the number of workers, which unless parallelism is given
+    is taken to be the most specifications seen running at once in the run.
+    """
+
+    def __init__(self, name: typing.AnyStr, interval: float = 60.0, parallelism: int = None):
+        """
+        :param name: The name of the batch
+        :param interval: The seconds between samples
+        :param parallelism: The number of workers, if known
+        """
+        self.location = get_throughput_file(name)
+        self.interval = interval
+        self.parallelism = parallelism
+        # (time, completed specifications, completed iterations, run start time) at the last sample
+        self.last_sample = None
+        self.max_active = 0
+        self.latest = None
+
+    def sample(self, state, now: float = None) -> typing.Optional[typing.Dict]:
+        """
+        :param state: The DashboardState of the batch, after an update
+        :return: The sample appended to the file, or None if one wasn't due
+        """
+        now = time.time() if now is None else now
+        completed = len(state.complete)
+        iterations = state.timeestimator.completed_iterations
+        if (self.last_sample is None or self.last_sample[3] != state.start_time or completed < self.last_sample[1]
+                or iterations < self.last_sample[2]):
+            # The first sample of a run is where the next one is measured from
+            self.max_active = len(state.active)
+            self.last_sample = (now, completed, iterations, state.start_time)
+            return None
+        self.max_active = max(self.max_active, len(state.active))
+        elapsed = now - self.last_sample[0]
+        if elapsed < self.interval:
+            return None
+        workers = self.parallelism if self.parallelism is not None else self.max_active
+        row = {"time": now,
+               "run_start_time": state.start_time,
+               "specifications_per_hour": (completed - self.last_sample[1]) * 3600 / elapsed,
+               "iterations_per_second": (iterations - self.last_sample[2]) / elapsed,
+               "active": len(state.active),
+               "utilization": len(state.active) / workers if workers else 0.0}
+        write_header = not os.path.exists(self.location)
+        os.makedirs(os.path.dirname(self.location), exist_ok=True)
+        with open(self.location, "a", newline="") as f:
+            writer = csv.DictWriter(f, FIELDS)
+            if write_header:
+                writer.writeheader()
+            writer.writerow(row)
+        self.last_sample = (now, completed, iterations, state.start_time)
+        self.latest = row
+        return row
+
+
+def load_throughput(name: typing.AnyStr) -> typing.List[typing.Dict[str, float]]:
+    """
+    :return: The samples written by ThroughputRecorder for a batch, oldest first
+    """
+    try:
+        with open(get_throughput_file(name), newline="") as f:
+            return [{key: float(value) for key, value in row.items()} for row in csv.DictReader(f)]
+    except FileNotFoundError:
+        return []
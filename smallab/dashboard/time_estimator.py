@@ -0,0 +1,479 @@
+import collections
+import itertools
+import json
+import math
+import time
+import typing
+
+import numpy as np
+import os
+
+from smallab.file_locations import get_time_estimator_history_file, get_dashboard_specifications_file
+
+# Multiple of the standard deviation from the mean to the lower and upper quartile of a normal distribution
+QUARTILE_Z = 0.6744897501960817
+
+
+def specification_features(specification: typing.Dict) -> typing.Dict[str, str]:
+    """
+    :return: The values of a specification as strings, which is all the cost models look at
+    """
+    return {str(key): str(value) for key, value in specification.items()}
+
+
+def save_specification_features(name: typing.AnyStr, specification_ids: typing.List[typing.AnyStr],
+                                specifications: typing.List[typing.Dict]):
+    """
+    Called by ExperimentRunner.run so the dashboard knows the values of the specifications it estimates times for
+    """
+    location = get_dashboard_specifications_file(name)
+    os.makedirs(os.path.dirname(location), exist_ok=True)
+    temporary_location = "{}.saving-{}".format(location, os.getpid())
+    with open(temporary_location, "w") as f:
+        json.dump({specification_id: specification_features(specification)
+                   for specification_id, specification in zip(specification_ids, specifications)}, f)
+    os.replace(temporary_location, location)
+
+
+def load_specification_features(name: typing.AnyStr) -> typing.Dict[typing.AnyStr, typing.Dict[str, str]]:
+    try:
+        with open(get_dashboard_specifications_file(name)) as f:
+            return json.load(f)
+    except (OSError, ValueError):
+        return dict()
+
+
+class CostModel(object):
+    """
+    A ridge regression of log seconds on the one hot encoded values of specifications, with an unpenalized intercept.
+
+    It keeps the weighted sufficient statistics (X^T W X, X^T W y, y^T W y) instead of the observations, so adding an
+    observation costs the same however many there have been and fitting is a solve the size of the number of values.
+    A key with more than max_values_per_key values (a seed, say) is taken as noise and dropped from the model.
+    """
+
+    def __init__(self, max_values_per_key: int = 20, ridge: float = 1.0):
+        self.max_values_per_key = max_values_per_key
+        self.ridge = ridge
+        # (key, value) -> column, column 0 is the intercept
+        self.columns = dict()
+        self.values_per_key = dict()
+        self.ignored_keys = set()
+        self.xtx = np.zeros((1, 1))
+        self.xty = np.zeros(1)
+        self.yty = 0.0
+        self.total_weight = 0.0
+        self.observations = 0
+        self.coefficients = None
+        self.sigma = 0.0
+        # Changes whenever columns does, so encodings made with older columns are made again
+        self.columns_version = 0
+
+    def _get_columns(self, features: typing.Dict[str, str], add: bool) -> typing.List[int]:
+        columns = [0]
+        for key, value in features.items():
+            if key in self.ignored_keys:
+                continue
+            column = self.columns.get((key, value))
+            if column is None:
+                if not add:
+                    continue
+                values = self.values_per_key.setdefault(key, set())
+                values.add(value)
+                if len(values) > self.max_values_per_key:
+                    self._ignore_key(key)
+                    # Dropping the key renumbered the columns collected so far
+                    return self._get_columns(features, add)
+                column = len(self.xty)
+                self.columns[(key, value)] = column
+                self.columns_version += 1
+                # Earlier observations didn't have this value, so their statistics for it are zero
+                self.xtx = np.pad(self.xtx, ((0, 1), (0, 1)))
+                self.xty = np.pad(self.xty, (0, 1))
+            columns.append(column)
+        return columns
+
+    def _ignore_key(self, key):
+        # Dropping a feature's rows and columns from the statistics leaves exactly the statistics without it
+        self.ignored_keys.add(key)
+        del self.values_per_key[key]
+        kept_features = sorted((column, feature) for feature, column in self.columns.items() if feature[0] != key)
+        kept_columns = [0] + [column for column, _ in kept_features]
+        self.xtx = self.xtx[np.ix_(kept_columns, kept_columns)]
+        self.xty = self.xty[kept_columns]
+        self.columns = {feature: i + 1 for i, (_, feature) in enumerate(kept_features)}
+        self.columns_version += 1
+        self.coefficients = None
+
+    def add(self, features: typing.Dict[str, str], seconds: float, weight: float = 1.0):
+        """
+        :param seconds: How long it took, observations which took no time are ignored
+        :param weight: How much the observation counts, such as the number of iterations it covers
+        """
+        if seconds <= 0 or weight <= 0:
+            return
+        y = math.log(seconds)
+        columns = self._get_columns(features, add=True)
+        self.xtx[np.ix_(columns, columns)] += weight
+        self.xty[columns] += weight * y
+        self.yty += weight * y * y
+        self.total_weight += weight
+        self.observations += 1
+
+    def fit(self):
+        if self.observations == 0:
+            self.coefficients = None
+            return
+        penalty = np.eye(len(self.xty)) * self.ridge
+        penalty[0, 0] = 0
+        self.coefficients = np.linalg.solve(self.xtx + penalty, self.xty)
+        if self.observations > 1:
+            squared_error = self.yty - 2 * self.coefficients @ self.xty + self.coefficients @ self.xtx @ self.coefficients
+            self.sigma = math.sqrt(max(squared_error, 0.0) / self.total_weight)
+        else:
+            self.sigma = 0.0
+
+    def predict_log(self, features: typing.Dict[str, str]) -> typing.Optional[typing.Tuple[float, float]]:
+        """
+        :return: The mean and standard deviation of the log seconds it will take, or None if the model hasn't been fit
+        """
+        if self.coefficients is None:
+            return None
+        columns = [column for column in self._get_columns(features, add=False) if column < len(self.coefficients)]
+        return float(self.coefficients[columns].sum()), self.sigma
+
+    def predict(self, features: typing.Dict[str, str]) -> typing.Optional[typing.Tuple[float, float]]:
+        """
+        :return: The mean and standard deviation of the seconds it will take, or None if the model hasn't been fit
+        """
+        prediction = self.predict_log(features)
+        if prediction is None:
+            return None
+        log_seconds, sigma = prediction
+        mean = math.exp(log_seconds + sigma ** 2 / 2)
+        return mean, mean * math.sqrt(math.exp(sigma ** 2) - 1)
+
+    def encode(self, features_list: typing.List[typing.Dict[str, str]]) -> typing.Tuple[np.ndarray, np.ndarray]:
+        """
+        One hot encode many specifications at once, to predict them all with predict_many
+        :return: The row and column of every one in the sparse design matrix, one row per specification
+        """
+        rows = []
+        columns = []
+        for row, features in enumerate(features_list):
+            row_columns = self._get_columns(features, add=False)
+            rows.extend([row] * len(row_columns))
+            columns.extend(row_columns)
+        return np.array(rows, dtype=np.intp), np.array(columns, dtype=np.intp)
+
+    def predict_many(self, design: typing.Tuple[np.ndarray, np.ndarray], num_rows: int) -> typing.Optional[
+            typing.Tuple[np.ndarray, np.ndarray]]:
+        """
+        :param design: What encode returned, made with the current columns
+        :param num_rows: How many specifications were encoded
+        :return: The means and standard deviations of the seconds each will take, or None if the model hasn't been fit
+        """
+        if self.coefficients is None:
+            return None
+        rows, columns = design
+        # Columns added since the fit have no coefficient yet, like in predict_log
+        coefficients = np.zeros(len(self.xty))
+        coefficients[:len(self.coefficients)] = self.coefficients
+        log_seconds = np.bincount(rows, weights=coefficients[columns], minlength=num_rows)
+        means = np.exp(log_seconds + self.sigma ** 2 / 2)
+        return means, means * math.sqrt(math.exp(self.sigma ** 2) - 1)
+
+
+class TimeEstimator(object):
+    """
+    Estimates how long the rest of a batch will take from how long iterations and specifications took, with a cost
+    model for each which learns how the values of a specification change its cost (see CostModel).
+
+    Observations are kept in a history next to the batch's results and loaded again by the next run, so estimates are
+    available before anything finishes. The models are refit at most every refit_interval seconds.
+
+    The expected, lower quartile and upper quartile times left are the time for the remaining work spread over the
+    workers, or for the longest remaining specification if that is longer.
+    """
+
+    def __init__(self, experiment_name: typing.AnyStr = None, parallelism: int = None, refit_interval: float = 10.0,
+                 max_history: int = 10000):
+        """
+        :param experiment_name: The batch whose history to load and save. Without one nothing is saved
+        :param parallelism: How many specifications run at once. Defaults to the number running now
+        :param refit_interval: The most often, in seconds, to refit the models and recompute the estimate
+        :param max_history: The most specifications to keep in the history
+        """
+        self.parallelism = parallelism
+        self.refit_interval = refit_interval
+        self.max_history = max_history
+        self.iteration_model = CostModel()
+        self.completion_model = CostModel()
+        self.start_time = dict()
+        self.last_update_time = dict()
+        self.last_progress = dict()
+        self.completed = set()
+        self.specification_ids_to_specification = dict()
+        # specification id -> what is saved about it
+        self.history = collections.OrderedDict()
+        self.last_fit = None
+        # Counts the fits, so the estimate is made again after any fit, including one made by find_stragglers
+        self.fits = 0
+        self.last_estimate = None
+        self.last_estimate_time = None
+        self.last_estimate_fit = None
+        # Registered specification id -> its row in the design matrices, the last row is for unregistered ones
+        self.specification_rows = dict()
+        self.features_list = [dict()]
+        # model -> (columns version, design matrix) of the registered specifications
+        self.designs = dict()
+        self.history_file = None if experiment_name is None else get_time_estimator_history_file(experiment_name)
+        self.load()
+
+    def update_possible_values(self, specification: typing.Dict):
+        """
+        Kept for compatibility, the models learn the values of specifications as they see them
+        """
+        pass
+
+    def fit_encoders(self):
+        """
+        Kept for compatibility, the models learn the values of specifications as they see them
+        """
+        pass
+
+    def update_specification_ids(self, specification_ids_to_specifications):
+        self.specification_ids_to_specification = specification_ids_to_specifications
+        self.specification_rows = {specification_id: row
+                                   for row, specification_id in enumerate(specification_ids_to_specifications)}
+        self.features_list = [specification_features(specification)
+                              for specification in specification_ids_to_specifications.values()] + [dict()]
+        self.designs = {model: (model.columns_version, model.encode(self.features_list))
+                        for model in (self.iteration_model, self.completion_model)}
+
+    def _predict_registered(self, model: CostModel) -> typing.Optional[typing.Tuple[np.ndarray, np.ndarray]]:
+        """
+        :return: The means and standard deviations of the seconds each registered specification will take by model
+        """
+        columns_version, design = self.designs.get(model, (None, None))
+        if columns_version != model.columns_version:
+            # The model learned new values or dropped a key since the design matrix was made
+            design = model.encode(self.features_list)
+            self.designs[model] = (model.columns_version, design)
+        return model.predict_many(design, len(self.features_list))
+
+    def _get_features(self, specification_id) -> typing.Dict[str, str]:
+        specification = self.specification_ids_to_specification.get(specification_id)
+        return dict() if specification is None else specification_features(specification)
+
+    def _get_history_entry(self, specification_id) -> typing.Dict:
+        entry = self.history.pop(specification_id, None)
+        if entry is None:
+            entry = {"features": self._get_features(specification_id), "iterations": 0.0,
+                     "log_seconds_per_iteration": 0.0, "seconds": None}
+        self.history[specification_id] = entry
+        while len(self.history) > self.max_history:
+            self.history.popitem(last=False)
+        return entry
+
+    def record_start(self, specification, at: float = None):
+        """
+        :param at: When it started, defaults to now
+        """
+        at = time.time() if at is None else at
+        if self.start_time.get(specification) == at:
+            # Told again, by a dashboard reading its event log again
+            return
+        self.start_time[specification] = at
+        self.last_update_time[specification] = at
+
+    def record_iteration(self, specification, progress, at: float = None):
+        """
+        :param progress: How many iterations it has done
+        :param at: When it got to progress, defaults to now
+        """
+        at = time.time() if at is None else at
+        if specification not in self.last_update_time:
+            # Its start wasn't seen, so time from here
+            self.last_update_time[specification] = at
+            self.last_progress[specification] = progress
+            return
+        iterations = progress - self.last_progress.get(specification, 0)
+        elapsed = at - self.last_update_time[specification]
+        self.last_progress[specification] = progress
+        self.last_update_time[specification] = at
+        if iterations > 0 and elapsed > 0:
+            seconds_per_iteration = elapsed / iterations
+            self.iteration_model.add(self._get_features(specification), seconds_per_iteration, iterations)
+            entry = self._get_history_entry(specification)
+            entry["log_seconds_per_iteration"] = ((entry["log_seconds_per_iteration"] * entry["iterations"]
+                                                   + math.log(seconds_per_iteration) * iterations)
+                                                  / (entry["iterations"] + iterations))
+            entry["iterations"] += iterations
+
+    def record_completion(self, specification, at: float = None):
+        """
+        :param at: When it completed, defaults to now
+        """
+        at = time.time() if at is None else at
+        start_time = self.start_time.get(specification)
+        if start_time is None or (specification, start_time) in self.completed:
+            return
+        self.completed.add((specification, start_time))
+        self.last_update_time[specification] = at
+        self.completion_model.add(self._get_features(specification), at - start_time)
+        self._get_history_entry(specification)["seconds"] = at - start_time
+
+    def _fit_if_due(self) -> bool:
+        if self.last_fit is not None and time.time() - self.last_fit < self.refit_interval:
+            return False
+        self.iteration_model.fit()
+        self.completion_model.fit()
+        self.last_fit = time.time()
+        self.fits += 1
+        return True
+
+    def compute_time_stats(self, specification_progress, active, registered) -> typing.Tuple[float, float, float]:
+        """
+        :param specification_progress: (progress, maximum) of the specifications which report iterations and haven't finished
+        :param active: The running specifications
+        :param registered: The specifications waiting to run
+        :return: The expected, lower quartile and upper quartile seconds until the batch finishes
+        """
+        self._fit_if_due()
+        now = time.time()
+        if (self.last_estimate is not None and self.last_estimate_fit == self.fits
+                and now - self.last_estimate_time < self.refit_interval):
+            return self.last_estimate
+        self.last_estimate_time = now
+        self.last_estimate_fit = self.fits
+        specification_ids = list(dict.fromkeys(itertools.chain(active, registered, specification_progress)))
+        unregistered_row = len(self.features_list) - 1
+        rows = np.array([self.specification_rows.get(specification_id, unregistered_row)
+                         for specification_id in specification_ids], dtype=np.intp)
+        current = np.zeros(len(specification_ids))
+        maximum = np.zeros(len(specification_ids))
+        has_progress = np.zeros(len(specification_ids), dtype=bool)
+        elapsed = np.zeros(len(specification_ids))
+        for i, specification_id in enumerate(specification_ids):
+            progress = specification_progress.get(specification_id)
+            if progress is not None:
+                has_progress[i] = True
+                current[i], maximum[i] = progress
+            elif specification_id in self.start_time:
+                elapsed[i] = now - self.start_time[specification_id]
+        remaining_iterations = np.maximum(maximum - current, 0)
+
+        # NaN marks specifications there is nothing to go on for
+        means = np.full(len(specification_ids), np.nan)
+        standard_deviations = np.full(len(specification_ids), np.nan)
+        completion = self._predict_registered(self.completion_model)
+        if completion is not None:
+            completion_means, completion_deviations = completion[0][rows], completion[1][rows]
+            without_progress = ~has_progress
+            means[without_progress] = np.maximum(completion_means - elapsed, 0.0)[without_progress]
+            standard_deviations[without_progress] = completion_deviations[without_progress]
+            with_maximum = has_progress & (maximum > 0)
+            fraction_left = np.divide(remaining_iterations, maximum, out=np.zeros_like(maximum), where=maximum > 0)
+            means[with_maximum] = (completion_means * fraction_left)[with_maximum]
+            standard_deviations[with_maximum] = (completion_deviations * fraction_left)[with_maximum]
+        per_iteration = self._predict_registered(self.iteration_model)
+        if per_iteration is not None:
+            # The iteration model knows better than the completion model how long what is left of a specification takes
+            means[has_progress] = (per_iteration[0][rows] * remaining_iterations)[has_progress]
+            standard_deviations[has_progress] = (per_iteration[1][rows] * remaining_iterations)[has_progress]
+
+        known = ~np.isnan(means)
+        means = means[known]
+        standard_deviations = standard_deviations[known]
+        parallelism = self.parallelism if self.parallelism is not None else max(1, len(active))
+        spread = _quartiles(float(means.sum()) / parallelism,
+                            math.sqrt(float((standard_deviations ** 2).sum())) / parallelism)
+        longest = (0.0, 0.0, 0.0)
+        if len(means) > 0:
+            longest = (float(means.max()),
+                       float(np.maximum(means - QUARTILE_Z * standard_deviations, 0.0).max()),
+                       float((means + QUARTILE_Z * standard_deviations).max()))
+        self.last_estimate = tuple(max(a, b) for a, b in zip(spread, longest))
+        return self.last_estimate
+
+    def find_stragglers(self, active, now: float = None, threshold: float = 3.0, stall_factor: float = 10.0,
+                        min_stall_seconds: float = 60.0, min_observations: int = 3) -> typing.Dict[
+            typing.AnyStr, typing.Tuple[str, float]]:
+        """
+        Compare each running specification with what the cost models expect of specifications with the same values.
+
+        A specification is "stalled" if it hasn't made progress for stall_factor times the expected seconds per
+        iteration (and at least min_stall_seconds), and "slow" if its seconds per iteration, or if it doesn't report
+        iterations how long it has been running, is more than threshold standard deviations above the expectation.
+        Models with fewer than min_observations observations aren't trusted to judge.
+        :param active: The running specifications
+        :return: The reason and how many standard deviations slow it is (infinite when stalled) of each straggler
+        """
+        now = time.time() if now is None else now
+        self._fit_if_due()
+        stragglers = dict()
+        for specification_id in active:
+            features = self._get_features(specification_id)
+            entry = self.history.get(specification_id)
+            if specification_id in self.last_progress and self.iteration_model.observations >= min_observations:
+                prediction = self.iteration_model.predict_log(features)
+                if prediction is None:
+                    continue
+                log_seconds, sigma = prediction
+                since_progress = now - self.last_update_time[specification_id]
+                if since_progress > max(min_stall_seconds, stall_factor * math.exp(log_seconds)):
+                    stragglers[specification_id] = ("stalled", float("inf"))
+                elif entry is not None and entry["iterations"] > 0 and sigma > 0:
+                    deviations = (entry["log_seconds_per_iteration"] - log_seconds) / sigma
+                    if deviations > threshold:
+                        stragglers[specification_id] = ("slow", deviations)
+            elif (specification_id in self.start_time and specification_id not in self.last_progress
+                  and self.completion_model.observations >= min_observations):
+                prediction = self.completion_model.predict_log(features)
+                if prediction is None or prediction[1] == 0:
+                    continue
+                log_seconds, sigma = prediction
+                running_for = now - self.start_time[specification_id]
+                if running_for > 0:
+                    deviations = (math.log(running_for) - log_seconds) / sigma
+                    if deviations > threshold:
+                        stragglers[specification_id] = ("slow", deviations)
+        return stragglers
+
+    def load(self):
+        """
+        Add the history saved by earlier runs to the models
+        """
+        if self.history_file is None:
+            return
+        try:
+            with open(self.history_file) as f:
+                history = json.load(f)
+        except (OSError, ValueError):
+            return
+        for specification_id, entry in history.items():
+            if entry["iterations"] > 0:
+                self.iteration_model.add(entry["features"], math.exp(entry["log_seconds_per_iteration"]),
+                                         entry["iterations"])
+            if entry["seconds"] is not None:
+                self.completion_model.add(entry["features"], entry["seconds"])
+            self.history[specification_id] = entry
+        while len(self.history) > self.max_history:
+            self.history.popitem(last=False)
+
+    def save(self):
+        """
+        Save the history for the next run
+        """
+        if self.history_file is None:
+            return
+        os.makedirs(os.path.dirname(self.history_file), exist_ok=True)
+        temporary_location = "{}.saving-{}".format(self.history_file, os.getpid())
+        with open(temporary_location, "w") as f:
+            json.dump(self.history, f)
+        os.replace(temporary_location, self.history_file)
+
+
+def _quartiles(mean, standard_deviation) -> typing.Tuple[float, float, float]:
+    return mean, max(mean - QUARTILE_Z * standard_deviation, 0.0), mean + QUARTILE_Z * standard_deviation
@@ -1,6 +1,16 @@
+import threading
+import time
 from queue import Full
 
-from smallab.dashboard.dashboard_events import LogEvent
+import os
+
+from smallab.dashboard.dashboard_events import (LogEvent, EventBatch, BeginEvent, CompleteEvent, FailedEvent,
+                                                StartExperimentEvent, RegistrationCompleteEvent, ProgressEvent,
+                                                StopDashboardEvent)
+
+# Events which change what the dashboard shows a specification as, these are sent as soon as they are put
+URGENT_EVENTS = (BeginEvent, CompleteEvent, FailedEvent, StartExperimentEvent, RegistrationCompleteEvent,
+                 StopDashboardEvent)
 
 
 class LogToEventQueue:
@@ -17,6 +27,119 @@ class LogToEventQueue:
         pass
 
 
+class BufferedEventQueue(object):
+    """
+    The event queue ExperimentRunner gives to runners. Sending an event through a manager queue is a round trip to the
+    manager process, so instead each process buffers the events it puts and sends them together as one EventBatch once
+    max_batch_size have been put, flush_interval seconds have passed or an urgent event (begin, complete, failed...) is
+    put. A batch which doesn't fit in the queue is dropped and counted, and the count is sent with the next batch which
+    does fit.
+
+    Log and progress events put less than flush_interval after the last batch wait for the next event from the same
+    process, or for flush.
+
+    Once a ProgressTable is set, progress events of the specifications it has a row for are written to the table
+    instead of being sent.
+    """
+
+    def __init__(self, queue, max_batch_size: int = 500, flush_interval: float = 0.5):
+        """
+        :param queue: The queue batches are sent on, usually from a multiprocessing manager
+        :param max_batch_size: The most events to buffer before sending them
+        :param flush_interval: The most seconds to buffer events for
+        """
+        self.queue = queue
+        self.max_batch_size = max_batch_size
+        self.flush_interval = flush_interval
+        self.progress_table = None
+        self._reset_buffer()
+
+    def _reset_buffer(self):
+        self.pid = os.getpid()
+        self.buffer = []
+        self.dropped = 0
+        self.last_flush = time.time()
+        self.lock = threading.Lock()
+
+    def __getstate__(self):
+        # Each process buffers on its own
+        return {"queue": self.queue, "max_batch_size": self.max_batch_size, "flush_interval": self.flush_interval,
+                "progress_table": self.progress_table}
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._reset_buffer()
+
+    def set_progress_table(self, progress_table):
+        """
+        :param progress_table: A smallab.dashboard.progress_table.ProgressTable to publish progress to, or None
+        """
+        self.progress_table = progress_table
+
+    def _check_process(self):
+        if self.pid != os.getpid():
+            # Forked from the process which made this, whose buffer isn't ours to send
+            self._reset_buffer()
+
+    def put_nowait(self, event):
+        """
+        Buffer an event, sending the buffer if it is due. Never blocks or raises because the queue is full.
+        """
+        if (isinstance(event, ProgressEvent) and self.progress_table is not None
+                and self.progress_table.publish(event.specification_id, event.progress, event.max)):
+            return
+        self._check_process()
+        with self.lock:
+            self.buffer.append(event)
+            if (isinstance(event, URGENT_EVENTS) or len(self.buffer) >= self.max_batch_size
+                    or time.time() - self.last_flush >= self.flush_interval):
+                self._send_buffer()
+
+    def put(self, event, timeout=None):
+        """
+        Send the events this process has buffered followed by event, waiting for room in the queue
+        :param timeout: The most seconds to wait, after which queue.Full is raised
+        """
+        self._check_process()
+        with self.lock:
+            self.queue.put(EventBatch(self.buffer + [event], self.dropped), timeout=timeout)
+            self.buffer = []
+            self.dropped = 0
+            self.last_flush = time.time()
+
+    def flush(self):
+        """
+        Send the events this process has buffered
+        """
+        self._check_process()
+        with self.lock:
+            self._send_buffer()
+
+    def _send_buffer(self):
+        self.last_flush = time.time()
+        if not self.buffer and self.dropped == 0:
+            return
+        try:
+            self.queue.put_nowait(EventBatch(self.buffer, self.dropped))
+            self.dropped = 0
+        except Full:
+            self.dropped += len(self.buffer)
+        self.buffer = []
+
+    def get_dropped(self) -> int:
+        """
+        :return: How many events this process has dropped and not yet reported in a batch
+        """
+        self._check_process()
+        return self.dropped
+
+    def get(self, block=True, timeout=None):
+        return self.queue.get(block, timeout)
+
+    def empty(self) -> bool:
+        return self.queue.empty()
+
+
 def put_in_event_queue(eventQueue,o):
     '''
     This is just to put in the event queue without waiting or failing if it's full
@@ -27,3 +150,20 @@ def put_in_event_queue(eventQueue,o):
         eventQueue.put_nowait(o)
     except Full:
         pass
+
+
+def flush_event_queue(eventQueue):
+    """
+    Send the events this process has buffered in eventQueue, if it buffers them
+    """
+    if isinstance(eventQueue, BufferedEventQueue):
+        eventQueue.flush()
+
+
+def unpack_events(event):
+    """
+    :return: The events in what was taken off the queue, and how many events were dropped before them
+    """
+    if isinstance(event, EventBatch):
+        return event.events, event.dropped
+    return [event], 0
@@ -0,0 +1,32 @@
+import typing
+
+import abc
+
+from smallab.experiment_types.experiment import ExperimentBase
+from smallab.smallab_types import Specification
+
+
+class AsyncExperiment(ExperimentBase):
+    """
+    An experiment whose main method is a coroutine.
+    This is meant for experiments which spend their time waiting on subprocesses, simulators or the network.
+    Run by AsyncioRunner many specifications share one process and wait concurrently.
+    Run by any other runner the coroutine is run to completion with asyncio.run
+
+    The lifecycle of this object is
+    {} is called internally by smallab
+    {.set_logging_folder() -> .get_logging_folder() -> .set_logger()} -> {.setup_worker() once per process} -> await .main()
+    """
+
+    @abc.abstractmethod
+    async def main(self, specification: Specification) -> typing.Dict:
+        """
+        The coroutine that should be overriden when using AsyncExperiment.
+        Anything slow should be awaited (asyncio.create_subprocess_exec, asyncio.sleep, ...) so other specifications can run.
+
+        If an exception is raised the experiment is considered failed.
+
+        :param specification: A dictionary passed which represents the variables of this experiment
+        :return: A dictionary of results which will be serialized and saved if this experiment is succesful
+        """
+        pass
@@ -0,0 +1,125 @@
+import collections
+import typing
+
+import abc
+
+from smallab.experiment_types.experiment import ExperimentBase
+from smallab.smallab_types import Specification
+
+
+class SpecificationBatch(list):
+    """
+    Specifications of a BatchedExperiment which are run together by one call to main_batch.
+    Runners are given these in place of specifications when running a BatchedExperiment.
+    """
+
+    def get_name(self, experiment: ExperimentBase) -> typing.AnyStr:
+        """
+        :return: A name for the batch, unique as long as the names of the specifications are
+        """
+        return "batch_{}_{}".format(experiment.get_name(self[0]), len(self))
+
+
+class BatchFailure(Exception):
+    """
+    Returned when some specifications of a batch failed and some completed
+    """
+
+    def __init__(self, exceptions: typing.List[typing.Optional[Exception]]):
+        """
+        :param exceptions: Why each specification of the batch failed, None for the ones which completed
+        """
+        super().__init__("{} of {} specifications in the batch failed".format(
+            sum(exception is not None for exception in exceptions), len(exceptions)))
+        self.exceptions = exceptions
+
+
+def _exceptions_by_specification(batch: SpecificationBatch, exception: typing.Optional[Exception]) -> typing.List[
+        typing.Optional[Exception]]:
+    if isinstance(exception, BatchFailure):
+        return exception.exceptions
+    return [exception] * len(batch)
+
+
+def get_failed_part(batch: SpecificationBatch, exception: Exception) -> SpecificationBatch:
+    """
+    Called by runners retrying a batch, so the specifications which completed aren't run and saved again
+    :param exception: Why the batch failed
+    :return: The specifications of the batch which failed, in order
+    """
+    return SpecificationBatch(specification for specification, specification_exception in
+                              zip(batch, _exceptions_by_specification(batch, exception))
+                              if specification_exception is not None)
+
+
+def merge_failed_part(batch: SpecificationBatch, exception: Exception, failed_part: SpecificationBatch,
+                      failed_part_exception: typing.Optional[Exception]) -> typing.Optional[Exception]:
+    """
+    :param exception: Why the batch failed
+    :param failed_part: What get_failed_part returned, which was run again
+    :param failed_part_exception: What running failed_part again returned
+    :return: Why the whole batch has now failed, or None if every specification of it has completed
+    """
+    failed_part_exceptions = iter(_exceptions_by_specification(failed_part, failed_part_exception))
+    exceptions = [next(failed_part_exceptions) if specification_exception is not None else None
+                  for specification_exception in _exceptions_by_specification(batch, exception)]
+    if all(specification_exception is None for specification_exception in exceptions):
+        return None
+    return BatchFailure(exceptions)
+
+
+class BatchedExperiment(ExperimentBase):
+    """
+    An experiment which runs many specifications with one call, for example evaluating many seeds of a cheap numpy
+    computation with one vectorized call.
+
+    ExperimentRunner groups the specifications into batches of at most get_batch_size specifications which have the
+    same values for every key in get_batch_keys, and runners run a batch at a time. Each specification is still saved,
+    reported to the callbacks and shown on the dashboard on its own. A batch shares one log file.
+
+    Runners ask about a batch as a whole, so get_specification_timeout and get_retry_policy are given the
+    SpecificationBatch (a list of the specifications) rather than one specification, and the timeout is for the whole
+    main_batch call. A retried batch only runs its specifications which failed again.
+
+    The lifecycle of this object is
+    {} is called internally by smallab
+    {.set_logging_folder() -> .get_logging_folder() -> .set_logger()} -> {.setup_worker() once per process} -> .main_batch()
+    """
+
+    @abc.abstractmethod
+    def main_batch(self, specifications: typing.List[Specification]) -> typing.List[typing.Union[typing.Dict, Exception]]:
+        """
+        The method that should be overriden when using BatchedExperiment.
+
+        If an exception is raised every specification in the batch is considered failed.
+
+        :param specifications: The specifications of the batch, which agree on every key in get_batch_keys
+        :return: A dictionary of results for each specification, in the same order. Return an exception in place of a
+        dictionary to fail only that specification
+        """
+        pass
+
+    def get_batch_keys(self) -> typing.List[typing.AnyStr]:
+        """
+        :return: The keys of the specification which must have the same value for every specification in a batch
+        """
+        return []
+
+    def get_batch_size(self) -> int:
+        """
+        :return: The most specifications to give main_batch at once
+        """
+        return 1000
+
+    def make_batches(self, specifications: typing.List[Specification]) -> typing.List[SpecificationBatch]:
+        """
+        Called by ExperimentRunner to group the specifications to run into batches
+        :return: The batches, in the order their first specification appeared
+        """
+        groups = collections.OrderedDict()
+        for specification in specifications:
+            key = repr([specification.get(batch_key) for batch_key in self.get_batch_keys()])
+            groups.setdefault(key, []).append(specification)
+        batch_size = self.get_batch_size()
+        return [SpecificationBatch(group[start:start + batch_size]) for group in groups.values()
+                for start in range(0, len(group), batch_size)]
@@ -38,7 +38,7 @@ class CheckpointedExperiment(ExperimentBase, HasCheckpoint, IterativeExperiment)
     The lifecycle of this object is
 
     {} is called internally by smallab, []* is called multiple times
-    {.set_logging_folder() -> .get_logging_folder() -> .set_logger()} -> .initialize() -> [.step()]*
+    {.set_logging_folder() -> .get_logging_folder() -> .set_logger()} -> {.setup_worker() once per process} -> .initialize() -> [.step()]*
     """
 
 
@@ -1,8 +1,11 @@
 import typing
+import uuid
 
 import abc
 import os
 
+from smallab import cpu_budget
+from smallab.runner_implementations import worker_pool
 from smallab.smallab_types import Specification
 
 
@@ -67,6 +70,107 @@ class ExperimentBase(abc.ABC):
         """
         return self.logging_folder
 
+    def setup_worker(self) -> typing.Any:
+        """
+        Called once in each process that runs specifications of this experiment class, before its first specification.
+        Load things every specification shares here (a large dataset, a model) so each worker loads it once instead of
+        once per specification. The experiment is copied for each specification, so return what was loaded rather than
+        saving it to self.
+        :return: Anything, available from get_worker_data in every specification this process runs
+        """
+        return None
+
+    def get_worker_setup_key(self) -> typing.Hashable:
+        """
+        Experiments with the same key share what setup_worker returned in a process, so it must change with anything
+        setup_worker depends on. Worked out once per run in the main process.
+        Override it to share a setup between instances, for example with the class and the dataset path they load.
+        :return: Defaults to the class and a token of this instance, so only runs of this same experiment share a setup
+        """
+        # A token rather than id(self), which a later experiment can be given once this one is garbage collected.
+        # Copies of the experiment keep the token
+        if "worker_setup_token" not in vars(self):
+            self.worker_setup_token = uuid.uuid4().hex
+        return type(self).__module__, type(self).__qualname__, self.worker_setup_token
+
+    def set_worker_setup_key(self, worker_setup_key: typing.Hashable):
+        """
+        Called by ExperimentRunner with get_worker_setup_key before the specifications are run
+        """
+        self.worker_setup_key = worker_setup_key
+
+    def get_worker_data(self) -> typing.Any:
+        """
+        :return: What setup_worker returned in this process
+        """
+        return worker_pool.setup_worker_once(self)
+
+    def get_shared_attributes(self) -> typing.List[typing.AnyStr]:
+        """
+        The names of attributes which specifications only read, such as large tables or models.
+        Each specification runs on a copy of the experiment; these attributes are shared with the copy instead of being
+        deep copied, saving the time and memory of copying them for every specification.
+        :return: A list of attribute names
+        """
+        return []
+
+    def set_shared_arrays(self, shared_array_descriptors):
+        """
+        Called by ExperimentRunner with the descriptors of the arrays published on runner.shared_arrays
+        """
+        self.shared_array_descriptors = shared_array_descriptors
+
+    def get_shared_array(self, array_name: typing.AnyStr):
+        """
+        Gets an array published with runner.shared_arrays.publish. The array is mapped into this process without
+        copying it, once per process, and is read only.
+        :param array_name: The name the array was published under
+        :return: A read only numpy array
+        """
+        return self.shared_array_descriptors[array_name].attach()
+
+    def get_resource_requirements(self, specification: Specification) -> typing.Dict[str, typing.SupportsFloat]:
+        """
+        Read by WeightedResourceAllocatorRunner to decide how much of each resource dimension a specification needs.
+        For example {"cores": 4, "memory": 30, "gpus": 1}. Dimensions which are left out are not needed.
+        The granted allocation is available as self.resource while the specification runs.
+        :param specification: The specification that is about to be scheduled
+        :return: A dictionary from resource dimension name to amount required
+        """
+        return dict()
+
+    def get_specification_timeout(self, specification: Specification) -> typing.Optional[float]:
+        """
+        Read by MultiprocessingRunner to decide how long a specification may run before its worker is killed and the
+        specification fails.
+        :param specification: The specification that is about to be run, or the SpecificationBatch of a BatchedExperiment
+        :return: A number of seconds, or None to use the runner's specification_timeout
+        """
+        return None
+
+    def get_retry_policy(self, specification: Specification):
+        """
+        Read by the runner to decide whether to run a failed specification again
+        :param specification: The specification that failed, or the SpecificationBatch of a BatchedExperiment
+        :return: A smallab.retry_policy.RetryPolicy, or None to use the runner's retry_policy
+        """
+        return None
+
+    def request_cores(self, number_of_cores: int) -> int:
+        """
+        Ask the runner's CpuBudget for number_of_cores in total to use for parallelism inside this specification
+        (numpy, joblib pools, torch threads). Cores are only granted when other workers are not using them.
+        :param number_of_cores: The number of cores this specification would like to use
+        :return: The number of cores this specification may use, which may be less than asked for
+        """
+        return cpu_budget.request_cores(number_of_cores)
+
+    def get_cores(self) -> int:
+        """
+        :return: The number of cores this specification may currently use
+        """
+        return cpu_budget.get_cores()
+
 
 class Experiment(ExperimentBase):
     """
@@ -76,7 +180,7 @@ class Experiment(ExperimentBase):
 
     The lifecycle of this object is
     {} is called internally by smallab
-    {.set_logging_folder() -> .get_logging_folder() -> .set_logger()} -> .main()
+    {.set_logging_folder() -> .get_logging_folder() -> .set_logger()} -> {.setup_worker() once per process} -> .main()
     """
 
     @abc.abstractmethod
@@ -1,5 +1,7 @@
+import asyncio
 import typing
 
+from smallab.experiment_types.async_experiment import AsyncExperiment
 from smallab.experiment_types.checkpointed_experiment import CheckpointedExperiment
 from smallab.experiment_types.experiment import ExperimentBase, Experiment
 from smallab.experiment_types.handlers.checkpointed_experiment_handler import CheckpointedExperimentHandler
@@ -16,6 +18,8 @@ def run_with_correct_handler(experiment: ExperimentBase, name: typing.AnyStr, sp
         return OverlappingOutputCheckpointedExperimentHandler(eventQueue).run(experiment, name, specification)
     elif isinstance(experiment, Experiment):
         return experiment.main(specification)
+    elif isinstance(experiment, AsyncExperiment):
+        return asyncio.run(experiment.main(specification))
     else:
         raise Exception("Experiment Handler not Understood")
 
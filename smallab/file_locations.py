@@ -79,8 +79,32 @@ def get_specification_local_storage(name, specification, experiment: ExperimentB
     expr_name = experiment.get_name(specification)
     return os.path.join(get_experiment_local_storage(name),expr_name)
 
+def get_claims_directory(name):
+    return os.path.join(get_save_directory(name), "claims")
+
 def get_dashboard_file(name):
     return os.path.join(get_save_directory(name), ".dashboard.csv")
 
+def get_dashboard_event_log_file(name):
+    return os.path.join(get_save_directory(name), ".dashboard.bin")
+
+def get_progress_table_file(name):
+    return os.path.join(get_save_directory(name), ".progress.npy")
+
+def get_progress_table_ids_file(name):
+    return os.path.join(get_save_directory(name), ".progress_ids.json")
+
+def get_dashboard_specifications_file(name):
+    return os.path.join(get_save_directory(name), ".specifications.json")
+
+def get_status_file(name):
+    return os.path.join(get_save_directory(name), ".status.json")
+
+def get_throughput_file(name):
+    return os.path.join(get_save_directory(name), ".throughput.csv")
+
+def get_time_estimator_history_file(name):
+    return os.path.join(get_save_directory(name), ".time_history.json")
+
 def get_specification_save_dir(name):
     return os.path.join(get_save_directory(name), "specifications")
\ No newline at end of file
@@ -0,0 +1,50 @@
+import typing
+
+
+class RetryPolicy(object):
+    """
+    How a runner retries a specification which failed.
+
+    A failed specification is run again after a delay which grows exponentially with each attempt, as long as the
+    exception is one of retry_on and not one of dont_retry_on. CheckpointedExperiments pick up from their latest
+    checkpoint when they are run again. Every failed attempt is still logged and reported to the callbacks.
+
+    RetryPolicy(max_attempts=5, backoff=10, retry_on=(OSError, TimeoutError))
+    """
+
+    def __init__(self, max_attempts: int = 3, backoff: float = 1.0, backoff_multiplier: float = 2.0,
+                 max_backoff: float = None,
+                 retry_on: typing.Tuple[typing.Type[BaseException], ...] = (Exception,),
+                 dont_retry_on: typing.Tuple[typing.Type[BaseException], ...] = ()):
+        """
+        :param max_attempts: The most times a specification is run, including the first
+        :param backoff: Seconds to wait before the first retry
+        :param backoff_multiplier: How much the wait grows with each retry
+        :param max_backoff: If given, the longest to wait before a retry
+        :param retry_on: Only failures with these exception types are retried
+        :param dont_retry_on: Failures with these exception types are never retried, even if they are in retry_on
+        """
+        self.max_attempts = max_attempts
+        self.backoff = backoff
+        self.backoff_multiplier = backoff_multiplier
+        self.max_backoff = max_backoff
+        self.retry_on = tuple(retry_on)
+        self.dont_retry_on = tuple(dont_retry_on)
+
+    def should_retry(self, exception: BaseException, attempts: int) -> bool:
+        """
+        :param exception: Why the latest attempt failed
+        :param attempts: How many times the specification has been run so far
+        """
+        return attempts < self.max_attempts and isinstance(exception, self.retry_on) and \
+               not isinstance(exception, self.dont_retry_on)
+
+    def get_delay(self, attempts: int) -> float:
+        """
+        :param attempts: How many times the specification has been run so far
+        :return: Seconds to wait before running it again
+        """
+        delay = self.backoff * self.backoff_multiplier ** (attempts - 1)
+        if self.max_backoff is not None:
+            delay = min(delay, self.max_backoff)
+        return delay
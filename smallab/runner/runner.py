@@ -7,17 +7,23 @@ import dill
 import os
 
 from smallab.callbacks import CallbackManager
-from smallab.dashboard.dashboard import start_dashboard, write_dashboard
+from smallab.circuit_breaker import CircuitBreaker
+from smallab.dashboard.dashboard import start_dashboard, write_dashboard, stop_dashboard_writer
 from smallab.dashboard.dashboard_events import StartExperimentEvent, RegisterEvent, RegistrationCompleteEvent, \
     ProgressEvent
-from smallab.dashboard.utils import put_in_event_queue, LogToEventQueue
+from smallab.dashboard.progress_table import ProgressTable
+from smallab.dashboard.time_estimator import save_specification_features
+from smallab.dashboard.utils import put_in_event_queue, LogToEventQueue, BufferedEventQueue
+from smallab.experiment_types.batched_experiment import BatchedExperiment, BatchFailure
 from smallab.experiment_types.checkpointed_experiment import IterativeExperiment
 from smallab.experiment_types.experiment import ExperimentBase
 from smallab.file_locations import (get_save_directory, get_experiment_save_directory)
-from smallab.runner.runner_methods import run_and_save
+from smallab.runner.runner_methods import run_and_save, fail_lost_specification, run_and_save_batch
 from smallab.runner_implementations.abstract_runner import SimpleAbstractRunner, ComplexAbstractRunner
 from smallab.runner_implementations.joblib_runner import JoblibRunner
 from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.runner_implementations.worker_pool import WorkerPool, get_worker_cache, clear_worker_setups
+from smallab.shared_arrays import SharedArrayRegistry, release_attachments
 from smallab.smallab_types import Specification
 from smallab.utilities.logging_callback import LoggingCallback
 
@@ -30,6 +36,8 @@ class ExperimentRunner(object):
     def __init__(self):
         self.callbacks = [LoggingCallback()]
         self.logging_callback_attached = False
+        # Arrays published here are shared with every specification of a batch, see SharedArrayRegistry
+        self.shared_arrays = SharedArrayRegistry()
 
     def attach_callbacks(self, callbacks: typing.List[CallbackManager]):
         """
@@ -86,10 +94,32 @@ class ExperimentRunner(object):
                 need_to_run_specifications.append(specification)
         return need_to_run_specifications
 
+    def _unbatch(self, specification_runner):
+        """
+        :return: The completed specifications, failed specifications and exceptions of a runner which ran SpecificationBatches
+        """
+        completed = [specification for batch in specification_runner.get_completed() for specification in batch]
+        failed = []
+        exceptions = []
+        for batch, exception in zip(specification_runner.get_failed_specifications(),
+                                    specification_runner.get_exceptions()):
+            if isinstance(exception, BatchFailure):
+                batch_exceptions = exception.exceptions
+            else:
+                batch_exceptions = [exception] * len(batch)
+            for specification, specification_exception in zip(batch, batch_exceptions):
+                if specification_exception is None:
+                    completed.append(specification)
+                else:
+                    failed.append(specification)
+                    exceptions.append(specification_exception)
+        return completed, failed, exceptions
+
     def run(self, name: typing.AnyStr, specifications: typing.List[Specification], experiment: ExperimentBase,
             continue_from_last_run=True, propagate_exceptions=False,
             force_pickle=False, specification_runner: SimpleAbstractRunner = MultiprocessingRunner(),
-            use_dashboard=True, context_type="fork", multiprocessing_lib=None) -> typing.NoReturn:
+            use_dashboard=True, context_type="fork", multiprocessing_lib=None,
+            worker_pool: WorkerPool = None, circuit_breaker: CircuitBreaker = None) -> typing.NoReturn:
 
         """
         The method called to run an experiment
@@ -102,44 +132,67 @@ class ExperimentRunner(object):
         :param force_pickle: If true, don't attempt to json serialze results and default to pickling
         :param specification_runner: An instance of ```AbstractRunner``` that will be used to run the specification
         :param use_dashboard: If true, use the terminal monitoring dashboard. If false, just stream logs to stdout.
+        :param worker_pool: A WorkerPool to reuse across calls to run. Its multiprocessing context is used instead of context_type
+        :param circuit_breaker: A CircuitBreaker which stops the batch early if too many specifications fail. Used by MainRunner, MultiprocessingRunner and AsyncioRunner
         :return: No return
         """
 
-        if multiprocessing_lib is None:
-            import multiprocessing as mp
+        if worker_pool is not None:
+            ctx = worker_pool.get_multiprocessing_context()
         else:
-            mp = multiprocessing_lib
-        ctx = mp.get_context(context_type)
+            if multiprocessing_lib is None:
+                import multiprocessing as mp
+            else:
+                mp = multiprocessing_lib
+            ctx = mp.get_context(context_type)
         specification_runner.set_multiprocessing_context(ctx)
+        specification_runner.set_worker_pool(worker_pool)
+        specification_runner.set_experiment(experiment)
+        specification_runner.set_batch_name(name)
+        if circuit_breaker is None:
+            circuit_breaker = CircuitBreaker()
+        circuit_breaker.reset()
+        specification_runner.set_circuit_breaker(circuit_breaker)
         if specification_runner is None:
             specification_runner = JoblibRunner(None)
         dashboard_process = None
+        progress_table = None
+        manager = None
+        logger = logging.getLogger("smallab")
+        added_handlers = []
+        existing_worker_cache = set(get_worker_cache())
         try:
-            manager = ctx.Manager()
-            eventQueue = manager.Queue(maxsize=2000)
+            if worker_pool is not None:
+                eventQueue = BufferedEventQueue(worker_pool.get_manager().Queue(maxsize=2000))
+            else:
+                manager = ctx.Manager()
+                eventQueue = BufferedEventQueue(manager.Queue(maxsize=2000))
             put_in_event_queue(eventQueue, StartExperimentEvent(name))
             # Set up root smallab logger
             folder_loc = os.path.join("experiment_runs", name, "logs", str(datetime.datetime.now()))
             file_loc = os.path.join(folder_loc, "main.log")
             if not os.path.exists(folder_loc):
                 os.makedirs(folder_loc)
-            logger = logging.getLogger("smallab")
             logger.propagate = False
             logger.setLevel(logging.DEBUG)
             formatter = logging.Formatter('%(asctime)s - %(name)s - %(levelname)s - %(message)s')
             # Can't do this with non-fork multiprocessing
-            if context_type == "fork":
+            if ctx.get_start_method() == "fork":
                 fh = logging.FileHandler(file_loc)
                 fh.setFormatter(formatter)
                 logger.addHandler(fh)
+                added_handlers.append(fh)
             if not use_dashboard:
                 sh = logging.StreamHandler()
                 sh.setFormatter(formatter)
                 logger.addHandler(sh)
+                added_handlers.append(sh)
             else:
                 dashboard_process = ctx.Process(target=write_dashboard, args=(eventQueue,name))
                 dashboard_process.start()
             experiment.set_logging_folder(folder_loc)
+            experiment.set_shared_arrays(self.shared_arrays.open(name))
+            experiment.set_worker_setup_key(experiment.get_worker_setup_key())
 
             self.force_pickle = force_pickle
             if not os.path.exists(get_save_directory(name)):
@@ -149,6 +202,11 @@ class ExperimentRunner(object):
                 need_to_run_specifications = self._find_uncompleted_specifications(name, specifications)
             else:
                 need_to_run_specifications = specifications
+            if use_dashboard:
+                specification_ids = [experiment.get_name(specification) for specification in need_to_run_specifications]
+                progress_table = ProgressTable.create(name, specification_ids)
+                eventQueue.set_progress_table(progress_table)
+                save_specification_features(name, specification_ids, need_to_run_specifications)
             for callback in self.callbacks:
                 callback.set_experiment_name(name)
 
@@ -161,30 +219,62 @@ class ExperimentRunner(object):
 
             put_in_event_queue(eventQueue, RegistrationCompleteEvent())
 
-            if isinstance(specification_runner, SimpleAbstractRunner):
-                specification_runner.run(need_to_run_specifications,
-                                         lambda specification: run_and_save(name, experiment, specification,
-                                                                            propagate_exceptions, self.callbacks,
-                                                                            self.force_pickle, eventQueue))
-            elif isinstance(specification_runner, ComplexAbstractRunner):
-                specification_runner.run(need_to_run_specifications, name, experiment, propagate_exceptions,
-                                         self.callbacks, self.force_pickle, eventQueue)
+            # The functions given to the runner are sent to the workers, so they must not reference self, which holds
+            # the published arrays
+            callbacks = self.callbacks
+            specification_runner.set_failure_fn(
+                lambda specification, exception: fail_lost_specification(experiment, specification, exception,
+                                                                          callbacks, eventQueue))
+
+            if isinstance(experiment, BatchedExperiment):
+                if not isinstance(specification_runner, SimpleAbstractRunner):
+                    raise Exception("A BatchedExperiment must be run by a SimpleAbstractRunner")
+                specification_runner.run(experiment.make_batches(need_to_run_specifications),
+                                         lambda batch: run_and_save_batch(name, experiment, batch,
+                                                                          propagate_exceptions, callbacks,
+                                                                          force_pickle, eventQueue))
+                completed, failed, exceptions = self._unbatch(specification_runner)
+            else:
+                if isinstance(specification_runner, SimpleAbstractRunner):
+                    specification_runner.run(need_to_run_specifications,
+                                             lambda specification: run_and_save(name, experiment, specification,
+                                                                                propagate_exceptions, callbacks,
+                                                                                force_pickle, eventQueue))
+                elif isinstance(specification_runner, ComplexAbstractRunner):
+                    specification_runner.run(need_to_run_specifications, name, experiment, propagate_exceptions,
+                                             callbacks, force_pickle, eventQueue)
+                completed = specification_runner.get_completed()
+                failed = specification_runner.get_failed_specifications()
+                exceptions = specification_runner.get_exceptions()
 
-            self._write_to_completed_json(name, specification_runner.get_completed(),
-                                          specification_runner.get_failed_specifications())
+            self._write_to_completed_json(name, completed, failed)
 
             # Call batch complete functions
-            if specification_runner.get_exceptions() != []:
+            if exceptions != []:
                 for callback in self.callbacks:
-                    callback.on_batch_failure(specification_runner.get_exceptions(),
-                                              specification_runner.get_failed_specifications())
+                    callback.on_batch_failure(exceptions, failed)
 
-            if specification_runner.get_completed() != []:
+            if completed != []:
                 for callback in self.callbacks:
-                    callback.on_batch_complete(specification_runner.get_completed())
+                    callback.on_batch_complete(completed)
         except Exception as e:
             logger = logging.getLogger("smallab")
             logger.error("Fatal Error", exc_info=True)
         finally:
             if dashboard_process is not None:
-                dashboard_process.terminate()
+                stop_dashboard_writer(eventQueue, dashboard_process)
+            if worker_pool is not None and self.shared_arrays.descriptors:
+                # The workers outlive the run, and would keep the arrays mapped after they are unlinked
+                worker_pool.run_on_each_worker(release_attachments)
+            self.shared_arrays.close()
+            if worker_pool is None:
+                # Without a WorkerPool nothing reuses what setup_worker returned in this process after the run
+                clear_worker_setups(keep=existing_worker_cache)
+            if progress_table is not None:
+                progress_table.close()
+            if manager is not None:
+                manager.shutdown()
+            # Remove this run's handlers so repeated runs don't log every line once per previous run
+            for handler in added_handlers:
+                logger.removeHandler(handler)
+                handler.close()
@@ -5,15 +5,33 @@ import shutil
 import dill
 import os
 import types
+import uuid
 from copy import deepcopy
 
 from smallab.dashboard.dashboard_events import BeginEvent, CompleteEvent, FailedEvent
-from smallab.dashboard.utils import put_in_event_queue, LogToEventQueue
+from smallab.dashboard.utils import put_in_event_queue, LogToEventQueue, flush_event_queue
+from smallab.experiment_types.batched_experiment import BatchFailure, SpecificationBatch
 from smallab.experiment_types.experiment import ExperimentBase
 from smallab.experiment_types.handlers.registry import run_with_correct_handler
 from smallab.file_locations import (get_json_file_location, get_save_file_directory, get_pkl_file_location,
                                     get_specification_file_location, get_log_file, get_experiment_local_storage,
                                     get_specification_local_storage)
+from smallab.runner_implementations.worker_pool import setup_worker_once
+
+
+def write_atomically(file_location, mode, write_fn):
+    """
+    Writes a file through a temporary file in the same folder, so a worker killed while saving (for example the slower
+    copy of a speculatively run specification) never leaves a partly written file behind
+    """
+    temporary_location = os.path.join(os.path.dirname(file_location), ".saving-{}".format(uuid.uuid4().hex))
+    try:
+        with open(temporary_location, mode) as f:
+            write_fn(f)
+        os.replace(temporary_location, file_location)
+    finally:
+        if os.path.exists(temporary_location):
+            os.remove(temporary_location)
 
 
 def save_run(name, experiment, specification, result, force_pickle):
@@ -24,22 +42,18 @@ def save_run(name, experiment, specification, result, force_pickle):
     if not force_pickle:
         json_filename = get_json_file_location(name, specification,experiment)
         try:
-            with open(json_filename, "w") as f:
-                json.dump(output_dictionary, f)
+            write_atomically(json_filename, "w", lambda f: json.dump(output_dictionary, f))
             json_serialize_was_successful = True
         except Exception:
             logging.getLogger(experiment.get_logger_name()).warning("Json serialization failed with exception",
                                                                     exc_info=True)
-            os.remove(json_filename)
     # Try pickle serialization
     if force_pickle or not json_serialize_was_successful:
         pickle_file_location = get_pkl_file_location(name, specification,experiment)
         specification_file_location = get_specification_file_location(name, specification,experiment)
         try:
-            with open(pickle_file_location, "wb") as f:
-                dill.dump(output_dictionary, f)
-            with open(specification_file_location, "w") as f:
-                json.dump(specification, f)
+            write_atomically(pickle_file_location, "wb", lambda f: dill.dump(output_dictionary, f))
+            write_atomically(specification_file_location, "w", lambda f: json.dump(specification, f))
         except Exception:
             logging.getLogger(experiment.get_logger_name()).critical("Experiment results serialization failed!!!",
                                                                      exc_info=True)
@@ -53,9 +67,36 @@ def save_run(name, experiment, specification, result, force_pickle):
                 pass
 
 
-def run_and_save(name, experiment, specification, propagate_exceptions, callbacks, force_pickle,eventQueue):
-    experiment = deepcopy(experiment)
+def copy_experiment(experiment):
+    """
+    Copies the experiment for one specification to run on.
+    Attributes named by experiment.get_shared_attributes are shared with the copy instead of deep copied.
+    """
+    memo = dict()
+    for attribute in experiment.get_shared_attributes():
+        value = getattr(experiment, attribute)
+        memo[id(value)] = value
+    return deepcopy(experiment, memo)
+
+
+def begin_specification(name, experiment, specification, eventQueue):
+    """
+    Sets up the copy of the experiment a specification runs on, its logger and storage, and reports it as begun
+    :return: The experiment copy and the specification id
+    """
+    experiment = copy_experiment(experiment)
     specification_id = experiment.get_name(specification)
+    set_up_logger(experiment, specification_id, eventQueue)
+    experiment.set_experiment_local_storage(get_experiment_local_storage(name))
+    experiment.set_specification_local_storage(get_specification_local_storage(name,specification,experiment))
+    put_in_event_queue(eventQueue,BeginEvent(specification_id))
+    return experiment, specification_id
+
+
+def set_up_logger(experiment, specification_id, eventQueue):
+    """
+    Gives the experiment a logger which writes to the log file of specification_id and to the event queue
+    """
     logger_name = "smallab.{specification_id}".format(specification_id=specification_id)
     logger = logging.getLogger(logger_name)
     logger.setLevel(logging.DEBUG)
@@ -71,38 +112,176 @@ def run_and_save(name, experiment, specification, propagate_exceptions, callback
     #TODO need to attach eventqueue logger handler here and not at base logger
 
     experiment.set_logger_name(logger_name)
-    experiment.set_experiment_local_storage(get_experiment_local_storage(name))
-    experiment.set_specification_local_storage(get_specification_local_storage(name,specification,experiment))
-    put_in_event_queue(eventQueue,BeginEvent(specification_id))
+
+
+def end_specification(experiment, eventQueue):
+    """
+    Closes the log handlers opened by begin_specification so long running workers don't leak file handles, and sends
+    the events still buffered in this process
+    """
+    flush_event_queue(eventQueue)
+    logger = logging.getLogger(experiment.get_logger_name())
+    for handler in list(logger.handlers):
+        logger.removeHandler(handler)
+        handler.close()
+
+
+def save_result(name, experiment, specification, result, callbacks, force_pickle):
+    """
+    Saves the result of a specification and calls the specification complete callbacks
+    """
+    if isinstance(result, types.GeneratorType):
+        for cur_result in result:
+            save_run(name, experiment, cur_result["specification"], cur_result["result"], force_pickle)
+    else:
+        save_run(name, experiment, specification, result, force_pickle)
+    for callback in callbacks:
+        callback.on_specification_complete(specification, result)
+
+
+def fail_specification(experiment, specification, specification_id, exception, callbacks, eventQueue):
+    """
+    Logs, reports and calls the callbacks for a specification which raised an exception. Must be called in an except block
+    """
+    logging.getLogger(experiment.get_logger_name()).error("Specification Failure", exc_info=True)
+    put_in_event_queue(eventQueue,FailedEvent(specification_id))
+    on_failure(experiment,specification_id)
+
+    for callback in callbacks:
+        callback.on_specification_failure(exception, specification)
+
+
+def fail_lost_specification(experiment, specification, exception, callbacks, eventQueue):
+    """
+    Reports a specification which failed without run_and_save returning, because the process running it died or was
+    killed. Called in the main process.
+    """
+    if isinstance(specification, SpecificationBatch):
+        for batch_specification in specification:
+            fail_lost_specification(experiment, batch_specification, exception, callbacks, eventQueue)
+        return
+    specification_id = experiment.get_name(specification)
+    logging.getLogger("smallab.runner").error(
+        "Specification Failure {specification_id}: {exception}".format(specification_id=specification_id,
+                                                                       exception=exception))
+    put_in_event_queue(eventQueue,FailedEvent(specification_id))
+    log_file_location = get_log_file(experiment, specification_id)
+    if os.path.exists(log_file_location):
+        with open(log_file_location, "a") as f:
+            f.write("Specification Failure: {exception}\n".format(exception=exception))
+        on_failure(experiment,specification_id)
+
+    for callback in callbacks:
+        callback.on_specification_failure(exception, specification)
+
+
+def run_and_save(name, experiment, specification, propagate_exceptions, callbacks, force_pickle,eventQueue):
+    experiment, specification_id = begin_specification(name, experiment, specification, eventQueue)
 
     def _interior_fn():
+        setup_worker_once(experiment)
         result = run_with_correct_handler(experiment, name, specification,eventQueue)
-        if isinstance(result, types.GeneratorType):
-            for cur_result in result:
-                save_run(name, experiment, cur_result["specification"], cur_result["result"], force_pickle)
-        else:
-            save_run(name, experiment, specification, result, force_pickle)
-        for callback in callbacks:
-            callback.on_specification_complete(specification, result)
+        save_result(name, experiment, specification, result, callbacks, force_pickle)
         return None
 
-    if not propagate_exceptions:
-        try:
-            _interior_fn()
+    try:
+        if not propagate_exceptions:
+            try:
+                _interior_fn()
 
+                put_in_event_queue(eventQueue,CompleteEvent(specification_id))
+            except Exception as e:
+                fail_specification(experiment, specification, specification_id, e, callbacks, eventQueue)
+                return e
+        else:
+            _interior_fn()
             put_in_event_queue(eventQueue,CompleteEvent(specification_id))
-        except Exception as e:
-            logging.getLogger(experiment.get_logger_name()).error("Specification Failure", exc_info=True)
-            put_in_event_queue(eventQueue,FailedEvent(specification_id))
-            on_failure(experiment,specification_id)
+            return None
+    finally:
+        end_specification(experiment, eventQueue)
+
 
-            for callback in callbacks:
-                callback.on_specification_failure(e, specification)
+def run_and_save_batch(name, experiment, batch, propagate_exceptions, callbacks, force_pickle, eventQueue):
+    """
+    Runs a SpecificationBatch of a BatchedExperiment with one call to main_batch, then saves and reports each
+    specification like run_and_save would
+    :return: None if every specification completed, the exception if main_batch raised, otherwise a BatchFailure
+    """
+    experiment = copy_experiment(experiment)
+    batch_id = batch.get_name(experiment)
+    specification_ids = [experiment.get_name(specification) for specification in batch]
+    set_up_logger(experiment, batch_id, eventQueue)
+    experiment.set_experiment_local_storage(get_experiment_local_storage(name))
+    experiment.set_specification_local_storage(os.path.join(get_experiment_local_storage(name), batch_id))
+    for specification_id in specification_ids:
+        put_in_event_queue(eventQueue,BeginEvent(specification_id))
+    try:
+        try:
+            setup_worker_once(experiment)
+            results = experiment.main_batch(list(batch))
+            if len(results) != len(batch):
+                raise Exception("main_batch returned {} results for {} specifications".format(len(results),
+                                                                                              len(batch)))
+        except Exception as e:
+            if propagate_exceptions:
+                raise
+            logging.getLogger(experiment.get_logger_name()).error("Batch Failure", exc_info=True)
+            on_failure(experiment, batch_id)
+            for specification, specification_id in zip(batch, specification_ids):
+                put_in_event_queue(eventQueue,FailedEvent(specification_id))
+                for callback in callbacks:
+                    callback.on_specification_failure(e, specification)
             return e
-    else:
-        _interior_fn()
-        put_in_event_queue(eventQueue,CompleteEvent(specification_id))
+
+        exceptions = []
+        for specification, specification_id, result in zip(batch, specification_ids, results):
+            try:
+                if isinstance(result, Exception):
+                    raise result
+                save_result(name, experiment, specification, result, callbacks, force_pickle)
+                put_in_event_queue(eventQueue,CompleteEvent(specification_id))
+                exceptions.append(None)
+            except Exception as e:
+                if propagate_exceptions:
+                    raise
+                logging.getLogger(experiment.get_logger_name()).error(
+                    "Specification Failure {}".format(specification_id), exc_info=True)
+                put_in_event_queue(eventQueue,FailedEvent(specification_id))
+                for callback in callbacks:
+                    callback.on_specification_failure(e, specification)
+                exceptions.append(e)
+        if any(exception is not None for exception in exceptions):
+            on_failure(experiment, batch_id)
+            return BatchFailure(exceptions)
         return None
+    finally:
+        end_specification(experiment, eventQueue)
+
+
+async def async_run_and_save(name, experiment, specification, propagate_exceptions, callbacks, force_pickle,
+                             eventQueue):
+    """
+    The same as run_and_save but awaits the main coroutine of an AsyncExperiment
+    """
+    experiment, specification_id = begin_specification(name, experiment, specification, eventQueue)
+    try:
+        if not propagate_exceptions:
+            try:
+                setup_worker_once(experiment)
+                result = await experiment.main(specification)
+                save_result(name, experiment, specification, result, callbacks, force_pickle)
+                put_in_event_queue(eventQueue,CompleteEvent(specification_id))
+            except Exception as e:
+                fail_specification(experiment, specification, specification_id, e, callbacks, eventQueue)
+                return e
+        else:
+            setup_worker_once(experiment)
+            result = await experiment.main(specification)
+            save_result(name, experiment, specification, result, callbacks, force_pickle)
+            put_in_event_queue(eventQueue,CompleteEvent(specification_id))
+            return None
+    finally:
+        end_specification(experiment, eventQueue)
 
 def on_failure( experiment, specification_identity):
     log_file_location = get_log_file(experiment,specification_identity)
@@ -3,15 +3,23 @@ import typing
 import abc
 
 from smallab.callbacks import CallbackManager
+from smallab.circuit_breaker import CircuitBreaker
+from smallab.experiment_types.batched_experiment import SpecificationBatch
 from smallab.experiment_types.experiment import ExperimentBase
+from smallab.retry_policy import RetryPolicy
 from smallab.smallab_types import Specification
 
+# The result of a specification which was never started because the circuit breaker opened
+NOT_RUN = object()
+
 
 class BaseAbstractRunner(abc.ABC):
     """
     The base class for all runner meta classes
     This should not be subclassed except by a meta runner class
     """
+    retry_policy = None
+
     def finish(self, completed_specifications: typing.List[Specification],
                failed_specifications: typing.List[Specification], exceptions: typing.List[Exception]):
         """
@@ -42,6 +50,68 @@ class BaseAbstractRunner(abc.ABC):
     def set_multiprocessing_context(self, ctx):
         self.ctx = ctx
 
+    def get_worker_pool(self):
+        """
+        :return: The WorkerPool passed to ExperimentRunner.run, or None if the runner should start its own workers
+        """
+        return self.worker_pool
+
+    def set_worker_pool(self, worker_pool):
+        self.worker_pool = worker_pool
+
+    def get_batch_name(self) -> typing.AnyStr:
+        """
+        :return: The name of the batch ExperimentRunner.run is running
+        """
+        return self.batch_name
+
+    def set_batch_name(self, batch_name: typing.AnyStr):
+        self.batch_name = batch_name
+
+    def get_specification_id(self, specification) -> typing.AnyStr:
+        """
+        :return: The name of a specification, or SpecificationBatch, this runner was given
+        """
+        if isinstance(specification, SpecificationBatch):
+            return specification.get_name(self.get_experiment())
+        return self.get_experiment().get_name(specification)
+
+    def get_experiment(self) -> ExperimentBase:
+        """
+        :return: The experiment ExperimentRunner.run is running, for runners which schedule based on it
+        """
+        return self.experiment
+
+    def set_experiment(self, experiment: ExperimentBase):
+        self.experiment = experiment
+
+    def get_retry_policy(self, specification: Specification) -> typing.Optional[RetryPolicy]:
+        """
+        :return: The RetryPolicy for a specification, the experiment's if it has one otherwise the runner's, or None
+        to not retry it
+        """
+        retry_policy = self.get_experiment().get_retry_policy(specification)
+        return retry_policy if retry_policy is not None else self.retry_policy
+
+    def get_circuit_breaker(self) -> CircuitBreaker:
+        """
+        :return: The CircuitBreaker to report each finished specification to. Stop starting specifications once it is open
+        """
+        return self.circuit_breaker
+
+    def set_circuit_breaker(self, circuit_breaker: CircuitBreaker):
+        self.circuit_breaker = circuit_breaker
+
+    def get_failure_fn(self) -> typing.Callable[[Specification, Exception], typing.NoReturn]:
+        """
+        :return: A function to call with a specification and an exception when a specification fails without its run
+        function returning, for example because the process running it died. It reports the failure like run_and_save would.
+        """
+        return self.failure_fn
+
+    def set_failure_fn(self, failure_fn: typing.Callable[[Specification, Exception], typing.NoReturn]):
+        self.failure_fn = failure_fn
+
 
 class SimpleAbstractRunner(BaseAbstractRunner):
     """
@@ -0,0 +1,59 @@
+import asyncio
+import typing
+
+from smallab.callbacks import CallbackManager
+from smallab.experiment_types.async_experiment import AsyncExperiment
+from smallab.experiment_types.experiment import ExperimentBase
+from smallab.runner.runner_methods import async_run_and_save
+from smallab.runner_implementations.abstract_runner import ComplexAbstractRunner, NOT_RUN
+from smallab.smallab_types import Specification
+
+
+class AsyncioRunner(ComplexAbstractRunner):
+    """
+    Runs the specifications of an AsyncExperiment concurrently on one asyncio event loop in the main process.
+    """
+
+    def __init__(self, max_concurrency=100):
+        """
+        :param max_concurrency: The most specifications which will be running at once
+        """
+        self.max_concurrency = max_concurrency
+
+    def run(self, specifications_to_run: typing.List[Specification], experiment_name: typing.AnyStr,
+            experiment: ExperimentBase, propagate_exceptions: bool, callbacks: typing.List[CallbackManager],
+            force_pickle: bool, eventQueue):
+        if not isinstance(experiment, AsyncExperiment):
+            raise Exception("AsyncioRunner can only run an AsyncExperiment")
+        exceptions_thrown = asyncio.run(
+            self._run_all(specifications_to_run, experiment_name, experiment, propagate_exceptions, callbacks,
+                          force_pickle, eventQueue))
+
+        completed_specifications = []
+        failed_specifications = []
+        exceptions = []
+        for specification, exception_thrown in zip(specifications_to_run, exceptions_thrown):
+            if exception_thrown is NOT_RUN:
+                continue
+            if exception_thrown is None:
+                completed_specifications.append(specification)
+            else:
+                exceptions.append(exception_thrown)
+                failed_specifications.append(specification)
+        self.finish(completed_specifications, failed_specifications, exceptions)
+
+    async def _run_all(self, specifications_to_run, experiment_name, experiment, propagate_exceptions, callbacks,
+                       force_pickle, eventQueue):
+        semaphore = asyncio.Semaphore(self.max_concurrency)
+        circuit_breaker = self.get_circuit_breaker()
+
+        async def run_one(specification):
+            async with semaphore:
+                if circuit_breaker.is_open():
+                    return NOT_RUN
+                exception_thrown = await async_run_and_save(experiment_name, experiment, specification,
+                                                            propagate_exceptions, callbacks, force_pickle, eventQueue)
+                circuit_breaker.record(exception_thrown)
+                return exception_thrown
+
+        return await asyncio.gather(*[run_one(specification) for specification in specifications_to_run])
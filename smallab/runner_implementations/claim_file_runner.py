@@ -0,0 +1,229 @@
+import collections
+import logging
+import socket
+import threading
+import time
+import typing
+import uuid
+
+import os
+
+from smallab.file_locations import get_claims_directory
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.smallab_types import Specification
+
+
+class ClaimFileRunner(MultiprocessingRunner):
+    """
+    A MultiprocessingRunner for running one batch from several computers which share a file system, without any of
+    them listening on a port (see WorkQueueRunner for that).
+
+    Run the same batch (same name and specifications) with a ClaimFileRunner on every computer. Before starting a
+    specification a runner claims it by creating a claim file in the batch's claims folder, which only one runner can
+    do, and marks it done once it finishes, so each specification runs once. Runners keep touching the claims they hold;
+    a claim which hasn't been touched for lease_timeout seconds belongs to a runner which died and is taken over.
+    A runner keeps going until every specification it was given is done here or elsewhere.
+
+    Done markers belong to a batch run, named by a run id file in the claims folder which the first runner creates and
+    every runner started while it exists joins, however late. The runner which finds every specification done removes
+    it, so the next run starts a new batch run and runs a specification which failed again like with any other runner.
+    If every runner of a batch run dies, the next run joins it and skips what it finished.
+
+    The computers' clocks and the file server's should agree to well within lease_timeout.
+    """
+
+    def __init__(self, lease_timeout: float = 300, heartbeat_interval: float = None, node_id: typing.AnyStr = None,
+                 **kwargs):
+        """
+        :param lease_timeout: Seconds after its last heartbeat that a claim is considered abandoned
+        :param heartbeat_interval: Seconds between touching the held claims, and between checking on claims held elsewhere. Defaults to a third of lease_timeout
+        :param node_id: Written into the claim files to tell who holds them. Defaults to hostname:pid
+        :param kwargs: Passed to MultiprocessingRunner
+        """
+        super().__init__(**kwargs)
+        self.lease_timeout = lease_timeout
+        self.heartbeat_interval = heartbeat_interval if heartbeat_interval is not None else lease_timeout / 3
+        self.node_id = node_id if node_id is not None else "{}:{}".format(socket.gethostname(), os.getpid())
+
+    def run(self, specifications_to_run: typing.List[Specification],
+            run_and_save_fn: typing.Callable[[Specification], typing.Union[None, Exception]]):
+        self.claims_directory = get_claims_directory(self.get_batch_name())
+        os.makedirs(self.claims_directory, exist_ok=True)
+        self.run_id = self._join_batch_run()
+        self.done_directory = os.path.join(self.claims_directory, self.run_id)
+        os.makedirs(self.done_directory, exist_ok=True)
+        self.specification_ids = [self.get_specification_id(specification) for specification in specifications_to_run]
+        # Indexes to try to claim, and indexes claimed by other runners to check on again later
+        self.unclaimed = collections.deque(range(len(specifications_to_run)))
+        self.claimed_elsewhere = []
+        self.last_checked_elsewhere = time.time()
+        # index -> claim file, for the claims this runner holds
+        self.held_claims = dict()
+        self.held_claims_lock = threading.Lock()
+        stop_heartbeat = threading.Event()
+        heartbeat = threading.Thread(target=self._heartbeat, args=(stop_heartbeat,), daemon=True)
+        heartbeat.start()
+        try:
+            super().run(specifications_to_run, run_and_save_fn)
+        finally:
+            stop_heartbeat.set()
+            heartbeat.join()
+            with self.held_claims_lock:
+                for claim_file in self.held_claims.values():
+                    self._remove(claim_file)
+                self.held_claims = dict()
+        if all(self._is_done(index) for index in range(len(specifications_to_run))):
+            self._end_batch_run()
+
+    def _run_id_file(self):
+        return os.path.join(self.claims_directory, "run-id")
+
+    def _join_batch_run(self) -> typing.AnyStr:
+        """
+        :return: The id of the batch run in progress, or of a new one if there is none
+        """
+        while True:
+            new_run_id = "run-{}".format(uuid.uuid4().hex)
+            # Written aside and linked into place, so the run id file is never seen half written
+            new_file = "{}.new-{}".format(self._run_id_file(), uuid.uuid4().hex)
+            with open(new_file, "w") as f:
+                f.write(new_run_id)
+            try:
+                os.link(new_file, self._run_id_file())
+                return new_run_id
+            except FileExistsError:
+                try:
+                    with open(self._run_id_file()) as f:
+                        return f.read()
+                except FileNotFoundError:
+                    # The batch run ended in between, so start the next one
+                    continue
+            finally:
+                self._remove(new_file)
+
+    def _end_batch_run(self):
+        """
+        Removes the run id file, unless another runner already ended this batch run and started the next one
+        """
+        ended_file = "{}.ended-{}".format(self._run_id_file(), uuid.uuid4().hex)
+        try:
+            os.rename(self._run_id_file(), ended_file)
+        except FileNotFoundError:
+            return
+        try:
+            with open(ended_file) as f:
+                if f.read() != self.run_id:
+                    try:
+                        os.link(ended_file, self._run_id_file())
+                    except FileExistsError:
+                        pass
+        finally:
+            self._remove(ended_file)
+
+    def _claim_file(self, index):
+        return os.path.join(self.claims_directory, self.specification_ids[index] + ".claim")
+
+    def _done_file(self, index):
+        return os.path.join(self.done_directory, self.specification_ids[index] + ".done")
+
+    def _is_done(self, index) -> bool:
+        return os.path.exists(self._done_file(index))
+
+    def _heartbeat(self, stop_heartbeat):
+        while not stop_heartbeat.wait(self.heartbeat_interval):
+            with self.held_claims_lock:
+                for claim_file in self.held_claims.values():
+                    try:
+                        os.utime(claim_file)
+                    except FileNotFoundError:
+                        logging.getLogger("smallab.claim_file_runner").warning(
+                            "Lost the claim {}, another runner took it over".format(claim_file))
+
+    def _try_claim(self, index) -> bool:
+        claim_file = self._claim_file(index)
+        for _ in range(2):
+            try:
+                file_descriptor = os.open(claim_file, os.O_CREAT | os.O_EXCL | os.O_WRONLY)
+            except FileExistsError:
+                if not self._take_over_if_abandoned(claim_file):
+                    return False
+                continue
+            with os.fdopen(file_descriptor, "w") as f:
+                f.write(self.node_id)
+            with self.held_claims_lock:
+                self.held_claims[index] = claim_file
+            return True
+        return False
+
+    def _take_over_if_abandoned(self, claim_file) -> bool:
+        """
+        Removes a claim whose runner stopped touching it. Only one runner can move the claim aside, so only one takes
+        it over.
+        :return: True if the claim was removed
+        """
+        try:
+            if time.time() - os.path.getmtime(claim_file) <= self.lease_timeout:
+                return False
+        except FileNotFoundError:
+            return True
+        abandoned_file = "{}.abandoned-{}".format(claim_file, uuid.uuid4().hex)
+        try:
+            os.rename(claim_file, abandoned_file)
+        except FileNotFoundError:
+            return False
+        try:
+            if time.time() - os.path.getmtime(abandoned_file) <= self.lease_timeout:
+                # Its runner touched it between checking and moving it, so put it back
+                try:
+                    os.link(abandoned_file, claim_file)
+                except FileExistsError:
+                    pass
+                return False
+        finally:
+            self._remove(abandoned_file)
+        logging.getLogger("smallab.claim_file_runner").warning("Taking over the abandoned claim {}".format(claim_file))
+        return True
+
+    def _remove(self, file_location):
+        try:
+            os.remove(file_location)
+        except FileNotFoundError:
+            pass
+
+    def _initially_pending(self, specifications_to_run) -> typing.Iterable[int]:
+        # Specifications are only run once they are claimed
+        return []
+
+    def _has_pending_specifications(self, pending) -> bool:
+        return len(pending) > 0 or len(self.unclaimed) > 0 or len(self.claimed_elsewhere) > 0
+
+    def _next_specification_index(self, pending) -> typing.Optional[int]:
+        if pending:
+            return pending.popleft()
+        if not self.unclaimed and time.time() - self.last_checked_elsewhere >= self.heartbeat_interval:
+            self.unclaimed.extend(self.claimed_elsewhere)
+            self.claimed_elsewhere = []
+            self.last_checked_elsewhere = time.time()
+        while self.unclaimed:
+            index = self.unclaimed.popleft()
+            if self._is_done(index):
+                continue
+            if self._try_claim(index):
+                # It may have finished elsewhere between checking and claiming
+                if self._is_done(index):
+                    self._release(index)
+                    continue
+                return index
+            self.claimed_elsewhere.append(index)
+        return None
+
+    def _release(self, index):
+        with self.held_claims_lock:
+            claim_file = self.held_claims.pop(index, None)
+        if claim_file is not None:
+            self._remove(claim_file)
+
+    def _specification_finished(self, index, exception_thrown):
+        with open(self._done_file(index), "w") as f:
+            f.write(self.node_id)
+        self._release(index)
@@ -1,7 +1,7 @@
 import queue
 import typing
 
-from copy import deepcopy
+from copy import copy, deepcopy
 
 from smallab.callbacks import CallbackManager
 from smallab.experiment_types.experiment import ExperimentBase
@@ -11,13 +11,14 @@ from smallab.runner_implementations.multiprocessing_runner import apply_async
 from smallab.smallab_types import Specification
 
 
-def run(resource, name, experiment, specification, propagate_exceptions, callbacks, force_pickle, eventQueue,diff_namer):
-    experiment_copy = deepcopy(experiment)
+def run(resource, name, experiment, specification, propagate_exceptions, callbacks, force_pickle, eventQueue):
+    # run_and_save makes the real copy, this only keeps the resource off the caller's experiment
+    experiment_copy = copy(experiment)
     experiment_copy.resource = resource
 
     return (specification, resource,
             run_and_save(name, experiment_copy, specification, propagate_exceptions, callbacks, force_pickle,
-                         eventQueue,diff_namer))
+                         eventQueue))
 
 
 class SimpleFixedResourceAllocatorRunner(ComplexAbstractRunner):
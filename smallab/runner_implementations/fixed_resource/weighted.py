@@ -0,0 +1,181 @@
+import logging
+import os
+import queue
+import typing
+
+from smallab.callbacks import CallbackManager
+from smallab.experiment_types.experiment import ExperimentBase
+from smallab.runner_implementations.abstract_runner import ComplexAbstractRunner
+from smallab.runner_implementations.fixed_resource.simple import run
+from smallab.runner_implementations.multiprocessing_runner import apply_async
+from smallab.smallab_types import Specification
+
+
+class ResourceCapacity(object):
+    """
+    Keeps track of the free resources on this computer.
+
+    Each dimension is either a number, which is a pooled amount (cores, gigabytes of memory)
+    or a list, which is a set of distinct resources that are handed out individually (gpu ids, license names).
+    """
+
+    def __init__(self, capacity: typing.Dict[str, typing.Union[typing.SupportsFloat, typing.List]]):
+        self.capacity = capacity
+        self.free = dict()
+        for dimension, amount in capacity.items():
+            if isinstance(amount, (list, tuple)):
+                self.free[dimension] = list(amount)
+            else:
+                self.free[dimension] = amount
+
+    def _total(self, dimension):
+        amount = self.capacity[dimension]
+        if isinstance(amount, (list, tuple)):
+            return len(amount)
+        return amount
+
+    def _available(self, dimension):
+        amount = self.free[dimension]
+        if isinstance(amount, list):
+            return len(amount)
+        return amount
+
+    @staticmethod
+    def _needed(requirements: typing.Dict) -> typing.Dict:
+        # Asking for none of a dimension is the same as not asking for it, even if this computer doesn't have it
+        return {dimension: amount for dimension, amount in requirements.items() if amount != 0}
+
+    def could_ever_fit(self, requirements: typing.Dict) -> bool:
+        """
+        :return: True if the requirements fit on an empty computer. Distinct dimensions only fit whole numbers of items
+        """
+        for dimension, amount in self._needed(requirements).items():
+            if dimension not in self.capacity or amount > self._total(dimension):
+                return False
+            if isinstance(self.capacity[dimension], (list, tuple)) and amount != int(amount):
+                return False
+        return True
+
+    def fits(self, requirements: typing.Dict) -> bool:
+        """
+        :return: True if the requirements fit in what is currently free
+        """
+        for dimension, amount in self._needed(requirements).items():
+            if dimension not in self.free or amount > self._available(dimension):
+                return False
+            if isinstance(self.free[dimension], list) and amount != int(amount):
+                return False
+        return True
+
+    def dominant_share(self, requirements: typing.Dict) -> float:
+        """
+        The largest fraction of any one dimension these requirements use, used to order specifications biggest first
+        """
+        shares = [amount / self._total(dimension) for dimension, amount in requirements.items()
+                  if dimension in self.capacity and self._total(dimension) > 0]
+        return max(shares, default=0)
+
+    def allocate(self, requirements: typing.Dict) -> typing.Dict:
+        """
+        Take the requirements out of the free resources
+        :return: The allocation granted. Pooled dimensions map to the amount granted, distinct dimensions to the list of items granted
+        """
+        assert self.fits(requirements)
+        allocation = dict()
+        for dimension, amount in requirements.items():
+            if dimension not in self.free:
+                # Only allowed for an amount of 0, see fits
+                continue
+            if isinstance(self.free[dimension], list):
+                allocation[dimension] = self.free[dimension][:int(amount)]
+                self.free[dimension] = self.free[dimension][int(amount):]
+            else:
+                allocation[dimension] = amount
+                self.free[dimension] -= amount
+        return allocation
+
+    def release(self, allocation: typing.Dict):
+        """
+        Give an allocation returned by allocate back to the free resources
+        """
+        for dimension, granted in allocation.items():
+            if isinstance(self.free[dimension], list):
+                self.free[dimension].extend(granted)
+            else:
+                self.free[dimension] += granted
+
+
+class WeightedResourceAllocatorRunner(ComplexAbstractRunner):
+    '''
+    This runner packs specifications onto the resources of this computer.
+    Each specification declares how much of each resource it needs through experiment.get_resource_requirements
+    and is started as soon as that much is free. Larger specifications are started first.
+    The granted allocation is set as experiment.resource, like SimpleFixedResourceAllocatorRunner does.
+    '''
+
+    def __init__(self, capacity: typing.Dict[str, typing.Union[typing.SupportsFloat, typing.List]],
+                 max_parallel=None):
+        """
+        :param capacity: The resources of this computer. For example {"cores": 32, "memory": 128, "gpus": [0, 1, 2, 3]}. Numbers are pooled amounts, lists are distinct items handed out individually.
+        :param max_parallel: The most specifications to run at once. Defaults to the number of cpus
+        """
+        self.capacity = capacity
+        self.max_parallel = max_parallel
+
+    def run(self, specifications_to_run: typing.List[Specification], experiment_name: typing.AnyStr,
+            experiment: ExperimentBase, propagate_exceptions: bool, callbacks: typing.List[CallbackManager],
+            force_pickle: bool, eventQueue):
+        capacity = ResourceCapacity(self.capacity)
+        max_parallel = self.max_parallel if self.max_parallel is not None else os.cpu_count()
+        pool = self.get_multiprocessing_context().Pool(max_parallel)
+        finished = queue.Queue()
+
+        completed_specifications = []
+        exceptions = []
+        failed_specifications = []
+
+        specification_queue = []
+        for specification in specifications_to_run:
+            requirements = experiment.get_resource_requirements(specification)
+            if capacity.could_ever_fit(requirements):
+                specification_queue.append((specification, requirements))
+            else:
+                logging.getLogger("smallab.runner").error(
+                    "Specification {} requires {} which is more than the capacity {}".format(
+                        experiment.get_name(specification), requirements, self.capacity))
+                failed_specifications.append(specification)
+                exceptions.append(Exception("Resource requirements {} can never fit in capacity {}".format(
+                    requirements, self.capacity)))
+        specification_queue.sort(key=lambda item: capacity.dominant_share(item[1]), reverse=True)
+
+        number_active = 0
+        try:
+            while specification_queue != [] or number_active > 0:
+                # Start every waiting specification that fits in what is free, biggest first
+                for item in list(specification_queue):
+                    if number_active >= max_parallel:
+                        break
+                    specification, requirements = item
+                    if capacity.fits(requirements):
+                        specification_queue.remove(item)
+                        allocation = capacity.allocate(requirements)
+                        apply_async(pool, run, (
+                            allocation, experiment_name, experiment, specification, propagate_exceptions, callbacks,
+                            force_pickle, eventQueue), callback=finished.put, error_callback=finished.put)
+                        number_active += 1
+                assert number_active > 0, "Nothing is running but waiting specifications do not fit"
+
+                output = finished.get()
+                if isinstance(output, BaseException):
+                    raise output
+                specification, allocation, exception_thrown = output
+                capacity.release(allocation)
+                number_active -= 1
+                if exception_thrown is None:
+                    completed_specifications.append(specification)
+                else:
+                    exceptions.append(exception_thrown)
+                    failed_specifications.append(specification)
+        finally:
+            pool.terminate()
+        self.finish(completed_specifications, failed_specifications, exceptions)
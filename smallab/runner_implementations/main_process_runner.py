@@ -1,8 +1,11 @@
 import logging
+import time
 import typing
 
 from tqdm import tqdm
 
+from smallab.experiment_types.batched_experiment import SpecificationBatch, get_failed_part, merge_failed_part
+from smallab.retry_policy import RetryPolicy
 from smallab.runner_implementations.abstract_runner import SimpleAbstractRunner
 from smallab.smallab_types import Specification
 from smallab.utilities.tqdm_to_logger import TqdmToLogger
@@ -11,20 +14,46 @@ from smallab.utilities.tqdm_to_logger import TqdmToLogger
 class MainRunner(SimpleAbstractRunner):
     """
     The simplest runner which runs each specification in serial on the main process and thread.
+    A failed specification is run again, after its backoff, as its RetryPolicy allows.
     """
 
-    def __init__(self, show_progress=True):
+    def __init__(self, show_progress=True, retry_policy: RetryPolicy = None):
+        """
+        :param show_progress: If true, show a progress bar in the log
+        :param retry_policy: If given, how to retry failed specifications. Experiment.get_retry_policy overrides this
+        """
         super().__init__()
         self.show_progress = show_progress
+        self.retry_policy = retry_policy
 
     def run(self, specifications_to_run: typing.List[Specification], run_and_save_fn):
         completed_specifications = []
         failed_specifications = []
         exceptions = []
+        circuit_breaker = self.get_circuit_breaker()
         for specification in tqdm(specifications_to_run,
                                   file=TqdmToLogger(logging.getLogger("smallab.main_process_runner")),
                                   desc="Experiments", disable=not self.show_progress):
+            if circuit_breaker.is_open():
+                break
+            retry_policy = self.get_retry_policy(specification)
             exception_thrown = run_and_save_fn(specification)
+            circuit_breaker.record(exception_thrown)
+            attempts = 1
+            while exception_thrown is not None and retry_policy is not None and not circuit_breaker.is_open() and \
+                    retry_policy.should_retry(exception_thrown, attempts):
+                time.sleep(retry_policy.get_delay(attempts))
+                if isinstance(specification, SpecificationBatch):
+                    # Only run the specifications of the batch which failed again
+                    failed_part = get_failed_part(specification, exception_thrown)
+                    failed_part_exception = run_and_save_fn(failed_part)
+                    circuit_breaker.record(failed_part_exception)
+                    exception_thrown = merge_failed_part(specification, exception_thrown, failed_part,
+                                                         failed_part_exception)
+                else:
+                    exception_thrown = run_and_save_fn(specification)
+                    circuit_breaker.record(exception_thrown)
+                attempts += 1
 
             if exception_thrown is None:
                 completed_specifications.append(specification)
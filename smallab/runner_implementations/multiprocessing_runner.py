@@ -1,52 +1,360 @@
+import collections
 import datetime
+import heapq
+import itertools
 import logging
+import os
+import queue
+import signal
+import time
 import typing
 
 import dill
 
-from smallab.runner_implementations.abstract_runner import SimpleAbstractRunner
+from smallab.cpu_budget import CpuBudget, run_with_cpu_budget
+from smallab.experiment_types.batched_experiment import SpecificationBatch, get_failed_part, merge_failed_part
+from smallab.experiment_types.checkpointed_experiment import CheckpointedExperiment
+from smallab.retry_policy import RetryPolicy
+from smallab.runner_implementations.abstract_runner import SimpleAbstractRunner, NOT_RUN
+from smallab.runner_implementations.worker_pool import WorkerPool, run_task, get_available_memory, \
+    process_is_alive, TaskFunction
 from smallab.smallab_types import Specification
 
+# Task ids are unique within this process so messages about tasks from an earlier run are never mistaken for this one
+_task_ids = itertools.count()
+
+
+class WorkerDiedException(Exception):
+    """
+    The worker process running a specification exited without finishing it, for example a segfault or the OOM killer
+    """
+    pass
+
+
+class SpecificationTimeoutException(Exception):
+    """
+    A specification ran for longer than its timeout and the worker running it was stopped
+    """
+    pass
+
 
 def run_dill_encoded(payload):
     fun, args = dill.loads(payload)
     return fun(*args)
 
 
-def apply_async(pool, fun, args):
+def apply_async(pool, fun, args, callback=None, error_callback=None):
     payload = dill.dumps((fun, args))
-    return pool.apply_async(run_dill_encoded, (payload,))
+    return pool.apply_async(run_dill_encoded, (payload,), callback=callback, error_callback=error_callback)
 
 
 class MultiprocessingRunner(SimpleAbstractRunner):
     """
     A runner which uses a multiprocessing pool to manage specification running
+
+    If ExperimentRunner.run is given a WorkerPool its workers are used, otherwise a pool is started for this run and
+    shut down after it.
+    Specifications are handed to the workers as they free up rather than all at once, which lets the runner replace
+    workers which grow too large and hold back new specifications while the computer is low on memory.
+    If a worker dies while running a specification (segfault, OOM killer) the pool replaces the worker and the
+    specification fails with a WorkerDiedException, or is run again if worker_death_retries allows.
+    A specification which runs for longer than its timeout has its worker killed and fails with a
+    SpecificationTimeoutException.
+    With speculative_execution, once every specification has started and a worker is idle, another copy of the longest
+    running specification is started. This is only done for CheckpointedExperiments, where the copy picks up from the
+    latest checkpoint; whichever copy finishes first is kept and the other is stopped.
+    A specification which fails, times out or loses its worker is run again as its RetryPolicy allows.
     """
 
-    def __init__(self, num_parallel=None):
+    def __init__(self, num_parallel=None, cpu_budget: CpuBudget = None, max_tasks_per_worker=None,
+                 max_worker_memory=None, min_available_memory=None, worker_death_retries=0, specification_timeout=None,
+                 speculative_execution=False, retry_policy: RetryPolicy = None, poll_interval=0.1):
         """
-        :param mp_override: provide multiprocessing library that should be used. This is done because pytorch has a funky multiprocessing library that could be pased in here
+        :param num_parallel: The number of worker processes. Defaults to the number of cpus
+        :param cpu_budget: If given, the workers share this budget of cores and limit their thread pools to their share
+        :param max_tasks_per_worker: If given, a worker is replaced by a fresh process after running this many specifications
+        :param max_worker_memory: If given, a worker whose resident memory is over this many bytes is replaced by a fresh process before its next specification
+        :param min_available_memory: If given, no new specification is started while the computer has less than this many bytes available, unless nothing is running
+        :param worker_death_retries: How many times to run a specification again after the worker running it dies before failing it
+        :param specification_timeout: If given, seconds a specification may run before it is stopped. Experiment.get_specification_timeout overrides this
+        :param speculative_execution: If true, run a second copy of the slowest checkpointed specification on idle workers at the end of a batch
+        :param retry_policy: If given, how to retry failed specifications. Experiment.get_retry_policy overrides this
+        :param poll_interval: How often in seconds to check on the workers when no specification has finished
         """
         self.num_parallel = num_parallel
+        self.cpu_budget = cpu_budget
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_worker_memory = max_worker_memory
+        self.min_available_memory = min_available_memory
+        self.worker_death_retries = worker_death_retries
+        self.specification_timeout = specification_timeout
+        self.speculative_execution = speculative_execution
+        self.retry_policy = retry_policy
+        self.poll_interval = poll_interval
 
     def run(self, specifications_to_run: typing.List[Specification],
             run_and_save_fn: typing.Callable[[Specification], typing.Union[None, Exception]]):
-        pool = self.get_multiprocessing_context().Pool(self.num_parallel)
-
-        # listener.start()
-        jobs = []
-        for idx, specification in enumerate(specifications_to_run):
-            jobs.append(apply_async(pool, run_and_save_fn, (specification,)))
-        results = []
-        for job in jobs:
-            results.append(job.get())
+        worker_pool = self.get_worker_pool()
+        owns_worker_pool = worker_pool is None
+        if owns_worker_pool:
+            worker_pool = WorkerPool(self.num_parallel, self.get_multiprocessing_context(), self.cpu_budget,
+                                     self.max_tasks_per_worker, self.max_worker_memory)
+        # Each task is then the specification and a reference to run_and_save_fn, which holds the experiment
+        task_function = TaskFunction(run_and_save_fn)
+        try:
+            results = self._dispatch(worker_pool, specifications_to_run, task_function)
+        finally:
+            task_function.close()
+            if owns_worker_pool:
+                worker_pool.shutdown(wait=False)
         completed_specifications = []
         exceptions = []
         failed_specifications = []
         for specification, exception_thrown in zip(specifications_to_run, results):
+            if exception_thrown is NOT_RUN:
+                continue
             if exception_thrown is None:
                 completed_specifications.append(specification)
             else:
                 exceptions.append(exception_thrown)
                 failed_specifications.append(specification)
         self.finish(completed_specifications, failed_specifications, exceptions)
+
+    def _dispatch(self, worker_pool: WorkerPool, specifications_to_run, run_and_save_fn):
+        """
+        Hands specifications to the workers as they free up until all of them have run
+        :return: What run_and_save_fn returned for each specification in order, or NOT_RUN if the circuit breaker
+        opened before it started
+        """
+        pool = worker_pool.get_pool()
+        control_queue = worker_pool.get_control_queue()
+        num_workers = worker_pool.get_num_workers()
+        logger = logging.getLogger("smallab.multiprocessing_runner")
+        finished = queue.Queue()
+        results = [NOT_RUN] * len(specifications_to_run)
+        circuit_breaker = self.get_circuit_breaker()
+        timeouts = [self._get_timeout(specification) for specification in specifications_to_run]
+        retry_policies = [self.get_retry_policy(specification) for specification in specifications_to_run]
+        attempts = collections.Counter()
+        # (when to run it again, index, why it failed) of failed specifications waiting to be retried
+        retrying = []
+        # index -> (why the batch failed, the part of it which failed and is run again) of retried batches
+        failed_parts = dict()
+        speculate = self.speculative_execution and isinstance(self.get_experiment(), CheckpointedExperiment)
+        # Indexes of the specifications which have a result, any other copy of them still running is not needed
+        done = set()
+        speculated = set()
+        pending = collections.deque(self._initially_pending(specifications_to_run))
+        # task id -> index of the specification it is running. A specification run speculatively has two tasks
+        in_flight = dict()
+        # task id -> (pid of the worker running it, when it started), once the worker has started it
+        started = dict()
+        # pid -> the last task the worker said it started. If a worker has moved on its earlier tasks have returned
+        running_on = dict()
+        # task id -> when its worker was first seen dead. A worker can exit right after returning (maxtasksperchild),
+        # so the task is only lost if its result doesn't arrive shortly after
+        seen_dead = dict()
+        worker_deaths = collections.Counter()
+        paused_for_memory = False
+
+        def to_run(index):
+            return failed_parts[index][1] if index in failed_parts else specifications_to_run[index]
+
+        def merge(index, exception_thrown):
+            # What a retried batch returned only covers the part of it which had failed
+            if index not in failed_parts:
+                return exception_thrown
+            batch_exception, failed_part = failed_parts[index]
+            return merge_failed_part(specifications_to_run[index], batch_exception, failed_part, exception_thrown)
+
+        def submit(index):
+            task_id = next(_task_ids)
+            in_flight[task_id] = index
+            payload = dill.dumps((run_with_cpu_budget, (run_and_save_fn, to_run(index))))
+            pool.apply_async(run_task, (task_id, payload), callback=finished.put,
+                             error_callback=lambda e, task_id=task_id: finished.put((task_id, e, True)))
+
+        def kill(task_id):
+            pid, _ = started.pop(task_id)
+            del running_on[pid]
+            seen_dead.pop(task_id, None)
+            worker_pool.abandoned_tasks += 1
+            try:
+                os.kill(pid, signal.SIGKILL)
+            except ProcessLookupError:
+                pass
+            worker_pool.release_worker(pid)
+            return in_flight.pop(task_id)
+
+        def retry(index, exception):
+            # A task of this specification failed, which only matters if no other copy of it is still running
+            if index in done or index in in_flight.values():
+                return True
+            attempts[index] += 1
+            retry_policy = retry_policies[index]
+            if retry_policy is None or circuit_breaker.is_open() or \
+                    not retry_policy.should_retry(exception, attempts[index]):
+                return False
+            delay = retry_policy.get_delay(attempts[index])
+            if isinstance(specifications_to_run[index], SpecificationBatch):
+                failed_parts[index] = (exception, get_failed_part(specifications_to_run[index], exception))
+            logger.warning("{} failed with {!r}, retrying in {}s".format(specifications_to_run[index], exception,
+                                                                          delay))
+            heapq.heappush(retrying, (time.time() + delay, index, exception))
+            return True
+
+        def settle(index, exception_thrown):
+            done.add(index)
+            results[index] = exception_thrown
+            self._specification_finished(index, exception_thrown)
+
+        def lose(index, exception):
+            if index in done or index in in_flight.values():
+                return
+            circuit_breaker.record(exception)
+            lost = to_run(index)
+            exception_thrown = merge(index, exception)
+            if not retry(index, exception_thrown):
+                settle(index, exception_thrown)
+                self.get_failure_fn()(lost, exception)
+
+        def more_to_start():
+            return not circuit_breaker.is_open() and self._has_pending_specifications(pending)
+
+        while more_to_start() or in_flight or retrying:
+            if circuit_breaker.is_open() and (pending or retrying):
+                pending.clear()
+                for _, index, exception in retrying:
+                    settle(index, exception)
+                retrying.clear()
+            while retrying and retrying[0][0] <= time.time():
+                pending.append(heapq.heappop(retrying)[1])
+            while more_to_start() and len(in_flight) < num_workers:
+                if not self._has_memory_to_dispatch(len(in_flight)):
+                    if not paused_for_memory:
+                        logger.warning("Available memory is below {} bytes, waiting to start more specifications".format(
+                            self.min_available_memory))
+                    paused_for_memory = True
+                    break
+                paused_for_memory = False
+                index = self._next_specification_index(pending)
+                if index is None:
+                    break
+                submit(index)
+
+            if speculate and not more_to_start() and len(in_flight) < num_workers and not circuit_breaker.is_open():
+                candidates = [(start_time, in_flight[task_id]) for task_id, (_, start_time) in started.items()
+                              if in_flight[task_id] not in speculated and in_flight[task_id] not in done]
+                if candidates:
+                    _, index = min(candidates)
+                    logger.info("Speculatively running another copy of {}".format(specifications_to_run[index]))
+                    speculated.add(index)
+                    submit(index)
+
+            try:
+                output = finished.get(timeout=self.poll_interval)
+                while True:
+                    if len(output) == 3:
+                        # Only raised when exceptions are propagated
+                        raise output[1]
+                    task_id, exception_thrown = output
+                    if task_id in in_flight:
+                        index = in_flight.pop(task_id)
+                        started.pop(task_id, None)
+                        seen_dead.pop(task_id, None)
+                        if index not in done:
+                            circuit_breaker.record(exception_thrown)
+                            exception_thrown = merge(index, exception_thrown)
+                        if index not in done and (exception_thrown is None or not retry(index, exception_thrown)):
+                            settle(index, exception_thrown)
+                            for other_task_id, other_index in list(in_flight.items()):
+                                if other_index == index and other_task_id in started and \
+                                        running_on.get(started[other_task_id][0]) == other_task_id:
+                                    kill(other_task_id)
+                    output = finished.get_nowait()
+            except queue.Empty:
+                pass
+
+            while not control_queue.empty():
+                message, task_id, pid = control_queue.get()
+                if task_id not in in_flight:
+                    continue
+                if message == "start":
+                    started[task_id] = (pid, time.time())
+                    running_on[pid] = task_id
+                    if in_flight[task_id] in done:
+                        kill(task_id)
+                elif message == "recycle":
+                    logger.info("Replacing worker {} which is using too much memory".format(pid))
+                    worker_pool.abandoned_tasks += 1
+                    pending.appendleft(in_flight.pop(task_id))
+
+            for task_id, (pid, start_time) in list(started.items()):
+                if running_on.get(pid) != task_id:
+                    # The worker has moved on, so this task's result is on its way
+                    continue
+                index = in_flight[task_id]
+                if timeouts[index] is not None and time.time() - start_time > timeouts[index]:
+                    logger.warning("Stopping {} which has run for over {}s".format(specifications_to_run[index],
+                                                                                 timeouts[index]))
+                    kill(task_id)
+                    lose(index, SpecificationTimeoutException(
+                        "{} did not finish within {}s".format(specifications_to_run[index], timeouts[index])))
+                    continue
+                if process_is_alive(pid):
+                    continue
+                if time.time() - seen_dead.setdefault(task_id, time.time()) < 1.0:
+                    continue
+                del started[task_id]
+                del running_on[pid]
+                del seen_dead[task_id]
+                del in_flight[task_id]
+                worker_pool.abandoned_tasks += 1
+                worker_pool.release_worker(pid)
+                worker_deaths[index] += 1
+                if worker_deaths[index] <= self.worker_death_retries and index not in done:
+                    logger.warning("Worker {} died running {}, running it again".format(pid,
+                                                                                      specifications_to_run[index]))
+                    pending.appendleft(index)
+                else:
+                    lose(index, WorkerDiedException("Worker {} died running {}".format(pid,
+                                                                                       specifications_to_run[index])))
+        return results
+
+    def _initially_pending(self, specifications_to_run) -> typing.Iterable[int]:
+        """
+        :return: Indexes of the specifications to start, in the order to start them
+        """
+        return range(len(specifications_to_run))
+
+    def _has_pending_specifications(self, pending) -> bool:
+        """
+        :param pending: Indexes of the specifications waiting to start, including ones to run again
+        :return: True if there may be more specifications to start
+        """
+        return len(pending) > 0
+
+    def _next_specification_index(self, pending) -> typing.Optional[int]:
+        """
+        :param pending: Indexes of the specifications waiting to start, including ones to run again
+        :return: The index of the next specification to start, or None if there isn't one
+        """
+        return pending.popleft() if pending else None
+
+    def _specification_finished(self, index, exception_thrown):
+        """
+        Called once a specification has its final result, after any retries
+        :param index: The index of the specification
+        :param exception_thrown: Why it failed, or None if it completed
+        """
+        pass
+
+    def _get_timeout(self, specification):
+        timeout = self.get_experiment().get_specification_timeout(specification)
+        return timeout if timeout is not None else self.specification_timeout
+
+    def _has_memory_to_dispatch(self, number_in_flight):
+        if self.min_available_memory is None or number_in_flight == 0:
+            return True
+        available_memory = get_available_memory()
+        return available_memory is None or available_memory >= self.min_available_memory
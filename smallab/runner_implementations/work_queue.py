@@ -0,0 +1,327 @@
+import collections
+import multiprocessing
+import socket
+import threading
+import time
+import typing
+from multiprocessing.managers import BaseManager
+
+import os
+
+from smallab.circuit_breaker import get_failure_signature
+from smallab.experiment_types.batched_experiment import BatchedExperiment
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.smallab_types import Specification
+
+
+class WorkQueue(object):
+    """
+    The queue of specifications and manifest of results served by a WorkQueueCoordinator.
+    Lives in the coordinator's server process, WorkQueueRunners use it through a proxy.
+    """
+
+    def __init__(self, specifications: typing.List[Specification], lease_timeout: float = None):
+        """
+        :param specifications: Every specification of the batch
+        :param lease_timeout: If given, a specification which hasn't finished this many seconds after it was handed out is handed out again, in case the node running it died
+        """
+        self.specifications = list(specifications)
+        self.lease_timeout = lease_timeout
+        self.pending = collections.deque(range(len(self.specifications)))
+        # index -> (worker id, when it was handed out)
+        self.leases = dict()
+        self.completed = set()
+        # index -> failure signature
+        self.failed = dict()
+        self.lock = threading.Lock()
+
+    def get_specifications(self) -> typing.List[Specification]:
+        return self.specifications
+
+    def get_lease_timeout(self) -> typing.Optional[float]:
+        return self.lease_timeout
+
+    def next_specification(self, worker_id: typing.AnyStr) -> typing.Optional[typing.Tuple[int, Specification]]:
+        """
+        :param worker_id: Who is asking, recorded in the manifest
+        :return: The index and specification to run next, or None if there is nothing left to hand out
+        """
+        with self.lock:
+            if self.lease_timeout is not None:
+                now = time.time()
+                for index, (_, leased_at) in list(self.leases.items()):
+                    if now - leased_at > self.lease_timeout:
+                        del self.leases[index]
+                        self.pending.append(index)
+            if not self.pending:
+                return None
+            index = self.pending.popleft()
+            self.leases[index] = (worker_id, time.time())
+            return index, self.specifications[index]
+
+    def renew(self, indexes: typing.List[int], worker_id: typing.AnyStr):
+        """
+        Restart the lease timeout of specifications a worker is still running, so they aren't handed out again
+        :param indexes: The indexes the worker was handed out
+        :param worker_id: The worker, leases handed out again to someone else are left alone
+        """
+        with self.lock:
+            now = time.time()
+            for index in indexes:
+                lease = self.leases.get(index)
+                if lease is not None and lease[0] == worker_id:
+                    self.leases[index] = (worker_id, now)
+
+    def complete(self, index: int):
+        with self.lock:
+            self.leases.pop(index, None)
+            self.failed.pop(index, None)
+            self.completed.add(index)
+            self._remove_pending(index)
+
+    def fail(self, index: int, failure: typing.AnyStr):
+        """
+        :param failure: A description of why it failed
+        """
+        with self.lock:
+            self.leases.pop(index, None)
+            if index not in self.completed:
+                self.failed[index] = failure
+            self._remove_pending(index)
+
+    def _remove_pending(self, index):
+        # A specification handed out again after its lease ran out can still be finished by its first worker
+        try:
+            self.pending.remove(index)
+        except ValueError:
+            pass
+
+    def is_finished(self) -> bool:
+        """
+        :return: True once every specification has completed or failed
+        """
+        with self.lock:
+            return len(self.completed) + len(self.failed) == len(self.specifications)
+
+    def get_manifest(self) -> typing.Dict:
+        """
+        :return: The completed, failed (with why), running (with which worker) and pending specifications
+        """
+        with self.lock:
+            return {"completed": [self.specifications[index] for index in sorted(self.completed)],
+                    "failed": [(self.specifications[index], failure) for index, failure in sorted(self.failed.items())],
+                    "running": [(self.specifications[index], worker_id) for index, (worker_id, _) in
+                                sorted(self.leases.items())],
+                    "pending": [self.specifications[index] for index in self.pending]}
+
+
+class _WorkQueueClient(BaseManager):
+    pass
+
+
+_WorkQueueClient.register("get_work_queue")
+
+
+def connect_to_work_queue(address: typing.Tuple[typing.AnyStr, int], authkey: bytes):
+    """
+    :param authkey: The coordinator's authkey, see WorkQueueCoordinator.get_authkey
+    :return: A proxy to the WorkQueue served at address
+    """
+    client = _WorkQueueClient(address=address, authkey=authkey)
+    client.connect()
+    return client.get_work_queue()
+
+
+class WorkQueueCoordinator(object):
+    """
+    Serves a batch of specifications over TCP so ExperimentRunners on any number of computers pull them as they have
+    room, instead of each computer getting a fixed share (see MultiComputerGenerator).
+
+    Anyone who can connect with the authkey can run code on the coordinator, since what nodes send is unpickled. Listen
+    on an address only the computers doing work can reach, and give them the authkey over a secure channel.
+
+    On one computer:
+    coordinator = WorkQueueCoordinator(specifications, ("10.0.0.5", 5000))
+    print(coordinator.get_authkey().hex())
+    coordinator.serve_forever()
+
+    On every computer doing work:
+    specification_runner = WorkQueueRunner(("10.0.0.5", 5000), bytes.fromhex(authkey_hex))
+    runner.run(name, specification_runner.get_specifications(), experiment, specification_runner=specification_runner)
+    """
+
+    def __init__(self, specifications: typing.List[Specification], address=("127.0.0.1", 0),
+                 authkey: bytes = None, lease_timeout: float = None):
+        """
+        :param specifications: Every specification of the batch
+        :param address: The (host, port) to listen on. Port 0 picks a free port, see get_address
+        :param authkey: Secret nodes must use to connect. Defaults to a random one, see get_authkey
+        :param lease_timeout: See WorkQueue
+        """
+        self.work_queue = WorkQueue(specifications, lease_timeout)
+        self.authkey = authkey if authkey is not None else os.urandom(32)
+        # Registered on a class of its own so each coordinator serves its own queue
+        manager_class = type("_WorkQueueServer", (BaseManager,), {})
+        manager_class.register("get_work_queue", callable=lambda: self.work_queue)
+        self.manager = manager_class(address=address, authkey=self.authkey, ctx=multiprocessing.get_context("fork"))
+        self.started = False
+
+    def start(self) -> typing.Tuple[typing.AnyStr, int]:
+        """
+        Serve the queue from a background process
+        :return: The address workers should connect to
+        """
+        self.manager.start()
+        self.started = True
+        return self.get_address()
+
+    def serve_forever(self):
+        """
+        Serve the queue from this process until it is killed
+        """
+        self.manager.get_server().serve_forever()
+
+    def get_address(self) -> typing.Tuple[typing.AnyStr, int]:
+        return self.manager.address
+
+    def get_authkey(self) -> bytes:
+        """
+        :return: The secret nodes must give WorkQueueRunner to connect
+        """
+        return self.authkey
+
+    def get_work_queue(self):
+        """
+        :return: A proxy to the served WorkQueue, to follow the batch from the coordinator
+        """
+        return self.manager.get_work_queue()
+
+    def shutdown(self):
+        if self.started:
+            self.manager.shutdown()
+            self.started = False
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
+
+
+class WorkQueueRunner(MultiprocessingRunner):
+    """
+    A MultiprocessingRunner which pulls specifications from a WorkQueueCoordinator whenever a worker is free, and
+    reports each result back to it.
+
+    Run it with the specifications from get_specifications. A specification handed out by the coordinator which has
+    already completed on this computer (for example on a shared file system) is reported complete without running it.
+    Specifications this runner was never handed are neither completed nor failed here.
+
+    A runner keeps asking for work until the whole batch has finished, so it picks up specifications whose lease ran out
+    on a node which died. While it runs a specification it renews the lease so it isn't handed out again.
+    """
+
+    def __init__(self, address: typing.Tuple[typing.AnyStr, int], authkey: bytes,
+                 worker_id: typing.AnyStr = None, wait_interval: float = 1, heartbeat_interval: float = None,
+                 **kwargs):
+        """
+        :param address: The (host, port) of the coordinator
+        :param authkey: The coordinator's authkey, see WorkQueueCoordinator.get_authkey
+        :param worker_id: How this computer is named in the manifest. Defaults to hostname:pid
+        :param wait_interval: Seconds between asking the coordinator again when it has nothing to hand out but the batch hasn't finished
+        :param heartbeat_interval: Seconds between renewing the leases this runner holds. Defaults to a third of the coordinator's lease_timeout
+        :param kwargs: Passed to MultiprocessingRunner
+        """
+        super().__init__(**kwargs)
+        self.address = address
+        self.authkey = authkey
+        self.worker_id = worker_id if worker_id is not None else "{}:{}".format(socket.gethostname(), os.getpid())
+        self.wait_interval = wait_interval
+        self.heartbeat_interval = heartbeat_interval
+
+    def get_specifications(self) -> typing.List[Specification]:
+        """
+        :return: Every specification of the coordinator's batch
+        """
+        return connect_to_work_queue(self.address, self.authkey).get_specifications()
+
+    def run(self, specifications_to_run: typing.List[Specification],
+            run_and_save_fn: typing.Callable[[Specification], typing.Union[None, Exception]]):
+        experiment = self.get_experiment()
+        if isinstance(experiment, BatchedExperiment):
+            raise Exception("WorkQueueRunner hands out single specifications and can't run a BatchedExperiment")
+        self.work_queue = connect_to_work_queue(self.address, self.authkey)
+        self.local_indexes = {experiment.get_name(specification): index
+                              for index, specification in enumerate(specifications_to_run)}
+        # local index -> the coordinator's index
+        self.remote_indexes = dict()
+        # The coordinator's indexes of the specifications this runner is running
+        self.held_leases = set()
+        self.held_leases_lock = threading.Lock()
+        self.finished = False
+        self.next_ask = 0
+        heartbeat_interval = self.heartbeat_interval
+        lease_timeout = self.work_queue.get_lease_timeout()
+        if heartbeat_interval is None and lease_timeout is not None:
+            heartbeat_interval = lease_timeout / 3
+        stop_heartbeat = threading.Event()
+        heartbeat = None
+        if heartbeat_interval is not None:
+            heartbeat = threading.Thread(target=self._heartbeat, args=(stop_heartbeat, heartbeat_interval),
+                                         daemon=True)
+            heartbeat.start()
+        try:
+            super().run(specifications_to_run, run_and_save_fn)
+        finally:
+            stop_heartbeat.set()
+            if heartbeat is not None:
+                heartbeat.join()
+
+    def _heartbeat(self, stop_heartbeat, heartbeat_interval):
+        # The proxy opens a connection of its own for this thread
+        while not stop_heartbeat.wait(heartbeat_interval):
+            with self.held_leases_lock:
+                held_leases = list(self.held_leases)
+            if held_leases:
+                self.work_queue.renew(held_leases, self.worker_id)
+
+    def _initially_pending(self, specifications_to_run) -> typing.Iterable[int]:
+        # Specifications are only run once the coordinator hands them out
+        return []
+
+    def _has_pending_specifications(self, pending) -> bool:
+        return len(pending) > 0 or not self.finished
+
+    def _next_specification_index(self, pending) -> typing.Optional[int]:
+        if pending:
+            return pending.popleft()
+        # Nothing was left to hand out last time, leases held elsewhere may run out or finish in the meantime
+        if self.finished or time.time() < self.next_ask:
+            return None
+        while True:
+            handed_out = self.work_queue.next_specification(self.worker_id)
+            if handed_out is None:
+                self.finished = self.work_queue.is_finished()
+                self.next_ask = time.time() + self.wait_interval
+                return None
+            remote_index, specification = handed_out
+            index = self.local_indexes.get(self.get_experiment().get_name(specification))
+            if index is None:
+                self.work_queue.complete(remote_index)
+                continue
+            self.remote_indexes[index] = remote_index
+            with self.held_leases_lock:
+                self.held_leases.add(remote_index)
+            return index
+
+    def _specification_finished(self, index, exception_thrown):
+        remote_index = self.remote_indexes.get(index)
+        if remote_index is None:
+            return
+        with self.held_leases_lock:
+            self.held_leases.discard(remote_index)
+        if exception_thrown is None:
+            self.work_queue.complete(remote_index)
+        else:
+            self.work_queue.fail(remote_index, get_failure_signature(exception_thrown))
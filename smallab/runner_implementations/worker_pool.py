@@ -0,0 +1,309 @@
+import logging
+import os
+import tempfile
+import threading
+import typing
+import uuid
+
+import dill
+
+from smallab.cpu_budget import CpuBudget
+
+# Lives as long as the process it is in, which for a worker of a WorkerPool is across ExperimentRunner.run calls
+_worker_cache = dict()
+_worker_setup_lock = threading.Lock()
+
+# TaskFunction token -> the function, in the process which loaded it
+_task_functions = dict()
+
+# Set in each worker process by _initialize_worker
+_control_queue = None
+_max_worker_memory = None
+_tasks_run = 0
+
+
+def get_worker_cache() -> typing.Dict:
+    """
+    A dictionary local to the current process for caching things which are expensive to build (models, datasets...).
+    Workers of a WorkerPool keep it between ExperimentRunner.run calls.
+    """
+    return _worker_cache
+
+
+def setup_worker_once(experiment):
+    """
+    Calls experiment.setup_worker the first time this process runs a specification of an experiment with this
+    worker setup key (see Experiment.get_worker_setup_key)
+    :return: What setup_worker returned
+    """
+    worker_setup_key = getattr(experiment, "worker_setup_key", None)
+    if worker_setup_key is None:
+        worker_setup_key = experiment.get_worker_setup_key()
+    key = ("setup_worker", worker_setup_key)
+    with _worker_setup_lock:
+        if key not in _worker_cache:
+            _worker_cache[key] = experiment.setup_worker()
+        return _worker_cache[key]
+
+
+def clear_worker_setups(keep: typing.Iterable = ()):
+    """
+    Forget what setup_worker returned in this process, so the next specification calls it again
+    :param keep: Keys of the worker cache to keep, such as the ones there before a run started
+    """
+    keep = set(keep)
+    with _worker_setup_lock:
+        for key in list(_worker_cache):
+            if isinstance(key, tuple) and key[0] == "setup_worker" and key not in keep:
+                del _worker_cache[key]
+
+
+class TaskFunction(object):
+    """
+    A function which is sent to each worker once instead of with every task, such as the function which runs a
+    specification, which holds the experiment.
+
+    The function is dill encoded to a file when this is made, and only the token and location of the file are pickled.
+    A worker loads the function the first time it is called, and calls the same function for every later task, so the
+    experiment (and the attributes it shares between specifications) is only rebuilt once per worker per run.
+    """
+
+    def __init__(self, function: typing.Callable, folder: typing.AnyStr = None):
+        """
+        :param function: The function to send to the workers
+        :param folder: Where to write the function, defaults to the temporary directory
+        """
+        self.token = uuid.uuid4().hex
+        self.location = os.path.join(folder if folder is not None else tempfile.gettempdir(),
+                                     "smallab-task-function-{}.dill".format(self.token))
+        with open(self.location, "wb") as f:
+            dill.dump(function, f)
+        _task_functions[self.token] = function
+
+    def __getstate__(self):
+        return {"token": self.token, "location": self.location}
+
+    def __call__(self, *args):
+        function = _task_functions.get(self.token)
+        if function is None:
+            with open(self.location, "rb") as f:
+                function = dill.load(f)
+            # A worker only runs the tasks of one run at a time, so the functions of earlier runs can be let go
+            _task_functions.clear()
+            _task_functions[self.token] = function
+        return function(*args)
+
+    def close(self):
+        """
+        Delete the file the function was written to. Called in the process which made this once no task needs it
+        """
+        _task_functions.pop(self.token, None)
+        try:
+            os.remove(self.location)
+        except FileNotFoundError:
+            pass
+
+
+def get_process_memory() -> int:
+    """
+    :return: The resident memory of this process in bytes
+    """
+    try:
+        with open("/proc/self/statm") as f:
+            return int(f.read().split()[1]) * os.sysconf("SC_PAGE_SIZE")
+    except (OSError, ValueError):
+        # Not linux, fall back on the peak resident memory
+        import resource
+        return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss * 1024
+
+
+def get_available_memory() -> typing.Optional[int]:
+    """
+    :return: The memory available on this computer in bytes, or None if it can't be read
+    """
+    try:
+        with open("/proc/meminfo") as f:
+            for line in f:
+                if line.startswith("MemAvailable:"):
+                    return int(line.split()[1]) * 1024
+    except (OSError, ValueError):
+        pass
+    return None
+
+
+def process_is_alive(pid) -> bool:
+    """
+    :return: False if the process with this pid has exited, even if it has not been reaped yet
+    """
+    try:
+        os.kill(pid, 0)
+    except ProcessLookupError:
+        return False
+    except PermissionError:
+        return True
+    try:
+        with open("/proc/{}/stat".format(pid)) as f:
+            # The state comes after the executable name, which is in parentheses
+            return f.read().rsplit(")", 1)[1].split()[0] != "Z"
+    except (OSError, IndexError):
+        return True
+
+
+def _initialize_worker(control_queue, max_worker_memory, cpu_budget):
+    global _control_queue, _max_worker_memory, _tasks_run
+    _control_queue = control_queue
+    _max_worker_memory = max_worker_memory
+    _tasks_run = 0
+    if cpu_budget is not None:
+        cpu_budget.initialize_worker()
+
+
+def _run_once_per_worker(function, barrier, timeout):
+    function()
+    try:
+        # Holds this worker until every worker has taken one of these tasks, so each runs the function once
+        barrier.wait(timeout)
+    except threading.BrokenBarrierError:
+        pass
+
+
+def run_task(task_id, payload):
+    """
+    Runs a dill encoded (function, arguments) payload in a worker of a WorkerPool.
+    Before running it tells the runner which process the task is in, so the runner notices if the process dies.
+
+    If this worker has grown past max_worker_memory it hands the task back on the control queue and exits instead, so
+    the pool replaces it with a fresh process and the runner gives the task to another worker.
+    :return: The task id and what the function returned
+    """
+    global _tasks_run
+    if _max_worker_memory is not None and _tasks_run > 0 and get_process_memory() > _max_worker_memory:
+        _control_queue.put(("recycle", task_id, os.getpid()))
+        os._exit(0)
+    _control_queue.put(("start", task_id, os.getpid()))
+    _tasks_run += 1
+    fun, args = dill.loads(payload)
+    return task_id, fun(*args)
+
+
+class WorkerPool(object):
+    """
+    A pool of worker processes which outlives a single ExperimentRunner.run call.
+
+    Pass the same WorkerPool to successive runs to keep the workers, their imports and their caches warm instead of
+    starting new processes every run. The pool starts on first use and must be shut down explicitly with shutdown,
+    or used as a context manager.
+
+    with WorkerPool(8) as worker_pool:
+        runner.run("batch_1", specifications_1, experiment, worker_pool=worker_pool)
+        runner.run("batch_2", specifications_2, experiment, worker_pool=worker_pool)
+    """
+
+    def __init__(self, num_parallel=None, ctx=None, cpu_budget: CpuBudget = None, max_tasks_per_worker=None,
+                 max_worker_memory=None):
+        """
+        :param num_parallel: The number of worker processes. Defaults to the number of cpus
+        :param ctx: The multiprocessing context to start workers with. Defaults to the fork context
+        :param cpu_budget: If given, the workers share this budget of cores (see MultiprocessingRunner)
+        :param max_tasks_per_worker: If given, a worker is replaced by a fresh process after running this many specifications
+        :param max_worker_memory: If given, a worker whose resident memory is over this many bytes is replaced by a fresh process before its next specification
+        """
+        if ctx is None:
+            import multiprocessing
+            ctx = multiprocessing.get_context("fork")
+        self.ctx = ctx
+        self.num_parallel = num_parallel
+        self.cpu_budget = cpu_budget
+        self.max_tasks_per_worker = max_tasks_per_worker
+        self.max_worker_memory = max_worker_memory
+        self.pool = None
+        self.manager = None
+        self.control_queue = None
+        # Tasks given to the pool whose worker exited without returning, the pool can't be closed gracefully with these
+        self.abandoned_tasks = 0
+
+    def get_multiprocessing_context(self):
+        return self.ctx
+
+    def get_num_workers(self) -> int:
+        return self.num_parallel if self.num_parallel is not None else os.cpu_count()
+
+    def get_pool(self):
+        """
+        :return: The multiprocessing pool of workers, started the first time this is called
+        """
+        if self.pool is None:
+            self.control_queue = self.ctx.SimpleQueue()
+            if self.cpu_budget is not None:
+                self.cpu_budget.bind(self.ctx, self.get_num_workers())
+            self.pool = self.ctx.Pool(self.get_num_workers(), initializer=_initialize_worker,
+                                      initargs=(self.control_queue, self.max_worker_memory, self.cpu_budget),
+                                      maxtasksperchild=self.max_tasks_per_worker)
+        return self.pool
+
+    def get_control_queue(self):
+        """
+        :return: The queue workers send messages about their tasks to the runner on, see run_task
+        """
+        self.get_pool()
+        return self.control_queue
+
+    def release_worker(self, pid):
+        """
+        Give back the cores of the cpu budget held by a worker which was killed or died
+        """
+        if self.cpu_budget is not None and self.pool is not None:
+            self.cpu_budget.release_worker(pid)
+
+    def run_on_each_worker(self, function: typing.Callable, timeout: float = 10):
+        """
+        Run a function once in every worker, for example to let go of what a run left in the workers.
+        Only call it between runs, while the workers are idle. Does nothing if the pool hasn't started
+        :param function: A picklable function which takes no arguments
+        :param timeout: The most seconds to wait for every worker to run it
+        """
+        if self.pool is None:
+            return
+        num_workers = self.get_num_workers()
+        barrier = self.get_manager().Barrier(num_workers)
+        results = [self.pool.apply_async(_run_once_per_worker, (function, barrier, timeout))
+                   for _ in range(num_workers)]
+        for result in results:
+            try:
+                result.get(timeout + 1)
+            except Exception as e:
+                logging.getLogger("smallab.worker_pool").warning(
+                    "{} didn't run in every worker: {!r}".format(function, e))
+                break
+
+    def get_manager(self):
+        """
+        :return: A multiprocessing manager which lives as long as this pool, started the first time this is called
+        """
+        if self.manager is None:
+            self.manager = self.ctx.Manager()
+        return self.manager
+
+    def shutdown(self, wait=True):
+        """
+        Stop the workers and the manager. The pool will start again if it is used after this.
+        :param wait: If true, let the workers finish what they were given first. If false, stop them immediately
+        """
+        if self.pool is not None:
+            if wait and self.abandoned_tasks == 0:
+                self.pool.close()
+            else:
+                self.pool.terminate()
+            self.pool.join()
+            self.pool = None
+            self.control_queue = None
+            self.abandoned_tasks = 0
+        if self.manager is not None:
+            self.manager.shutdown()
+            self.manager = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.shutdown()
@@ -0,0 +1,157 @@
+import os
+import typing
+import uuid
+
+import numpy as np
+
+from smallab.file_locations import get_experiment_local_storage
+
+try:
+    from multiprocessing import resource_tracker, shared_memory
+except ImportError:
+    shared_memory = None
+
+SHARED_MEMORY = "shared_memory"
+MEMMAP = "memmap"
+
+# Arrays attached in this process, by array name, so each process maps an array once
+_attached = dict()
+
+
+def _attach_untracked(shared_memory_name):
+    # Attaching registers the memory with the resource tracker, which would unlink it when this worker exits
+    # even though the main process owns it
+    try:
+        return shared_memory.SharedMemory(name=shared_memory_name, track=False)
+    except TypeError:
+        register = resource_tracker.register
+        resource_tracker.register = lambda *args, **kwargs: None
+        try:
+            return shared_memory.SharedMemory(name=shared_memory_name)
+        finally:
+            resource_tracker.register = register
+
+
+def release_attachments():
+    """
+    Let go of every array attached in this process. Run in each worker of a WorkerPool when a run ends, since shared
+    memory and memory mapped files are only freed once no process maps them
+    """
+    attached = list(_attached.values())
+    _attached.clear()
+    while attached:
+        _, array, shm = attached.pop()
+        del array
+        if shm is not None:
+            try:
+                shm.close()
+            except BufferError:
+                # Something still holds a view of the array, the memory is unmapped once it lets go
+                pass
+
+
+class SharedArrayDescriptor(object):
+    """
+    The small, picklable description of a published array which is sent to the workers in place of the array itself
+    """
+
+    def __init__(self, array_name, backend, location, shape, dtype):
+        self.array_name = array_name
+        self.backend = backend
+        self.location = location
+        self.shape = shape
+        self.dtype = dtype
+
+    def attach(self) -> np.ndarray:
+        """
+        Map the published array into this process without copying it
+        :return: A read only numpy array
+        """
+        cached = _attached.get(self.array_name)
+        if cached is not None and cached[0] == self.location:
+            return cached[1]
+        if self.backend == SHARED_MEMORY:
+            shm = _attach_untracked(self.location)
+            array = np.ndarray(self.shape, np.dtype(self.dtype), buffer=shm.buf)
+            array.flags.writeable = False
+            _attached[self.array_name] = (self.location, array, shm)
+        else:
+            array = np.load(self.location, mmap_mode="r")
+            _attached[self.array_name] = (self.location, array, None)
+        return array
+
+
+class SharedArrayRegistry(object):
+    """
+    Named, read only numpy arrays shared between the main process and every worker without copying.
+
+    Arrays are published once on the runner, put into shared memory (or a memory mapped file in the experiment local
+    storage) when a batch starts, and removed when the batch ends. Experiments read them with get_shared_array.
+
+    runner.shared_arrays.publish("features", features)
+    ...
+    features = self.get_shared_array("features")
+    """
+
+    def __init__(self):
+        self.arrays = dict()
+        self.descriptors = dict()
+        self._shared_memories = []
+
+    def __getstate__(self):
+        # Only the descriptors are needed away from the main process, never the arrays or their shared memory
+        return {"arrays": dict(), "descriptors": self.descriptors, "_shared_memories": []}
+
+    def publish(self, array_name: typing.AnyStr, array: np.ndarray, backend: typing.AnyStr = SHARED_MEMORY):
+        """
+        :param array_name: The name experiments will use to get the array
+        :param array: The array to share. Must not be an object array
+        :param backend: "shared_memory" to use multiprocessing.shared_memory, "memmap" to use a memory mapped .npy file
+        """
+        array = np.asarray(array)
+        if array.dtype.hasobject:
+            raise ValueError("Object arrays can't be shared, {} has dtype {}".format(array_name, array.dtype))
+        if backend not in (SHARED_MEMORY, MEMMAP):
+            raise ValueError("Unknown shared array backend {}".format(backend))
+        if backend == SHARED_MEMORY and shared_memory is None:
+            raise ValueError("multiprocessing.shared_memory is not available, use the memmap backend")
+        self.arrays[array_name] = (array, backend)
+
+    def open(self, name: typing.AnyStr) -> typing.Dict[typing.AnyStr, SharedArrayDescriptor]:
+        """
+        Called by ExperimentRunner.run when a batch starts to put every published array where the workers can map it
+        :param name: The name of the batch
+        :return: The descriptors of the arrays by array name
+        """
+        self.close()
+        for array_name, (array, backend) in self.arrays.items():
+            if backend == SHARED_MEMORY:
+                shm = shared_memory.SharedMemory(create=True, size=max(1, array.nbytes))
+                np.ndarray(array.shape, array.dtype, buffer=shm.buf)[...] = array
+                self._shared_memories.append(shm)
+                location = shm.name
+            else:
+                folder = os.path.join(get_experiment_local_storage(name), "shared_arrays")
+                os.makedirs(folder, exist_ok=True)
+                location = os.path.join(folder, "{}-{}.npy".format(array_name, uuid.uuid4().hex))
+                np.save(location, array)
+            self.descriptors[array_name] = SharedArrayDescriptor(array_name, backend, location, array.shape,
+                                                                 array.dtype.str)
+        return self.descriptors
+
+    def close(self):
+        """
+        Called by ExperimentRunner.run when a batch ends to free the shared memory and delete the memory mapped files
+        """
+        for shm in self._shared_memories:
+            shm.close()
+            shm.unlink()
+        self._shared_memories = []
+        for descriptor in self.descriptors.values():
+            _attached.pop(descriptor.array_name, None)
+            if descriptor.backend == MEMMAP:
+                try:
+                    os.remove(descriptor.location)
+                except FileNotFoundError:
+                    pass
+        self.descriptors = dict()
@@ -1,4 +1,6 @@
 import collections
+import hashlib
+import heapq
 import itertools
 import json
 import typing
@@ -78,23 +80,77 @@ class SpecificationGenerator:
             return self.generate(j)
 
 
+def get_specification_key(specification: typing.Dict) -> typing.AnyStr:
+    """
+    :return: A hash of the specification which is the same on every computer and python process
+    """
+    return hashlib.sha256(json.dumps(specification, sort_keys=True, default=str).encode("utf-8")).hexdigest()
+
+
 class MultiComputerGenerator(SpecificationGenerator):
-    def __init__(self, computer_number, number_of_computers):
+    INDEX = "index"
+    HASH = "hash"
+    COST = "cost"
+
+    def __init__(self, computer_number, number_of_computers, strategy=INDEX,
+                 cost_fn: typing.Callable[[typing.Dict], float] = None):
         '''
         Divides the specification across multiple computers by giving each computer the i*computer_numberth specification
 
         If you have 3 computers then the computer numbers would be 0,1,2 and the number_of_computers would be 3
+        To hand specifications to computers as they free up instead, use ClaimFileRunner (shared file system) or
+        WorkQueueRunner (network) with the full list of specifications
+
+        strategy decides which computer gets which specification
+        "index": by position in the list. Adding a value to any list in the generation specification moves most
+        specifications to a different computer
+        "hash": by a hash of the specification (rendezvous hashing). A specification stays on the same computer when
+        others are added or removed, and changing number_of_computers only moves the specifications the new layout needs
+        "cost": balances the total cost_fn of each computer's specifications, for example estimated run times. Every
+        computer must use the same list and cost_fn, and changing either can move any specification
 
         :param computer_number: 0 indexed number which to assign this computer (MUST NOT OVERLAP WITH ANOTHER COMPUTER)
         :param number_of_computers: The total number of computers which are being used
+        :param strategy: "index", "hash" or "cost"
+        :param cost_fn: For the cost strategy, the estimated cost of running a specification
         '''
         assert computer_number < number_of_computers, "Computer number must be less than number of computers"
+        assert strategy in (self.INDEX, self.HASH, self.COST), "Unknown sharding strategy {}".format(strategy)
+        assert strategy != self.COST or cost_fn is not None, "The cost strategy needs a cost_fn"
 
         self.computer_number = computer_number
         self.number_of_computers = number_of_computers
+        self.strategy = strategy
+        self.cost_fn = cost_fn
+
+    def get_computer(self, specification: typing.Dict) -> int:
+        """
+        :return: The computer number which a specification belongs to under the hash strategy
+        """
+        key = get_specification_key(specification)
+        return max(range(self.number_of_computers),
+                   key=lambda computer_number: hashlib.sha256(
+                       "{}:{}".format(key, computer_number).encode("utf-8")).digest())
 
     def shard(self, l: typing.List) -> typing.List:
+        if self.strategy == self.HASH:
+            return [specification for specification in l if self.get_computer(specification) == self.computer_number]
+        if self.strategy == self.COST:
+            return self._shard_by_cost(l)
         return l[self.computer_number::self.number_of_computers]
 
+    def _shard_by_cost(self, l):
+        # Longest first onto the least loaded computer, ties broken by hash so every computer agrees
+        costs = [self.cost_fn(specification) for specification in l]
+        keys = [get_specification_key(specification) for specification in l]
+        loads = [(0.0, computer_number) for computer_number in range(self.number_of_computers)]
+        assigned = []
+        for index in sorted(range(len(l)), key=lambda index: (-costs[index], keys[index])):
+            load, computer_number = heapq.heappop(loads)
+            if computer_number == self.computer_number:
+                assigned.append(index)
+            heapq.heappush(loads, (load + costs[index], computer_number))
+        return [l[index] for index in sorted(assigned)]
+
     def generate(self, generation_specification: typing.Dict) -> typing.List[typing.Dict]:
         return self.shard(super().generate(generation_specification))
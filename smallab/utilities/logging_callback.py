@@ -22,7 +22,8 @@ class LoggingCallback(CallbackManager):
 
     def on_specification_failure(self, exception: Exception, specification: typing.Dict) -> typing.NoReturn:
         pp = LoggingCallback.pretty_printer()
-        traceback_string = traceback.format_exc()
+        # Formatted from the exception, since lost specifications are reported outside of an except block
+        traceback_string = "".join(traceback.format_exception(type(exception), exception, exception.__traceback__))
         specification_string = pp.pformat(specification)
         logging.error("\nSpecification Failure\nSpecification:\n{}\nException:\n{}".format(specification_string,
                                                                                            traceback_string))
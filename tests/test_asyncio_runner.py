@@ -0,0 +1,67 @@
+import asyncio
+import time
+import typing
+import unittest
+
+from examples.example_utils import delete_experiments_folder
+from smallab.callbacks import CallbackManager
+from smallab.experiment_types.async_experiment import AsyncExperiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.asyncio_runner import AsyncioRunner
+from smallab.runner_implementations.main_process_runner import MainRunner
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class SleepingExperiment(AsyncExperiment):
+    async def main(self, specification: Specification) -> typing.Dict:
+        await asyncio.sleep(0.5)
+        if specification["seed"] % 10 == 0:
+            raise Exception("Simulator crashed")
+        return {"seed": specification["seed"]}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class CountingCallback(CallbackManager):
+    def __init__(self):
+        self.complete = 0
+        self.failed = 0
+
+    def on_specification_complete(self, specification, result):
+        self.complete += 1
+
+    def on_specification_failure(self, exception, specification):
+        self.failed += 1
+
+
+class TestAsyncioRunner(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_runs_concurrently(self):
+        specifications = [{"seed": i} for i in range(1, 101)]
+        runner = ExperimentRunner()
+        callback = CountingCallback()
+        runner.attach_callbacks([callback])
+        specification_runner = AsyncioRunner(max_concurrency=100)
+        start = time.time()
+        runner.run("test", specifications, SleepingExperiment(), specification_runner=specification_runner,
+                   use_dashboard=False)
+        self.assertLess(time.time() - start, 10)
+        self.assertEqual(90, len(specification_runner.get_completed()))
+        self.assertEqual(10, len(specification_runner.get_failed_specifications()))
+        self.assertEqual(90, callback.complete)
+        self.assertEqual(10, callback.failed)
+        self.assertEqual(90, len(list(experiment_iterator("test"))))
+
+    def test_other_runners_run_async_experiments(self):
+        runner = ExperimentRunner()
+        runner.run("test", [{"seed": 1}], SleepingExperiment(), specification_runner=MainRunner(),
+                   use_dashboard=False)
+        self.assertEqual([{"specification": {"seed": 1}, "result": {"seed": 1}}], list(experiment_iterator("test")))
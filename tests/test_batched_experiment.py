@@ -0,0 +1,139 @@
+import json
+import typing
+import unittest
+
+import numpy as np
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.callbacks import CallbackManager
+from smallab.experiment_types.batched_experiment import BatchedExperiment
+from smallab.file_locations import get_save_directory, get_experiment_local_storage
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.main_process_runner import MainRunner
+from smallab.retry_policy import RetryPolicy
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class SquaresExperiment(BatchedExperiment):
+    def main_batch(self, specifications: typing.List[Specification]) -> typing.List[typing.Dict]:
+        seeds = np.array([specification["seed"] for specification in specifications])
+        scales = {specification["model"] for specification in specifications}
+        assert len(scales) == 1
+        squares = seeds ** 2 * scales.pop()
+        return [ValueError("Unlucky") if seed == 13 else {"square": int(square), "batch_size": len(specifications)}
+                for seed, square in zip(seeds, squares)]
+
+    def get_batch_keys(self):
+        return ["model"]
+
+    def get_batch_size(self):
+        return 8
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class BrokenExperiment(SquaresExperiment):
+    def main_batch(self, specifications):
+        raise RuntimeError("Broken")
+
+
+class FlakyExperiment(SquaresExperiment):
+    """
+    Counts how often each specification runs. Seed 0 fails the first failures times it runs
+    """
+
+    def __init__(self, failures):
+        self.failures = failures
+
+    def main_batch(self, specifications):
+        results = []
+        for specification in specifications:
+            with open(os.path.join(self.get_experiment_local_storage(), self.get_name(specification)), "a+") as f:
+                f.write("x")
+                f.seek(0)
+                runs = len(f.read())
+            if specification["seed"] == 0 and runs <= self.failures:
+                results.append(ValueError("Flaky"))
+            else:
+                results.append({"square": specification["seed"] ** 2, "batch_size": len(specifications)})
+        return results
+
+
+class RecordingCallback(CallbackManager):
+    def __init__(self):
+        self.completed = []
+        self.failed = []
+
+    def on_specification_complete(self, specification, result):
+        self.completed.append(specification)
+
+    def on_specification_failure(self, exception, specification):
+        self.failed.append(specification)
+
+
+class TestBatchedExperiment(unittest.TestCase):
+    specifications = [{"seed": seed, "model": model} for model in [1, 2] for seed in range(20)]
+
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_batches(self):
+        batches = SquaresExperiment().make_batches(self.specifications)
+        self.assertEqual([8, 8, 4, 8, 8, 4], [len(batch) for batch in batches])
+        self.assertEqual(self.specifications, [specification for batch in batches for specification in batch])
+
+    def _run(self, specification_runner, experiment):
+        runner = ExperimentRunner()
+        callback = RecordingCallback()
+        runner.attach_callbacks([callback])
+        runner.run("test", self.specifications, experiment, specification_runner=specification_runner,
+                   use_dashboard=False)
+        return callback
+
+    def test_each_specification_saved(self):
+        for specification_runner in [MainRunner(show_progress=False), MultiprocessingRunner(2)]:
+            callback = self._run(specification_runner, SquaresExperiment())
+            results = list(experiment_iterator("test"))
+            self.assertEqual(38, len(results))
+            for result in results:
+                specification = result["specification"]
+                self.assertEqual(specification["seed"] ** 2 * specification["model"], result["result"]["square"])
+                self.assertIn(result["result"]["batch_size"], [4, 8])
+            with open(os.path.join(get_save_directory("test"), "failed.json")) as f:
+                self.assertEqual([{"seed": 13, "model": 1}, {"seed": 13, "model": 2}], json.load(f))
+            if isinstance(specification_runner, MainRunner):
+                # Callbacks only reach this process when specifications run in it
+                self.assertEqual(2, len(callback.failed))
+                self.assertEqual(38, len(callback.completed))
+            delete_experiments_folder("test")
+
+    def test_failed_batch(self):
+        callback = self._run(MainRunner(show_progress=False), BrokenExperiment())
+        self.assertEqual(40, len(callback.failed))
+        self.assertEqual([], list(experiment_iterator("test")))
+
+    def test_retry_only_runs_failed_specifications_again(self):
+        specifications = [{"seed": seed, "model": 1} for seed in range(3)]
+        for failures, completed in [(1, 3), (5, 2)]:
+            for specification_runner in [MainRunner(show_progress=False, retry_policy=RetryPolicy(3, backoff=0)),
+                                         MultiprocessingRunner(2, retry_policy=RetryPolicy(3, backoff=0))]:
+                runner = ExperimentRunner()
+                runner.run("test", specifications, FlakyExperiment(failures), specification_runner=specification_runner,
+                           use_dashboard=False)
+                runs = []
+                for specification in specifications:
+                    with open(os.path.join(get_experiment_local_storage("test"), dict2name(specification))) as f:
+                        runs.append(len(f.read()))
+                self.assertEqual([min(failures + 1, 3), 1, 1], runs)
+                self.assertEqual(completed, len(list(experiment_iterator("test"))))
+                with open(os.path.join(get_save_directory("test"), "failed.json")) as f:
+                    self.assertEqual(specifications[:3 - completed], json.load(f))
+                delete_experiments_folder("test")
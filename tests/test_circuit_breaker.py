@@ -0,0 +1,74 @@
+import typing
+import unittest
+
+from examples.example_utils import delete_experiments_folder
+from smallab.circuit_breaker import CircuitBreaker
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.main_process_runner import MainRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.smallab_types import Specification
+
+
+class BuggyExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        if specification["seed"] % 10 != 0:
+            raise KeyError("missing")
+        return {"seed": specification["seed"]}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class TestCircuitBreaker(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_max_failures(self):
+        circuit_breaker = CircuitBreaker(max_failures=2)
+        circuit_breaker.record(None)
+        circuit_breaker.record(ValueError("a"))
+        circuit_breaker.record(KeyError("b"))
+        self.assertFalse(circuit_breaker.is_open())
+        circuit_breaker.record(ValueError("a"))
+        self.assertTrue(circuit_breaker.is_open())
+        self.assertEqual(("ValueError: a", 2), circuit_breaker.get_dominant_failure())
+        circuit_breaker.reset()
+        self.assertFalse(circuit_breaker.is_open())
+        self.assertEqual((None, 0), circuit_breaker.get_dominant_failure())
+
+    def test_failure_rate_over_window(self):
+        circuit_breaker = CircuitBreaker(max_failure_rate=0.5, window=4)
+        for exception in [None, None, ValueError(), ValueError()]:
+            circuit_breaker.record(exception)
+        self.assertFalse(circuit_breaker.is_open())
+        # Failures after the window don't count towards the rate
+        for _ in range(10):
+            circuit_breaker.record(ValueError())
+        self.assertFalse(circuit_breaker.is_open())
+
+        circuit_breaker.reset()
+        for exception in [ValueError(), ValueError(), ValueError()]:
+            circuit_breaker.record(exception)
+        self.assertTrue(circuit_breaker.is_open())
+
+    def _run(self, specification_runner, circuit_breaker):
+        specifications = [{"seed": i} for i in range(50)]
+        ExperimentRunner().run("test", specifications, BuggyExperiment(), specification_runner=specification_runner,
+                               use_dashboard=False, circuit_breaker=circuit_breaker)
+        self.assertTrue(circuit_breaker.is_open())
+        self.assertEqual("KeyError: 'missing'", circuit_breaker.get_dominant_failure()[0])
+        number_run = len(specification_runner.get_completed()) + len(specification_runner.get_failed_specifications())
+        self.assertLess(number_run, len(specifications))
+        return number_run
+
+    def test_main_runner_stops(self):
+        self.assertEqual(6, self._run(MainRunner(show_progress=False), CircuitBreaker(max_failures=4)))
+
+    def test_multiprocessing_runner_drains(self):
+        number_run = self._run(MultiprocessingRunner(2), CircuitBreaker(max_failure_rate=0.5, window=10))
+        self.assertLessEqual(number_run, 10)
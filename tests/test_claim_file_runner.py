@@ -0,0 +1,128 @@
+import multiprocessing
+import threading
+import time
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.experiment import Experiment
+from smallab.file_locations import get_claims_directory, get_experiment_local_storage
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.claim_file_runner import ClaimFileRunner
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class CountingExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        with open(os.path.join(self.get_experiment_local_storage(), self.get_name(specification)), "a") as f:
+            f.write("x")
+        time.sleep(specification["sleep"])
+        if specification.get("fail"):
+            raise ValueError("Bad seed")
+        return {"seed": specification["seed"]}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+SPECIFICATIONS = [{"seed": i, "sleep": 0.2 if i % 3 == 0 else 0.02} for i in range(12)]
+
+
+def run_node(node_id):
+    ExperimentRunner().run("test", SPECIFICATIONS, CountingExperiment(),
+                           specification_runner=ClaimFileRunner(lease_timeout=5, num_parallel=2, node_id=node_id),
+                           use_dashboard=False)
+
+
+LATE_SPECIFICATIONS = [{"seed": 0, "sleep": 0, "fail": True}] + [{"seed": i, "sleep": 0.5} for i in range(1, 5)]
+
+
+def run_late_node(node_id):
+    ExperimentRunner().run("test", LATE_SPECIFICATIONS, CountingExperiment(),
+                           specification_runner=ClaimFileRunner(lease_timeout=5, num_parallel=1, node_id=node_id),
+                           use_dashboard=False)
+
+
+class TestClaimFileRunner(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def _claim(self, specification, age):
+        os.makedirs(get_claims_directory("test"), exist_ok=True)
+        claim_file = os.path.join(get_claims_directory("test"), dict2name(specification) + ".claim")
+        with open(claim_file, "w") as f:
+            f.write("other")
+        os.utime(claim_file, (time.time() - age, time.time() - age))
+        return claim_file
+
+    def test_each_specification_runs_once(self):
+        ctx = multiprocessing.get_context("fork")
+        nodes = [ctx.Process(target=run_node, args=("node-{}".format(i),)) for i in range(3)]
+        for node in nodes:
+            node.start()
+        for node in nodes:
+            node.join(60)
+            self.assertEqual(0, node.exitcode)
+        for specification in SPECIFICATIONS:
+            with open(os.path.join(get_experiment_local_storage("test"), dict2name(specification))) as f:
+                self.assertEqual("x", f.read())
+        self.assertEqual(12, len(list(experiment_iterator("test"))))
+        self.assertEqual([], [fname for fname in os.listdir(get_claims_directory("test")) if fname.endswith(".claim")])
+
+    def test_abandoned_claim_taken_over(self):
+        self._claim(SPECIFICATIONS[0], 60)
+        specification_runner = ClaimFileRunner(lease_timeout=5, num_parallel=2)
+        ExperimentRunner().run("test", SPECIFICATIONS, CountingExperiment(),
+                               specification_runner=specification_runner, use_dashboard=False)
+        self.assertEqual(12, len(specification_runner.get_completed()))
+
+    def test_waits_for_claim_held_elsewhere(self):
+        claim_file = self._claim(SPECIFICATIONS[0], 0)
+
+        def finish_elsewhere():
+            time.sleep(0.5)
+            with open(os.path.join(get_claims_directory("test"), "run-id")) as f:
+                run_id = f.read()
+            open(os.path.join(get_claims_directory("test"), run_id, dict2name(SPECIFICATIONS[0]) + ".done"),
+                 "w").close()
+            os.remove(claim_file)
+
+        other_runner = threading.Thread(target=finish_elsewhere)
+        other_runner.start()
+        specification_runner = ClaimFileRunner(lease_timeout=5, heartbeat_interval=0.1, num_parallel=2)
+        ExperimentRunner().run("test", SPECIFICATIONS, CountingExperiment(),
+                               specification_runner=specification_runner, use_dashboard=False)
+        other_runner.join()
+        self.assertEqual(SPECIFICATIONS[1:], specification_runner.get_completed())
+        self.assertEqual([], specification_runner.get_failed_specifications())
+
+    def _runs(self, specification):
+        with open(os.path.join(get_experiment_local_storage("test"), dict2name(specification))) as f:
+            return f.read()
+
+    def test_late_runner_joins_batch_run(self):
+        first_node = multiprocessing.get_context("fork").Process(target=run_late_node, args=("first",))
+        first_node.start()
+        # Start once the first node has run, and failed, the first specification
+        while not os.path.exists(os.path.join(get_experiment_local_storage("test"),
+                                              dict2name(LATE_SPECIFICATIONS[0]))):
+            time.sleep(0.05)
+        time.sleep(0.2)
+        run_late_node("late")
+        first_node.join(60)
+        self.assertEqual(0, first_node.exitcode)
+        for specification in LATE_SPECIFICATIONS:
+            self.assertEqual("x", self._runs(specification))
+        self.assertFalse(os.path.exists(os.path.join(get_claims_directory("test"), "run-id")))
+
+        # The batch run ended, so the next one runs the failed specification again
+        run_late_node("next")
+        self.assertEqual("xx", self._runs(LATE_SPECIFICATIONS[0]))
+        self.assertEqual("x", self._runs(LATE_SPECIFICATIONS[1]))
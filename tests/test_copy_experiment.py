@@ -0,0 +1,69 @@
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner.runner_methods import copy_experiment
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class TableExperiment(Experiment):
+    def __init__(self):
+        self.table = [[1, 2], [3, 4]]
+        self.state = {"step": 0}
+
+    def main(self, specification: Specification) -> typing.Dict:
+        return dict()
+
+    def get_name(self, specification):
+        return "table"
+
+
+class SharedTableExperiment(TableExperiment):
+    def get_shared_attributes(self):
+        return ["table"]
+
+
+class TableIdExperiment(SharedTableExperiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        return {"table": id(self.table), "pid": os.getpid()}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class TestCopyExperiment(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_deep_copies_by_default(self):
+        experiment = TableExperiment()
+        copied = copy_experiment(experiment)
+        self.assertIsNot(experiment.table, copied.table)
+        self.assertEqual(experiment.table, copied.table)
+
+    def test_shares_shared_attributes(self):
+        experiment = SharedTableExperiment()
+        copied = copy_experiment(experiment)
+        self.assertIs(experiment.table, copied.table)
+        self.assertIsNot(experiment.state, copied.state)
+        copied.state["step"] = 1
+        self.assertEqual(0, experiment.state["step"])
+
+    def test_workers_share_shared_attributes_between_specifications(self):
+        runner = ExperimentRunner()
+        runner.run("test", [{"seed": i} for i in range(6)], TableIdExperiment(),
+                   specification_runner=MultiprocessingRunner(1), use_dashboard=False)
+        results = [result["result"] for result in experiment_iterator("test")]
+        self.assertEqual(6, len(results))
+        self.assertEqual(1, len({result["pid"] for result in results}))
+        self.assertEqual(1, len({result["table"] for result in results}))
@@ -0,0 +1,128 @@
+import multiprocessing
+import time
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab import cpu_budget
+from smallab.cpu_budget import CpuBudget
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.runner_implementations.worker_pool import WorkerPool
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class CoresExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        return {"omp": os.environ["OMP_NUM_THREADS"], "share": self.get_cores(),
+                "requested": self.request_cores(specification["cores"])}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class HangingCoresExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        if specification["hang"]:
+            time.sleep(600)
+        return {"share": self.get_cores()}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class TestCpuBudget(unittest.TestCase):
+    def setUp(self) -> None:
+        self.environment = dict(os.environ)
+
+    def tearDown(self) -> None:
+        os.environ.clear()
+        os.environ.update(self.environment)
+        cpu_budget._worker_budget = None
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_share_and_request(self):
+        budget = CpuBudget(total_cores=8)
+        budget.bind(multiprocessing.get_context("fork"), 4)
+        budget.initialize_worker()
+        self.assertEqual("2", os.environ["OMP_NUM_THREADS"])
+        cpu_budget.run_with_cpu_budget(lambda specification: self.assertEqual(2, cpu_budget.get_cores()), None)
+
+        budget.begin_specification()
+        self.assertEqual(6, budget.free_cores.value)
+        self.assertEqual(8, cpu_budget.request_cores(8))
+        self.assertEqual(0, budget.free_cores.value)
+        budget.end_specification()
+        self.assertEqual(8, budget.free_cores.value)
+
+    def test_request_limited_by_other_workers(self):
+        budget = CpuBudget(total_cores=4)
+        budget.bind(multiprocessing.get_context("fork"), 2)
+        budget.initialize_worker()
+        with budget.free_cores.get_lock():
+            budget.free_cores.value -= 2
+        budget.begin_specification()
+        self.assertEqual(2, budget.request(4))
+        budget.end_specification()
+        self.assertEqual(2, budget.free_cores.value)
+
+    def test_warns_without_threadpoolctl(self):
+        threadpool_limits = cpu_budget.threadpool_limits
+        cpu_budget.threadpool_limits = None
+        try:
+            with self.assertLogs("smallab.cpu_budget", "WARNING"):
+                CpuBudget(total_cores=4).bind(multiprocessing.get_context("fork"), 2)
+        finally:
+            cpu_budget.threadpool_limits = threadpool_limits
+
+    def test_without_budget(self):
+        self.assertEqual(3, cpu_budget.request_cores(3))
+
+    def test_with_runner(self):
+        runner = ExperimentRunner()
+        specifications = [{"cores": 1}, {"cores": 4}]
+        runner.run("test", specifications, CoresExperiment(),
+                   specification_runner=MultiprocessingRunner(2, cpu_budget=CpuBudget(total_cores=4)),
+                   use_dashboard=False)
+        results = list(experiment_iterator("test"))
+        self.assertEqual(2, len(results))
+        for result in results:
+            self.assertEqual("2", result["result"]["omp"])
+            self.assertEqual(2, result["result"]["share"])
+            self.assertGreaterEqual(result["result"]["requested"], 2)
+
+    def test_killed_workers_give_back_their_cores(self):
+        budget = CpuBudget(total_cores=4)
+        with WorkerPool(2, multiprocessing.get_context("fork"), cpu_budget=budget) as worker_pool:
+            runner = ExperimentRunner()
+            specification_runner = MultiprocessingRunner(specification_timeout=1)
+            runner.run("test", [{"seed": i, "hang": True} for i in range(2)], HangingCoresExperiment(),
+                       specification_runner=specification_runner, use_dashboard=False, worker_pool=worker_pool)
+            self.assertEqual(2, len(specification_runner.get_failed_specifications()))
+            self.assertEqual(4, budget.free_cores.value)
+            runner.run("test", [{"seed": 2, "hang": False}], HangingCoresExperiment(),
+                       specification_runner=MultiprocessingRunner(), use_dashboard=False, worker_pool=worker_pool)
+        results = list(experiment_iterator("test"))
+        self.assertEqual([2], [result["result"]["share"] for result in results])
+
+    def test_replacement_worker_reclaims_slot_of_dead_worker(self):
+        budget = CpuBudget(total_cores=4)
+        budget.bind(multiprocessing.get_context("fork"), 1)
+        process = multiprocessing.get_context("fork").Process(target=lambda: None)
+        process.start()
+        process.join()
+        with budget.free_cores.get_lock():
+            budget.free_cores.value -= 3
+            budget.worker_pids[0] = process.pid
+            budget.worker_held[0] = 3
+        budget.initialize_worker()
+        self.assertEqual(4, budget.free_cores.value)
+        self.assertEqual(os.getpid(), budget.worker_pids[0])
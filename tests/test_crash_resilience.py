@@ -0,0 +1,85 @@
+import signal
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.callbacks import CallbackManager
+from smallab.experiment_types.experiment import Experiment
+from smallab.file_locations import get_experiment_local_storage
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner, WorkerDiedException
+from smallab.runner_implementations.worker_pool import process_is_alive
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class CrashingExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        if specification["crash"]:
+            os.kill(os.getpid(), signal.SIGKILL)
+        return {"seed": specification["seed"]}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class CrashOnceExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        marker = os.path.join(self.get_experiment_local_storage(), "crashed")
+        if not os.path.exists(marker):
+            open(marker, "w").close()
+            os.kill(os.getpid(), signal.SIGKILL)
+        return {"seed": specification["seed"]}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class RecordingCallback(CallbackManager):
+    def __init__(self):
+        self.failures = []
+
+    def on_specification_failure(self, exception, specification):
+        self.failures.append((exception, specification))
+
+
+class TestCrashResilience(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_worker_death_fails_only_its_specification(self):
+        runner = ExperimentRunner()
+        callback = RecordingCallback()
+        runner.attach_callbacks([callback])
+        specifications = [{"seed": i, "crash": i == 1} for i in range(4)]
+        specification_runner = MultiprocessingRunner(2)
+        runner.run("test", specifications, CrashingExperiment(), specification_runner=specification_runner,
+                   use_dashboard=False)
+        self.assertEqual(3, len(specification_runner.get_completed()))
+        self.assertEqual([specifications[1]], specification_runner.get_failed_specifications())
+        self.assertIsInstance(specification_runner.get_exceptions()[0], WorkerDiedException)
+        self.assertEqual(1, len(callback.failures))
+        self.assertEqual(3, len(list(experiment_iterator("test"))))
+
+    def test_worker_death_retried(self):
+        runner = ExperimentRunner()
+        specification_runner = MultiprocessingRunner(1, worker_death_retries=1)
+        os.makedirs(get_experiment_local_storage("test"), exist_ok=True)
+        runner.run("test", [{"seed": 0}], CrashOnceExperiment(), specification_runner=specification_runner,
+                   use_dashboard=False)
+        self.assertEqual(1, len(specification_runner.get_completed()))
+        self.assertEqual(1, len(list(experiment_iterator("test"))))
+
+    def test_process_is_alive(self):
+        self.assertTrue(process_is_alive(os.getpid()))
+        pid = os.fork()
+        if pid == 0:
+            os._exit(0)
+        os.waitpid(pid, 0)
+        self.assertFalse(process_is_alive(pid))
@@ -0,0 +1,71 @@
+import os
+import unittest
+
+from examples.example_utils import delete_experiments_folder
+from smallab.dashboard.dashboard_state import DashboardState
+from smallab.dashboard.progress_table import ProgressTable
+from smallab.file_locations import get_dashboard_file
+
+
+class TestDashboardState(unittest.TestCase):
+    def setUp(self) -> None:
+        os.makedirs(os.path.dirname(get_dashboard_file("test")), exist_ok=True)
+
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def _append(self, text):
+        with open(get_dashboard_file("test"), "a") as f:
+            f.write(text)
+
+    def test_reads_only_new_lines(self):
+        state = DashboardState("test")
+        self.assertEqual(0, state.update())
+        self._append("START,test,100.0\nREGISTER,a\nREGISTER,b\nREGISTRATION_COMPLETE\nBEGIN,a\nPROGRESS,a,1,4\nBEG")
+        self.assertEqual(6, state.update())
+        self.assertEqual(100.0, state.start_time)
+        self.assertEqual(["b"], list(state.registered))
+        self.assertEqual(["a"], list(state.active))
+        self.assertEqual({"a": (1, 4)}, state.specification_progress)
+
+        self._append("IN,b\nCOMPLETE,a\nFAILED,b\nDROPPED,3\n")
+        self.assertEqual(4, state.update())
+        self.assertEqual([], list(state.registered))
+        self.assertEqual([], list(state.active))
+        self.assertEqual(["a"], list(state.complete))
+        self.assertEqual(["b"], list(state.failed))
+        self.assertEqual(3, state.dropped)
+        self.assertEqual(0, state.update())
+
+    def test_retried_specification_is_not_failed(self):
+        state = DashboardState("test")
+        self._append("REGISTER,a\nBEGIN,a\nFAILED,a\nBEGIN,a\n")
+        state.update()
+        self.assertEqual(["a"], list(state.active))
+        self.assertEqual([], list(state.failed))
+
+    def test_starts_over_for_new_run(self):
+        state = DashboardState("test")
+        self._append("REGISTER,a\nBEGIN,a\nCOMPLETE,a\n")
+        state.update()
+        os.remove(get_dashboard_file("test"))
+        self._append("REGISTER,b\n")
+        state.update()
+        self.assertEqual(["b"], list(state.registered))
+        self.assertEqual([], list(state.complete))
+
+    def test_reads_progress_table(self):
+        progress_table = ProgressTable.create("test", ["a", "b"])
+        state = DashboardState("test")
+        self._append("REGISTER,a\nREGISTER,b\nBEGIN,a\n")
+        progress_table.publish("a", 2, 10)
+        state.update()
+        self.assertEqual({"a": (2, 10)}, state.specification_progress)
+        progress_table.publish("a", 3, 10)
+        progress_table.publish("b", 1, 5)
+        state.update()
+        self.assertEqual({"a": (3, 10), "b": (1, 5)}, state.specification_progress)
+        self.assertEqual(4, state.timeestimator.completed_iterations)
@@ -0,0 +1,99 @@
+import curses
+import time
+import unittest
+
+from smallab.dashboard.dashboard import ScreenBuffer, SpecificationListView, draw_specifications_widget, \
+    draw_header_widget
+from smallab.dashboard.dashboard_state import DashboardState
+
+
+class FakeScreen(object):
+    def __init__(self, height=30, width=100):
+        self.height = height
+        self.width = width
+        self.writes = []
+        self.cleared = 0
+
+    def getmaxyx(self):
+        return self.height, self.width
+
+    def addstr(self, row, column, text):
+        assert row < self.height and column + len(text) <= self.width
+        self.writes.append((row, column, text))
+
+    def clear(self):
+        self.cleared += 1
+
+    def refresh(self):
+        pass
+
+
+def make_state(number_of_specifications):
+    state = DashboardState("test")
+    for i in range(number_of_specifications):
+        state.registered["specification_{}".format(i)] = None
+    for i in range(5):
+        specification_id = "specification_{}".format(i)
+        state.registered.pop(specification_id)
+        state.active[specification_id] = None
+    state.record_progress("specification_0", 5, 10)
+    state.failed["broken"] = None
+    return state
+
+
+class TestDashboardWidgets(unittest.TestCase):
+    def test_screen_buffer_writes_changed_rows(self):
+        fake_screen = FakeScreen()
+        screen = ScreenBuffer(fake_screen)
+        screen.addstr(0, 0, "header")
+        screen.addstr(3, 10, "a row")
+        self.assertEqual(30, screen.refresh())
+        self.assertEqual(1, fake_screen.cleared)
+        screen.clear()
+        screen.addstr(0, 0, "header")
+        screen.addstr(3, 10, "a row")
+        self.assertEqual(0, screen.refresh())
+        screen.clear()
+        screen.addstr(0, 0, "header")
+        screen.addstr(3, 12, "moved")
+        self.assertEqual(1, screen.refresh())
+        self.assertEqual((3, 0, " " * 12 + "moved" + " " * 83), fake_screen.writes[-1])
+        self.assertEqual(1, fake_screen.cleared)
+
+    def test_view_filters_and_scrolls(self):
+        state = make_state(100)
+        view = SpecificationListView()
+        visible, count = view.get_visible(state, 10)
+        self.assertEqual(101, count)
+        self.assertEqual("specification_0", visible[0])
+        view.handle_key(curses.KEY_NPAGE)
+        visible, _ = view.get_visible(state, 10)
+        self.assertEqual("specification_10", visible[0])
+        view.handle_key(curses.KEY_END)
+        visible, _ = view.get_visible(state, 10)
+        self.assertEqual("broken", visible[-1])
+        self.assertEqual(91, view.offset)
+        view.handle_key(ord("f"))
+        self.assertEqual((["broken"], 1), view.get_visible(state, 10))
+        view.handle_key(ord("r"))
+        self.assertEqual(5, view.get_visible(state, 10)[1])
+        self.assertFalse(view.handle_key(ord("x")))
+
+    def test_draws_only_visible_rows(self):
+        state = make_state(200000)
+        fake_screen = FakeScreen()
+        screen = ScreenBuffer(fake_screen)
+        view = SpecificationListView()
+        start = time.time()
+        for frame in range(20):
+            screen.clear()
+            row = draw_header_widget(0, screen, "test", 100, state.complete, state.active, state.registered,
+                                     state.specification_progress, state.timeestimator, state.failed,
+                                     in_slow_mode=False)
+            draw_specifications_widget(row, screen, view, state, 100, 30, frame)
+            screen.refresh()
+        self.assertLess(time.time() - start, 1)
+        drawn = "\n".join(screen.drawn.values())
+        self.assertIn("5/10 : ", drawn)
+        self.assertIn("Running...", drawn)
+        self.assertIn("Showing 1-40 of 200001 all", drawn)
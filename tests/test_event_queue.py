@@ -0,0 +1,55 @@
+import queue
+import unittest
+
+import dill
+
+from smallab.dashboard.dashboard_events import ProgressEvent, BeginEvent, EventBatch, CompleteEvent
+from smallab.dashboard.utils import BufferedEventQueue, put_in_event_queue, unpack_events
+
+
+class TestBufferedEventQueue(unittest.TestCase):
+    def test_buffers_until_urgent_event(self):
+        event_queue = BufferedEventQueue(queue.Queue(), max_batch_size=10, flush_interval=1000)
+        for i in range(3):
+            put_in_event_queue(event_queue, ProgressEvent("a", i, 10))
+        self.assertTrue(event_queue.empty())
+        put_in_event_queue(event_queue, CompleteEvent("a"))
+        events, dropped = unpack_events(event_queue.get())
+        self.assertEqual([0, 1, 2], [event.progress for event in events[:3]])
+        self.assertIsInstance(events[3], CompleteEvent)
+        self.assertEqual(0, dropped)
+        self.assertTrue(event_queue.empty())
+
+    def test_sends_full_batches(self):
+        event_queue = BufferedEventQueue(queue.Queue(), max_batch_size=4, flush_interval=1000)
+        for i in range(10):
+            put_in_event_queue(event_queue, ProgressEvent("a", i, 10))
+        self.assertEqual(4, len(event_queue.get().events))
+        self.assertEqual(4, len(event_queue.get().events))
+        self.assertTrue(event_queue.empty())
+        event_queue.flush()
+        self.assertEqual([8, 9], [event.progress for event in event_queue.get().events])
+
+    def test_counts_dropped_events(self):
+        event_queue = BufferedEventQueue(queue.Queue(maxsize=1), max_batch_size=10, flush_interval=1000)
+        put_in_event_queue(event_queue, BeginEvent("a"))
+        put_in_event_queue(event_queue, ProgressEvent("a", 1, 10))
+        put_in_event_queue(event_queue, BeginEvent("b"))
+        self.assertEqual(2, event_queue.get_dropped())
+        self.assertIsInstance(event_queue.get(), EventBatch)
+        put_in_event_queue(event_queue, BeginEvent("c"))
+        events, dropped = unpack_events(event_queue.get())
+        self.assertEqual(["c"], [event.specification_id for event in events])
+        self.assertEqual(2, dropped)
+        self.assertEqual(0, event_queue.get_dropped())
+
+    def test_copies_buffer_separately(self):
+        event_queue = BufferedEventQueue(queue.Queue(), max_batch_size=10, flush_interval=1000)
+        put_in_event_queue(event_queue, ProgressEvent("a", 1, 10))
+        copied = dill.loads(dill.dumps(event_queue))
+        self.assertEqual([], copied.buffer)
+        self.assertEqual(1, len(event_queue.buffer))
+
+    def test_unpacks_single_events(self):
+        event = BeginEvent("a")
+        self.assertEqual(([event], 0), unpack_events(event))
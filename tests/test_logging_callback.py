@@ -0,0 +1,22 @@
+import unittest
+
+from smallab.runner_implementations.multiprocessing_runner import SpecificationTimeoutException
+from smallab.utilities.logging_callback import LoggingCallback
+
+
+class TestLoggingCallback(unittest.TestCase):
+    def test_failure_outside_except_block(self):
+        # How a specification lost with its worker is reported
+        with self.assertLogs(level="ERROR") as logs:
+            LoggingCallback().on_specification_failure(SpecificationTimeoutException("Ran for over 1s"), {"seed": 0})
+        self.assertIn("SpecificationTimeoutException: Ran for over 1s", logs.output[0])
+        self.assertNotIn("NoneType: None", logs.output[0])
+
+    def test_failure_in_except_block(self):
+        with self.assertLogs(level="ERROR") as logs:
+            try:
+                raise ValueError("Bad seed")
+            except ValueError as e:
+                LoggingCallback().on_specification_failure(e, {"seed": 0})
+        self.assertIn("Traceback", logs.output[0])
+        self.assertIn("ValueError: Bad seed", logs.output[0])
@@ -0,0 +1,58 @@
+import json
+import os
+import unittest
+import urllib.request
+
+from examples.example_utils import delete_experiments_folder
+from smallab.dashboard.metrics_export import MetricsExporter, format_prometheus
+from smallab.file_locations import get_dashboard_file, get_status_file
+
+
+class TestMetricsExport(unittest.TestCase):
+    def setUp(self) -> None:
+        os.makedirs(os.path.dirname(get_dashboard_file("test")), exist_ok=True)
+        self.exporter = None
+
+    def tearDown(self) -> None:
+        if self.exporter is not None:
+            self.exporter.close()
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def _append(self, text):
+        with open(get_dashboard_file("test"), "a") as f:
+            f.write(text)
+
+    def test_waits_for_the_dashboard_file(self):
+        self.exporter = MetricsExporter("test")
+        self.assertIsNone(self.exporter.refresh())
+        self.assertFalse(os.path.exists(get_status_file("test")))
+
+    def test_writes_status_file(self):
+        self._append("START,test,100.0\nREGISTER,a\nREGISTER,b\nREGISTER,c\nBEGIN,a\nPROGRESS,a,5,10\n"
+                     "BEGIN,b\nFAILED,b\nDROPPED,7\n")
+        self.exporter = MetricsExporter("test")
+        self.exporter.refresh()
+        with open(get_status_file("test")) as f:
+            status = json.load(f)
+        self.assertEqual({"registered": 1, "running": 1, "complete": 0, "failed": 1}, status["counts"])
+        self.assertEqual(7, status["dropped_events"])
+        self.assertEqual({"status": "running", "progress": 5.0, "maximum": 10.0}, status["specifications"]["a"])
+        self.assertEqual("failed", status["specifications"]["b"]["status"])
+        self.assertEqual({"expected", "lower_quartile", "upper_quartile"}, set(status["eta_seconds"]))
+
+    def test_serves_prometheus_metrics(self):
+        self._append("START,test,100.0\nREGISTER,a\"1\nBEGIN,a\"1\nPROGRESS,a\"1,5,10\n")
+        self.exporter = MetricsExporter("test", port=0)
+        status = self.exporter.refresh()
+        host, port = self.exporter.get_address()
+        with urllib.request.urlopen("http://{}:{}/metrics".format(host, port)) as response:
+            metrics = response.read().decode()
+        self.assertEqual(format_prometheus(status), metrics)
+        self.assertIn('smallab_specifications{batch="test",state="running"} 1.0', metrics)
+        self.assertIn('smallab_specification_progress{batch="test",specification="a\\"1"} 0.5', metrics)
+        self.assertIn("# TYPE smallab_dropped_events_total counter", metrics)
+        with urllib.request.urlopen("http://{}:{}/status.json".format(host, port)) as response:
+            self.assertEqual(1, json.load(response)["counts"]["running"])
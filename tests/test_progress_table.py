@@ -0,0 +1,96 @@
+import multiprocessing
+import queue
+import typing
+import unittest
+
+from examples.example_utils import delete_experiments_folder
+from smallab.dashboard.dashboard_events import ProgressEvent
+from smallab.dashboard.progress_table import ProgressTable, ProgressTableReader
+from smallab.dashboard.utils import BufferedEventQueue, put_in_event_queue
+from smallab.experiment_types.checkpointed_experiment import CheckpointedExperiment
+from smallab.dashboard.event_log import EventLogReader, PROGRESS, COMPLETE
+from smallab.file_locations import get_dashboard_event_log_file
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.smallab_types import Specification
+
+
+class SteppingExperiment(CheckpointedExperiment):
+    def initialize(self, specification: Specification):
+        self.i = 0
+
+    def step(self):
+        self.i += 1
+        if self.i == self.max_iterations(None):
+            return {"i": self.i}
+        return self.i, self.max_iterations(None)
+
+    def max_iterations(self, specification):
+        return 20
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+    def get_current_name(self, specification):
+        return self.get_name(specification)
+
+
+def publish_in_another_process(progress_table):
+    progress_table.publish("b", 3, 4)
+
+
+class TestProgressTable(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_workers_publish_to_reader(self):
+        progress_table = ProgressTable.create("test", ["a", "b", "c"])
+        reader = ProgressTableReader("test")
+        self.assertEqual(dict(), reader.read())
+        self.assertTrue(progress_table.publish("a", 1, 10))
+        self.assertFalse(progress_table.publish("unregistered", 1, 10))
+        process = multiprocessing.get_context("fork").Process(target=publish_in_another_process,
+                                                               args=(progress_table,))
+        process.start()
+        process.join()
+        read = reader.read()
+        self.assertEqual(["a", "b"], sorted(read.keys()))
+        self.assertEqual((1, 10), read["a"][:2])
+        self.assertEqual((3, 4), read["b"][:2])
+        self.assertGreater(read["b"][2], 0)
+
+    def test_replaced_table_is_not_written(self):
+        progress_table = ProgressTable.create("test", ["a"])
+        self.assertTrue(progress_table.publish("a", 1, 10))
+        ProgressTable.create("test", ["a"])
+        progress_table.publish("a", 2, 10)
+        self.assertEqual(dict(), ProgressTableReader("test").read())
+        # Unmapped in this process, so it opens the table again and finds it was replaced
+        progress_table.close()
+        self.assertFalse(progress_table.publish("a", 2, 10))
+
+    def test_event_queue_publishes_progress_to_table(self):
+        event_queue = BufferedEventQueue(queue.Queue(), max_batch_size=1)
+        event_queue.set_progress_table(ProgressTable.create("test", ["a"]))
+        put_in_event_queue(event_queue, ProgressEvent("a", 5, 10))
+        self.assertTrue(event_queue.empty())
+        put_in_event_queue(event_queue, ProgressEvent("unregistered", 5, 10))
+        self.assertEqual("unregistered", event_queue.get().events[0].specification_id)
+        self.assertEqual((5, 10), ProgressTableReader("test").read()["a"][:2])
+
+    def test_runner_publishes_progress(self):
+        specifications = [{"seed": i} for i in range(4)]
+        experiment = SteppingExperiment()
+        ExperimentRunner().run("test", specifications, experiment, specification_runner=MultiprocessingRunner(2),
+                               use_dashboard=True)
+        read = ProgressTableReader("test").read()
+        for specification in specifications:
+            self.assertEqual((19, 20), read[experiment.get_name(specification)][:2])
+        with open(get_dashboard_event_log_file("test"), "rb") as f:
+            records, _ = EventLogReader().read(f.read())
+        self.assertNotIn(PROGRESS, [record[0] for record in records])
+        self.assertEqual(4, [record[0] for record in records].count(COMPLETE))
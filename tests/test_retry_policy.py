@@ -0,0 +1,111 @@
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.checkpointed_experiment import CheckpointedExperiment
+from smallab.experiment_types.experiment import Experiment
+from smallab.file_locations import get_experiment_local_storage
+from smallab.name_helper.dict import dict2name
+from smallab.retry_policy import RetryPolicy
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.main_process_runner import MainRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+def count(experiment, counter_name):
+    """
+    Counts calls across processes with a file in the experiment local storage
+    :return: How many times this has been called before
+    """
+    location = os.path.join(experiment.get_experiment_local_storage(), counter_name)
+    with open(location, "a+") as f:
+        f.seek(0)
+        calls = len(f.read())
+        f.write("x")
+    return calls
+
+
+class FlakyExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        if count(self, dict2name(specification)) < specification["failures"]:
+            raise {"OSError": OSError, "ValueError": ValueError}[specification["exception"]]("Flaky")
+        return {"seed": specification["seed"]}
+
+    def get_name(self, specification):
+        return dict2name({"seed": specification["seed"]})
+
+
+class FlakyCheckpointedExperiment(CheckpointedExperiment):
+    def initialize(self, specification: Specification):
+        count(self, "initialize")
+        self.j = 0
+
+    def step(self):
+        self.j += 1
+        if self.j == 3 and count(self, "failures") == 0:
+            raise OSError("Flaky")
+        if self.j < 5:
+            return self.j, 5
+        return {"j": self.j}
+
+    def max_iterations(self, specification):
+        return 5
+
+    def get_current_name(self, specification):
+        return dict2name(specification)
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class TestRetryPolicy(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_policy(self):
+        retry_policy = RetryPolicy(max_attempts=3, backoff=1, backoff_multiplier=2, max_backoff=3,
+                                   retry_on=(OSError,), dont_retry_on=(FileNotFoundError,))
+        self.assertTrue(retry_policy.should_retry(OSError(), 1))
+        self.assertFalse(retry_policy.should_retry(OSError(), 3))
+        self.assertFalse(retry_policy.should_retry(ValueError(), 1))
+        self.assertFalse(retry_policy.should_retry(FileNotFoundError(), 1))
+        self.assertEqual([1, 2, 3], [retry_policy.get_delay(attempts) for attempts in [1, 2, 3]])
+
+    def _run(self, specification_runner, specifications, experiment=None):
+        runner = ExperimentRunner()
+        runner.run("test", specifications, experiment if experiment is not None else FlakyExperiment(),
+                   specification_runner=specification_runner, use_dashboard=False)
+        return specification_runner
+
+    def test_retries_in_multiprocessing_runner(self):
+        specifications = [{"seed": 0, "failures": 2, "exception": "OSError"},
+                          {"seed": 1, "failures": 5, "exception": "OSError"},
+                          {"seed": 2, "failures": 1, "exception": "ValueError"}]
+        specification_runner = self._run(MultiprocessingRunner(
+            2, retry_policy=RetryPolicy(max_attempts=3, backoff=0.1, retry_on=(OSError,))), specifications)
+        self.assertEqual([specifications[0]], specification_runner.get_completed())
+        self.assertEqual(specifications[1:], specification_runner.get_failed_specifications())
+        self.assertEqual(1, len(list(experiment_iterator("test"))))
+
+    def test_retries_in_main_runner(self):
+        specifications = [{"seed": 0, "failures": 2, "exception": "OSError"}]
+        specification_runner = self._run(MainRunner(show_progress=False,
+                                                    retry_policy=RetryPolicy(max_attempts=3, backoff=0)),
+                                         specifications)
+        self.assertEqual(specifications, specification_runner.get_completed())
+
+    def test_checkpointed_retry_resumes(self):
+        specification_runner = self._run(MultiprocessingRunner(1, retry_policy=RetryPolicy(backoff=0)),
+                                         [{"seed": 0}], FlakyCheckpointedExperiment())
+        self.assertEqual(1, len(specification_runner.get_completed()))
+        results = list(experiment_iterator("test"))
+        self.assertEqual(5, results[0]["result"]["j"])
+        with open(os.path.join(get_experiment_local_storage("test"), "initialize")) as f:
+            self.assertEqual(1, len(f.read()))
@@ -0,0 +1,112 @@
+import typing
+import unittest
+import uuid
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.main_process_runner import MainRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.runner_implementations.worker_pool import WorkerPool, get_worker_cache
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class SetupExperiment(Experiment):
+    def setup_worker(self):
+        return {"pid": os.getpid(), "token": str(uuid.uuid4())}
+
+    def main(self, specification: Specification) -> typing.Dict:
+        return self.get_worker_data()
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class DatasetSetupExperiment(SetupExperiment):
+    def __init__(self, dataset):
+        self.dataset = dataset
+
+    def setup_worker(self):
+        return {"pid": os.getpid(), "token": str(uuid.uuid4()), "dataset": self.dataset}
+
+
+class KeyedDatasetSetupExperiment(DatasetSetupExperiment):
+    def get_worker_setup_key(self):
+        return type(self), self.dataset
+
+
+class FailingSetupExperiment(SetupExperiment):
+    def setup_worker(self):
+        raise Exception("Dataset missing")
+
+
+class TestSetupWorker(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_setup_once_per_worker(self):
+        runner = ExperimentRunner()
+        runner.run("test", [{"seed": i} for i in range(8)], SetupExperiment(),
+                   specification_runner=MultiprocessingRunner(2), use_dashboard=False)
+        tokens_by_pid = dict()
+        results = list(experiment_iterator("test"))
+        self.assertEqual(8, len(results))
+        for result in results:
+            tokens_by_pid.setdefault(result["result"]["pid"], set()).add(result["result"]["token"])
+        self.assertLessEqual(len(tokens_by_pid), 2)
+        for tokens in tokens_by_pid.values():
+            self.assertEqual(1, len(tokens))
+
+    def test_failed_setup_fails_specification(self):
+        runner = ExperimentRunner()
+        specification_runner = MultiprocessingRunner(2)
+        runner.run("test", [{"seed": i} for i in range(2)], FailingSetupExperiment(),
+                   specification_runner=specification_runner, use_dashboard=False)
+        self.assertEqual(2, len(specification_runner.get_failed_specifications()))
+
+    def _tokens(self, name="test"):
+        return {result["result"]["token"] for result in experiment_iterator(name)}
+
+    def test_setup_per_instance(self):
+        runner = ExperimentRunner()
+        with WorkerPool(1) as worker_pool:
+            for dataset in ["a", "b"]:
+                runner.run("test", [{"dataset": dataset}], DatasetSetupExperiment(dataset),
+                           specification_runner=MultiprocessingRunner(), use_dashboard=False,
+                           worker_pool=worker_pool)
+        results = {result["result"]["dataset"]: result["result"]["token"] for result in experiment_iterator("test")}
+        self.assertEqual({"a", "b"}, set(results.keys()))
+        self.assertNotEqual(results["a"], results["b"])
+
+    def test_setup_reused_by_persistent_pool(self):
+        runner = ExperimentRunner()
+        experiment = DatasetSetupExperiment("a")
+        with WorkerPool(1) as worker_pool:
+            for seed in range(2):
+                runner.run("test", [{"seed": seed}], experiment, specification_runner=MultiprocessingRunner(),
+                           use_dashboard=False, worker_pool=worker_pool)
+        self.assertEqual(1, len(self._tokens()))
+
+    def test_setup_shared_by_key(self):
+        runner = ExperimentRunner()
+        with WorkerPool(1) as worker_pool:
+            for seed in range(2):
+                runner.run("test", [{"seed": seed}], KeyedDatasetSetupExperiment("a"),
+                           specification_runner=MultiprocessingRunner(), use_dashboard=False,
+                           worker_pool=worker_pool)
+        self.assertEqual(1, len(self._tokens()))
+
+    def test_setup_cleared_after_main_process_run(self):
+        runner = ExperimentRunner()
+        for seed in range(2):
+            runner.run("test", [{"seed": seed}], SetupExperiment(), specification_runner=MainRunner(),
+                       use_dashboard=False)
+            self.assertEqual([], [key for key in get_worker_cache() if key[0] == "setup_worker"])
+        self.assertEqual(2, len(self._tokens()))
@@ -0,0 +1,109 @@
+import typing
+import unittest
+
+import dill
+import numpy as np
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.abstract_runner import SimpleAbstractRunner
+from smallab.runner_implementations.main_process_runner import MainRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.runner_implementations.worker_pool import WorkerPool
+from smallab import shared_arrays
+from smallab.shared_arrays import SharedArrayRegistry
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class SumExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        array = self.get_shared_array("data")
+        return {"sum": float(array[specification["row"]].sum()), "writeable": bool(array.flags.writeable)}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+def count_attached():
+    return len(shared_arrays._attached)
+
+
+class PayloadSizeRunner(SimpleAbstractRunner):
+    """
+    Records how big the function sent to workers for each specification is, then runs nothing
+    """
+
+    def run(self, specifications_to_run, run_and_save_fn):
+        self.payload_size = len(dill.dumps(run_and_save_fn))
+        self.finish([], [], [])
+
+
+class TestSharedArrays(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def _run(self, backend, specification_runner):
+        data = np.arange(12, dtype=np.float64).reshape(3, 4)
+        runner = ExperimentRunner()
+        runner.shared_arrays.publish("data", data, backend=backend)
+        runner.run("test", [{"row": i} for i in range(3)], SumExperiment(),
+                   specification_runner=specification_runner, use_dashboard=False)
+        results = sorted(experiment_iterator("test"), key=lambda result: result["specification"]["row"])
+        self.assertEqual([6.0, 22.0, 38.0], [result["result"]["sum"] for result in results])
+        for result in results:
+            self.assertFalse(result["result"]["writeable"])
+        self.assertEqual(dict(), runner.shared_arrays.descriptors)
+
+    def test_shared_memory(self):
+        self._run("shared_memory", MultiprocessingRunner(2))
+
+    def test_memmap(self):
+        self._run("memmap", MultiprocessingRunner(2))
+        self.assertEqual([], os.listdir(os.path.join("experiment_runs", "test", "tmp", "shared_arrays")))
+
+    def test_main_process(self):
+        self._run("shared_memory", MainRunner())
+
+    def test_close_unlinks(self):
+        registry = SharedArrayRegistry()
+        registry.publish("data", np.ones(5))
+        descriptor = registry.open("test")["data"]
+        self.assertEqual(5.0, descriptor.attach().sum())
+        registry.close()
+        from multiprocessing import shared_memory
+        with self.assertRaises(FileNotFoundError):
+            shared_memory.SharedMemory(name=descriptor.location)
+
+    def test_object_arrays_are_rejected(self):
+        with self.assertRaises(ValueError):
+            SharedArrayRegistry().publish("data", np.array([object()]))
+
+    def test_task_payload_does_not_grow_with_the_array(self):
+        payload_sizes = []
+        for size in (10, 1000000):
+            runner = ExperimentRunner()
+            runner.shared_arrays.publish("data", np.ones(size))
+            specification_runner = PayloadSizeRunner()
+            runner.run("test", [{"row": 0}], SumExperiment(), specification_runner=specification_runner,
+                       use_dashboard=False)
+            payload_sizes.append(specification_runner.payload_size)
+        self.assertLess(payload_sizes[1], payload_sizes[0] + 1000)
+
+    def test_workers_of_a_pool_let_go_of_arrays(self):
+        for backend in ["shared_memory", "memmap"]:
+            runner = ExperimentRunner()
+            runner.shared_arrays.publish("data", np.ones((3, 4)), backend=backend)
+            with WorkerPool(2) as worker_pool:
+                runner.run("test", [{"row": i} for i in range(3)], SumExperiment(),
+                           specification_runner=MultiprocessingRunner(), use_dashboard=False,
+                           worker_pool=worker_pool)
+                self.assertEqual(3, len(list(experiment_iterator("test"))))
+                self.assertEqual([0, 0], [worker_pool.get_pool().apply_async(count_attached).get(10)
+                                          for _ in range(2)])
@@ -0,0 +1,53 @@
+import unittest
+
+from smallab.specification_generator import MultiComputerGenerator, SpecificationGenerator
+
+
+class TestMultiComputerGenerator(unittest.TestCase):
+    generation_specification = {"a": list(range(10)), "b": list(range(10)), "c": "constant"}
+
+    def _shards(self, number_of_computers, generation_specification=None, **kwargs):
+        if generation_specification is None:
+            generation_specification = self.generation_specification
+        return [MultiComputerGenerator(computer_number, number_of_computers, **kwargs).generate(
+            generation_specification) for computer_number in range(number_of_computers)]
+
+    def _owners(self, shards):
+        return {tuple(sorted(specification.items())): computer_number
+                for computer_number, shard in enumerate(shards) for specification in shard}
+
+    def assertPartition(self, shards):
+        all_specifications = SpecificationGenerator().generate(self.generation_specification)
+        self.assertEqual(len(all_specifications), sum(len(shard) for shard in shards))
+        self.assertEqual(len(all_specifications), len(self._owners(shards)))
+
+    def test_index(self):
+        shards = self._shards(3)
+        self.assertPartition(shards)
+        self.assertEqual(shards[1], SpecificationGenerator().generate(self.generation_specification)[1::3])
+
+    def test_hash_is_stable_when_values_are_added(self):
+        shards = self._shards(4, strategy="hash")
+        self.assertPartition(shards)
+        for shard in shards:
+            self.assertGreater(len(shard), 10)
+        owners = self._owners(shards)
+        grown = dict(self.generation_specification, a=list(range(11)))
+        for specification, computer_number in self._owners(self._shards(4, grown, strategy="hash")).items():
+            if specification in owners:
+                self.assertEqual(owners[specification], computer_number)
+
+    def test_hash_moves_few_when_computers_are_added(self):
+        owners = self._owners(self._shards(4, strategy="hash"))
+        new_owners = self._owners(self._shards(5, strategy="hash"))
+        moved = [specification for specification in owners if owners[specification] != new_owners[specification]]
+        # Only specifications which move to the new computer change owner
+        self.assertTrue(all(new_owners[specification] == 4 for specification in moved))
+        self.assertLess(len(moved), 40)
+
+    def test_cost_balances_load(self):
+        cost_fn = lambda specification: specification["a"] ** 2 + 1
+        shards = self._shards(3, strategy="cost", cost_fn=cost_fn)
+        self.assertPartition(shards)
+        loads = [sum(map(cost_fn, shard)) for shard in shards]
+        self.assertLessEqual(max(loads) - min(loads), 82)
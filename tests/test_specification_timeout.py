@@ -0,0 +1,96 @@
+import time
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.checkpointed_experiment import CheckpointedExperiment
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner, \
+    SpecificationTimeoutException
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class HangingExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        if specification["hang"]:
+            time.sleep(600)
+        return {"seed": specification["seed"]}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class HangingExperimentWithTimeout(HangingExperiment):
+    def get_specification_timeout(self, specification):
+        return 1 if specification["hang"] else None
+
+
+class StragglingExperiment(CheckpointedExperiment):
+    """
+    The first copy to reach the second step hangs, any other copy finishes
+    """
+
+    def initialize(self, specification: Specification):
+        self.j = 0
+
+    def step(self):
+        self.j += 1
+        if self.j == 1:
+            return 1, 2
+        try:
+            os.close(os.open(os.path.join(self.get_experiment_local_storage(), "straggler"),
+                             os.O_CREAT | os.O_EXCL))
+            time.sleep(600)
+        except FileExistsError:
+            pass
+        return {"pid": os.getpid()}
+
+    def max_iterations(self, specification):
+        return 2
+
+    def get_current_name(self, specification):
+        return dict2name(specification)
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class TestSpecificationTimeout(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def _run_hanging(self, experiment, specification_runner):
+        runner = ExperimentRunner()
+        specifications = [{"seed": i, "hang": i == 0} for i in range(3)]
+        start = time.time()
+        runner.run("test", specifications, experiment, specification_runner=specification_runner,
+                   use_dashboard=False)
+        self.assertLess(time.time() - start, 60)
+        self.assertEqual(2, len(specification_runner.get_completed()))
+        self.assertEqual([specifications[0]], specification_runner.get_failed_specifications())
+        self.assertIsInstance(specification_runner.get_exceptions()[0], SpecificationTimeoutException)
+        self.assertEqual(2, len(list(experiment_iterator("test"))))
+
+    def test_runner_timeout(self):
+        self._run_hanging(HangingExperiment(), MultiprocessingRunner(2, specification_timeout=1))
+
+    def test_experiment_timeout(self):
+        self._run_hanging(HangingExperimentWithTimeout(), MultiprocessingRunner(2))
+
+    def test_speculative_execution(self):
+        runner = ExperimentRunner()
+        specification_runner = MultiprocessingRunner(2, speculative_execution=True)
+        start = time.time()
+        runner.run("test", [{"seed": 0}], StragglingExperiment(), specification_runner=specification_runner,
+                   use_dashboard=False)
+        self.assertLess(time.time() - start, 60)
+        self.assertEqual(1, len(specification_runner.get_completed()))
+        self.assertEqual(1, len(list(experiment_iterator("test"))))
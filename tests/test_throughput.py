@@ -0,0 +1,49 @@
+import os
+import unittest
+
+from examples.example_utils import delete_experiments_folder
+from smallab.dashboard.dashboard_state import DashboardState
+from smallab.dashboard.throughput import ThroughputRecorder, load_throughput
+from smallab.file_locations import get_dashboard_file
+
+
+class TestThroughput(unittest.TestCase):
+    def setUp(self) -> None:
+        os.makedirs(os.path.dirname(get_dashboard_file("test")), exist_ok=True)
+
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def _append(self, text):
+        with open(get_dashboard_file("test"), "a") as f:
+            f.write(text)
+
+    def test_samples_throughput_across_runs(self):
+        state = DashboardState("test")
+        recorder = ThroughputRecorder("test", interval=60.0)
+        self._append("START,test,100.0\nREGISTER,a\nREGISTER,b\nBEGIN,a\nBEGIN,b\nPROGRESS,a,0,10\n")
+        state.update()
+        self.assertIsNone(recorder.sample(state, now=1000.0))
+        self._append("PROGRESS,a,10,10\nCOMPLETE,a\n")
+        state.update()
+        self.assertIsNone(recorder.sample(state, now=1030.0))
+        sample = recorder.sample(state, now=1100.0)
+        self.assertAlmostEqual(36.0, sample["specifications_per_hour"])
+        self.assertAlmostEqual(0.1, sample["iterations_per_second"])
+        self.assertEqual(1, sample["active"])
+        self.assertAlmostEqual(0.5, sample["utilization"])
+
+        # A new run is measured from its own start
+        os.remove(get_dashboard_file("test"))
+        self._append("START,test,200.0\nREGISTER,c\nBEGIN,c\n")
+        state.update()
+        self.assertIsNone(recorder.sample(state, now=1200.0))
+        self._append("COMPLETE,c\n")
+        state.update()
+        recorder.sample(state, now=1300.0)
+        samples = load_throughput("test")
+        self.assertEqual([100.0, 200.0], [sample["run_start_time"] for sample in samples])
+        self.assertAlmostEqual(36.0, samples[1]["specifications_per_hour"])
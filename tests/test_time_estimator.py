@@ -0,0 +1,123 @@
+import time
+import unittest
+
+from examples.example_utils import delete_experiments_folder
+from smallab.dashboard.time_estimator import TimeEstimator, CostModel
+
+
+class TestCostModel(unittest.TestCase):
+    def test_learns_the_cost_of_values(self):
+        model = CostModel()
+        for _ in range(10):
+            model.add({"size": "small", "seed": "1"}, 1.0)
+            model.add({"size": "large", "seed": "1"}, 8.0)
+        model.fit()
+        small, _ = model.predict({"size": "small"})
+        large, _ = model.predict({"size": "large"})
+        self.assertLess(small, 2.0)
+        self.assertGreater(large, 4.0)
+
+    def test_drops_keys_with_many_values(self):
+        model = CostModel(max_values_per_key=3)
+        for seed in range(10):
+            model.add({"size": "small", "seed": str(seed)}, 1.0)
+        self.assertIn("seed", model.ignored_keys)
+        self.assertEqual(2, len(model.xty))
+        model.fit()
+        mean, standard_deviation = model.predict({"size": "small", "seed": "100"})
+        self.assertAlmostEqual(1.0, mean)
+        self.assertAlmostEqual(0.0, standard_deviation)
+
+    def test_drops_keys_between_other_keys(self):
+        model = CostModel(max_values_per_key=3)
+        for seed in range(10):
+            model.add({"seed": str(seed), "size": str(seed % 2), "rate": "0.1"}, 1.0 + seed % 2)
+        model.fit()
+        self.assertEqual({"seed"}, model.ignored_keys)
+        self.assertLess(model.predict({"size": "0", "rate": "0.1"})[0], model.predict({"size": "1", "rate": "0.1"})[0])
+
+
+class TestTimeEstimator(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def _complete(self, time_estimator, specification_id, seconds):
+        time_estimator.record_start(specification_id, 1000.0)
+        time_estimator.record_completion(specification_id, 1000.0 + seconds)
+
+    def test_spreads_remaining_work_over_workers(self):
+        time_estimator = TimeEstimator(parallelism=4)
+        self._complete(time_estimator, "done", 10.0)
+        expected, lower, upper = time_estimator.compute_time_stats(dict(), [], ["a", "b", "c", "d", "e", "f", "g", "h"])
+        self.assertAlmostEqual(20.0, expected)
+        self.assertEqual(expected, lower)
+        self.assertEqual(expected, upper)
+
+    def test_estimates_registered_and_unregistered_specifications(self):
+        time_estimator = TimeEstimator(parallelism=1)
+        time_estimator.update_specification_ids({"done small": {"size": "small"}, "done large": {"size": "large"},
+                                                 "small": {"size": "small"}, "large": {"size": "large"},
+                                                 "started": {"size": "large"}})
+        for _ in range(10):
+            self._complete(time_estimator, "done small", 1.0)
+            self._complete(time_estimator, "done large", 8.0)
+        time_estimator.record_start("started", time.time() - 2.0)
+        expected, _, _ = time_estimator.compute_time_stats({"progress": (1, 4)}, ["started", "progress"],
+                                                           ["small", "large", "unknown"])
+        model = time_estimator.completion_model
+        started = model.predict({"size": "large"})[0] - 2.0
+        without_values = model.predict(dict())[0]
+        total = model.predict({"size": "small"})[0] + model.predict({"size": "large"})[0] + started + \
+                without_values * 3 / 4 + without_values
+        self.assertAlmostEqual(total, expected, places=2)
+
+    def test_estimate_follows_fits_made_by_find_stragglers(self):
+        time_estimator = TimeEstimator(parallelism=1, refit_interval=0.5)
+        self._complete(time_estimator, "a", 10.0)
+        expected, _, _ = time_estimator.compute_time_stats(dict(), [], ["b"])
+        self.assertAlmostEqual(10.0, expected)
+        self._complete(time_estimator, "c", 40.0)
+        time.sleep(0.6)
+        # Takes the refit which was due
+        time_estimator.find_stragglers([])
+        expected, _, _ = time_estimator.compute_time_stats(dict(), [], ["b"])
+        self.assertGreater(expected, 15.0)
+
+    def test_ignores_events_it_was_already_told(self):
+        time_estimator = TimeEstimator()
+        time_estimator.record_start("a", 1000.0)
+        time_estimator.record_iteration("a", 2, 1002.0)
+        time_estimator.record_completion("a", 1003.0)
+        time_estimator.record_start("a", 1000.0)
+        time_estimator.record_iteration("a", 2, 1002.0)
+        time_estimator.record_completion("a", 1003.0)
+        self.assertEqual(1, time_estimator.iteration_model.observations)
+        self.assertEqual(1, time_estimator.completion_model.observations)
+
+    def test_history_is_used_by_the_next_run(self):
+        time_estimator = TimeEstimator("test")
+        time_estimator.update_specification_ids({"a": {"size": "large"}})
+        self._complete(time_estimator, "a", 30.0)
+        time_estimator.save()
+
+        time_estimator = TimeEstimator("test")
+        time_estimator.update_specification_ids({"b": {"size": "large"}})
+        expected, _, _ = time_estimator.compute_time_stats(dict(), ["b"], [])
+        self.assertAlmostEqual(30.0, expected)
+
+    def test_finds_stragglers(self):
+        time_estimator = TimeEstimator()
+        for i in range(30):
+            time_estimator.record_start(str(i), 1090.0)
+            time_estimator.record_iteration(str(i), 10, 1090.0 + 10 * (0.9 + i / 150))
+        time_estimator.record_start("slow", 1000.0)
+        time_estimator.record_iteration("slow", 10, 1100.0)
+        time_estimator.record_start("stalled", 1000.0)
+        time_estimator.record_iteration("stalled", 10, 1010.0)
+        stragglers = time_estimator.find_stragglers(["0", "1", "slow", "stalled"], now=1110.0)
+        self.assertEqual({"slow", "stalled"}, set(stragglers))
+        self.assertEqual("slow", stragglers["slow"][0])
+        self.assertEqual("stalled", stragglers["stalled"][0])
@@ -0,0 +1,78 @@
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.fixed_resource.weighted import WeightedResourceAllocatorRunner, \
+    ResourceCapacity
+from smallab.smallab_types import Specification
+from smallab.specification_generator import SpecificationGenerator
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class ResourceExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        return {"resource": self.resource}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+    def get_resource_requirements(self, specification):
+        return {"cores": specification["cores"], "gpus": specification["gpus"]}
+
+
+class TestResourceCapacity(unittest.TestCase):
+    def test_allocate_and_release(self):
+        capacity = ResourceCapacity({"cores": 8, "gpus": [0, 1]})
+        self.assertTrue(capacity.fits({"cores": 8, "gpus": 2}))
+        allocation = capacity.allocate({"cores": 6, "gpus": 1})
+        self.assertEqual({"cores": 6, "gpus": [0]}, allocation)
+        self.assertFalse(capacity.fits({"cores": 4}))
+        self.assertTrue(capacity.fits({"cores": 2, "gpus": 1}))
+        capacity.release(allocation)
+        self.assertTrue(capacity.fits({"cores": 8, "gpus": 2}))
+
+    def test_could_ever_fit(self):
+        capacity = ResourceCapacity({"cores": 8, "gpus": [0, 1]})
+        self.assertFalse(capacity.could_ever_fit({"cores": 9}))
+        self.assertFalse(capacity.could_ever_fit({"licenses": 1}))
+        self.assertTrue(capacity.could_ever_fit({}))
+
+    def test_missing_dimension_of_zero(self):
+        capacity = ResourceCapacity({"cores": 8})
+        self.assertTrue(capacity.could_ever_fit({"cores": 2, "gpus": 0}))
+        self.assertTrue(capacity.fits({"cores": 2, "gpus": 0}))
+        self.assertEqual({"cores": 2}, capacity.allocate({"cores": 2, "gpus": 0}))
+
+    def test_fractional_items(self):
+        capacity = ResourceCapacity({"cores": 8, "gpus": [0, 1]})
+        self.assertTrue(capacity.fits({"cores": 0.5, "gpus": 1.0}))
+        self.assertFalse(capacity.could_ever_fit({"gpus": 0.5}))
+        self.assertFalse(capacity.fits({"gpus": 1.5}))
+
+
+class TestWeightedResourceAllocator(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def testmain(self):
+        specifications = SpecificationGenerator().generate({"seed": [1, 2, 3], "cores": [1, 4], "gpus": [0, 1]})
+        specifications.append({"seed": 1, "cores": 100, "gpus": 0})
+        runner = ExperimentRunner()
+        specification_runner = WeightedResourceAllocatorRunner({"cores": 4, "gpus": [0, 1]}, max_parallel=2)
+        runner.run("test", specifications, ResourceExperiment(), specification_runner=specification_runner,
+                   use_dashboard=False)
+        self.assertEqual(12, len(specification_runner.get_completed()))
+        self.assertEqual([{"seed": 1, "cores": 100, "gpus": 0}], specification_runner.get_failed_specifications())
+        results = list(experiment_iterator("test"))
+        self.assertEqual(12, len(results))
+        for result in results:
+            self.assertEqual(result["specification"]["cores"], result["result"]["resource"]["cores"])
+            self.assertEqual(result["specification"]["gpus"], len(result["result"]["resource"]["gpus"]))
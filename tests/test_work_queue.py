@@ -0,0 +1,112 @@
+import multiprocessing
+import time
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.experiment import Experiment
+from smallab.file_locations import get_experiment_local_storage
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.work_queue import WorkQueueCoordinator, WorkQueueRunner, WorkQueue, \
+    connect_to_work_queue
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class SleepExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        if specification["seed"] == 3:
+            raise ValueError("Bad seed")
+        time.sleep(specification["sleep"])
+        return {"seed": specification["seed"]}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class CountedSleepExperiment(SleepExperiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        with open(os.path.join(self.get_experiment_local_storage(), "runs"), "a") as f:
+            f.write("{}\n".format(specification["seed"]))
+        return super().main(specification)
+
+
+def run_node(address, authkey, worker_id, experiment=None, **kwargs):
+    specification_runner = WorkQueueRunner(address, authkey, worker_id=worker_id, num_parallel=2, **kwargs)
+    experiment = experiment if experiment is not None else SleepExperiment()
+    ExperimentRunner().run("test", specification_runner.get_specifications(), experiment,
+                           specification_runner=specification_runner, use_dashboard=False)
+
+
+class TestWorkQueue(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_lease_timeout(self):
+        work_queue = WorkQueue([{"seed": 0}, {"seed": 1}], lease_timeout=0)
+        self.assertEqual(0, work_queue.next_specification("a")[0])
+        time.sleep(0.01)
+        # The first lease ran out so it is handed out again after the second
+        self.assertEqual(1, work_queue.next_specification("b")[0])
+        self.assertEqual(0, work_queue.next_specification("b")[0])
+        work_queue.complete(0)
+        work_queue.fail(1, "ValueError: Bad")
+        self.assertTrue(work_queue.is_finished())
+        self.assertEqual([({"seed": 1}, "ValueError: Bad")], work_queue.get_manifest()["failed"])
+
+    def test_nodes_pull_work(self):
+        specifications = [{"seed": i, "sleep": 0.3 if i % 2 == 0 else 0.05} for i in range(12)]
+        with WorkQueueCoordinator(specifications) as coordinator:
+            ctx = multiprocessing.get_context("fork")
+            nodes = [ctx.Process(target=run_node,
+                                 args=(coordinator.get_address(), coordinator.get_authkey(), "node-{}".format(i)))
+                     for i in range(2)]
+            for node in nodes:
+                node.start()
+            for node in nodes:
+                node.join(60)
+                self.assertEqual(0, node.exitcode)
+            work_queue = coordinator.get_work_queue()
+            self.assertTrue(work_queue.is_finished())
+            manifest = work_queue.get_manifest()
+        self.assertEqual(11, len(manifest["completed"]))
+        self.assertEqual([(specifications[3], "ValueError: Bad seed")], manifest["failed"])
+        results = [result["result"]["seed"] for result in experiment_iterator("test")]
+        self.assertEqual(sorted(set(range(12)) - {3}), sorted(results))
+
+    def test_abandoned_lease_is_run(self):
+        specifications = [{"seed": i, "sleep": 0.05} for i in range(3)]
+        with WorkQueueCoordinator(specifications, lease_timeout=1) as coordinator:
+            # A node which takes a specification and dies without finishing it
+            self.assertEqual(0, connect_to_work_queue(coordinator.get_address(), coordinator.get_authkey())
+                             .next_specification("dead-node")[0])
+            run_node(coordinator.get_address(), coordinator.get_authkey(), "node", wait_interval=0.2)
+            work_queue = coordinator.get_work_queue()
+            self.assertTrue(work_queue.is_finished())
+            manifest = work_queue.get_manifest()
+        self.assertEqual([specifications[0], specifications[1], specifications[2]], manifest["completed"])
+        results = [result["result"]["seed"] for result in experiment_iterator("test")]
+        self.assertEqual([0, 1, 2], sorted(results))
+
+    def test_leases_are_renewed(self):
+        specifications = [{"seed": 0, "sleep": 3}, {"seed": 1, "sleep": 0.05}]
+        with WorkQueueCoordinator(specifications, lease_timeout=1) as coordinator:
+            run_node(coordinator.get_address(), coordinator.get_authkey(), "node", CountedSleepExperiment(),
+                     wait_interval=0.2)
+            self.assertTrue(coordinator.get_work_queue().is_finished())
+        runs_location = os.path.join(get_experiment_local_storage("test"), "runs")
+        with open(runs_location) as f:
+            self.assertEqual(["0", "1"], sorted(f.read().split()))
+
+    def test_wrong_authkey_is_refused(self):
+        with WorkQueueCoordinator([{"seed": 0}]) as coordinator:
+            self.assertEqual(32, len(coordinator.get_authkey()))
+            self.assertNotEqual(coordinator.get_authkey(), WorkQueueCoordinator([]).get_authkey())
+            with self.assertRaises(multiprocessing.AuthenticationError):
+                connect_to_work_queue(coordinator.get_address(), b"smallab")
@@ -0,0 +1,52 @@
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.runner_implementations.worker_pool import WorkerPool, get_worker_cache
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class PidExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        cache = get_worker_cache()
+        cache["calls"] = cache.get("calls", 0) + 1
+        return {"pid": os.getpid(), "calls": cache["calls"]}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class TestWorkerPool(unittest.TestCase):
+    def tearDown(self) -> None:
+        for name in ["test", "test2"]:
+            try:
+                delete_experiments_folder(name)
+            except FileNotFoundError:
+                pass
+
+    def test_workers_are_reused_across_runs(self):
+        runner = ExperimentRunner()
+        with WorkerPool(2) as worker_pool:
+            runner.run("test", [{"seed": i} for i in range(4)], PidExperiment(),
+                       specification_runner=MultiprocessingRunner(), use_dashboard=False, worker_pool=worker_pool)
+            runner.run("test2", [{"seed": i} for i in range(4)], PidExperiment(),
+                       specification_runner=MultiprocessingRunner(), use_dashboard=False, worker_pool=worker_pool)
+            first_pids = set(result["result"]["pid"] for result in experiment_iterator("test"))
+            second_results = list(experiment_iterator("test2"))
+            self.assertEqual(4, len(second_results))
+            calls_by_pid = dict()
+            for result in list(experiment_iterator("test")) + second_results:
+                self.assertIn(result["result"]["pid"], first_pids)
+                calls_by_pid.setdefault(result["result"]["pid"], []).append(result["result"]["calls"])
+            # The cache carried over, so each worker counted up through both runs without restarting
+            for calls in calls_by_pid.values():
+                self.assertEqual(list(range(1, len(calls) + 1)), sorted(calls))
+        self.assertIsNone(worker_pool.pool)
+        self.assertIsNone(worker_pool.manager)
@@ -0,0 +1,60 @@
+import time
+import typing
+import unittest
+
+import os
+
+from examples.example_utils import delete_experiments_folder
+from smallab.experiment_types.experiment import Experiment
+from smallab.name_helper.dict import dict2name
+from smallab.runner.runner import ExperimentRunner
+from smallab.runner_implementations.multiprocessing_runner import MultiprocessingRunner
+from smallab.runner_implementations.worker_pool import get_process_memory, get_available_memory
+from smallab.smallab_types import Specification
+from smallab.utilities.experiment_loading.experiment_loader import experiment_iterator
+
+
+class PidExperiment(Experiment):
+    def main(self, specification: Specification) -> typing.Dict:
+        start = time.time()
+        time.sleep(0.1)
+        return {"pid": os.getpid(), "start": start, "end": time.time()}
+
+    def get_name(self, specification):
+        return dict2name(specification)
+
+
+class TestWorkerRecycling(unittest.TestCase):
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def _run(self, specification_runner):
+        runner = ExperimentRunner()
+        runner.run("test", [{"seed": i} for i in range(6)], PidExperiment(),
+                   specification_runner=specification_runner, use_dashboard=False)
+        self.assertEqual(6, len(specification_runner.get_completed()))
+        results = [result["result"] for result in experiment_iterator("test")]
+        self.assertEqual(6, len(results))
+        return results
+
+    def test_recycle_after_tasks(self):
+        results = self._run(MultiprocessingRunner(2, max_tasks_per_worker=1))
+        self.assertEqual(6, len(set(result["pid"] for result in results)))
+
+    def test_recycle_over_memory(self):
+        results = self._run(MultiprocessingRunner(2, max_worker_memory=1))
+        self.assertEqual(6, len(set(result["pid"] for result in results)))
+
+    def test_admission_control_runs_one_at_a_time_when_memory_is_low(self):
+        results = self._run(MultiprocessingRunner(3, min_available_memory=2 ** 62))
+        results.sort(key=lambda result: result["start"])
+        for previous, current in zip(results, results[1:]):
+            self.assertLessEqual(previous["end"], current["start"])
+
+    def test_memory_readings(self):
+        self.assertGreater(get_process_memory(), 0)
+        available_memory = get_available_memory()
+        self.assertTrue(available_memory is None or available_memory > 0)
@@ -0,0 +1,126 @@
+import multiprocessing
+import os
+import queue
+import time
+import unittest
+
+from examples.example_utils import delete_experiments_folder
+from smallab.dashboard.dashboard import write_dashboard, stop_dashboard_writer, EventLogDashboardWriter
+from smallab.dashboard.dashboard_events import BeginEvent, CompleteEvent, RegisterEvent, ProgressEvent, \
+    StartExperimentEvent
+from smallab.dashboard.dashboard_state import DashboardState
+from smallab.dashboard.utils import BufferedEventQueue, put_in_event_queue
+from smallab.file_locations import get_dashboard_file, get_dashboard_event_log_file
+
+
+class TestWriteDashboard(unittest.TestCase):
+    def _start(self, **kwargs):
+        ctx = multiprocessing.get_context("fork")
+        self.event_queue = BufferedEventQueue(ctx.Queue())
+        kwargs["flush_interval"] = 0.1
+        self.dashboard_process = ctx.Process(target=write_dashboard, args=(self.event_queue, "test"), kwargs=kwargs)
+        self.dashboard_process.start()
+
+    def tearDown(self) -> None:
+        if self.dashboard_process is not None and self.dashboard_process.is_alive():
+            self.dashboard_process.terminate()
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def setUp(self) -> None:
+        self.dashboard_process = None
+
+    def _put_batch(self):
+        put_in_event_queue(self.event_queue, StartExperimentEvent("test"))
+        for i in range(100):
+            put_in_event_queue(self.event_queue, RegisterEvent(str(i), {"i": i}))
+        put_in_event_queue(self.event_queue, BeginEvent("0"))
+        put_in_event_queue(self.event_queue, CompleteEvent("0"))
+
+    def test_writes_everything_before_stopping(self):
+        self._start()
+        self._put_batch()
+        stop_dashboard_writer(self.event_queue, self.dashboard_process)
+        self.assertEqual(0, self.dashboard_process.exitcode)
+        state = DashboardState("test")
+        self.assertEqual(103, state.update())
+        self.assertEqual(99, len(state.registered))
+        self.assertEqual(["0"], list(state.complete))
+        self.assertFalse(os.path.exists(get_dashboard_file("test")))
+
+    def test_writes_csv(self):
+        self._start(event_format="csv")
+        self._put_batch()
+        stop_dashboard_writer(self.event_queue, self.dashboard_process)
+        with open(get_dashboard_file("test")) as f:
+            lines = f.read().splitlines()
+        self.assertEqual(103, len(lines))
+        self.assertEqual(["BEGIN,0", "COMPLETE,0"], lines[-2:])
+        state = DashboardState("test")
+        state.update()
+        self.assertEqual(["0"], list(state.complete))
+
+    def test_flushes_while_idle(self):
+        self._start()
+        put_in_event_queue(self.event_queue, BeginEvent("0"))
+        time.sleep(1)
+        state = DashboardState("test")
+        state.update()
+        self.assertEqual(["0"], list(state.active))
+        # Waiting on the queue rather than polling it
+        self.assertLess(self._cpu_seconds(), 0.5)
+        stop_dashboard_writer(self.event_queue, self.dashboard_process)
+
+    def _cpu_seconds(self):
+        with open("/proc/{}/stat".format(self.dashboard_process.pid)) as f:
+            fields = f.read().rsplit(")", 1)[1].split()
+        return (int(fields[11]) + int(fields[12])) / os.sysconf("SC_CLK_TCK")
+
+    def test_terminates_stuck_writer(self):
+        self._start()
+        full_queue = BufferedEventQueue(queue.Queue(maxsize=1))
+        full_queue.put(BeginEvent("0"))
+        stop_dashboard_writer(full_queue, self.dashboard_process, timeout=0.1)
+        self.assertFalse(self.dashboard_process.is_alive())
+
+
+class TestEventLog(unittest.TestCase):
+    def setUp(self) -> None:
+        os.makedirs(os.path.dirname(get_dashboard_event_log_file("test")), exist_ok=True)
+
+    def tearDown(self) -> None:
+        try:
+            delete_experiments_folder("test")
+        except FileNotFoundError:
+            pass
+
+    def test_compaction_keeps_state(self):
+        dashboard_writer = EventLogDashboardWriter("test", compact_after=50)
+        dashboard_writer.write_event(StartExperimentEvent("test"))
+        specification_ids = ["specification_with_a_long_name_{}".format(i) for i in range(10)]
+        for specification_id in specification_ids:
+            dashboard_writer.write_event(RegisterEvent(specification_id, dict()))
+        reader = DashboardState("test")
+        for specification_id in specification_ids[:5]:
+            dashboard_writer.write_event(BeginEvent(specification_id))
+            for progress in range(100):
+                dashboard_writer.write_event(ProgressEvent(specification_id, progress, 100))
+                dashboard_writer.flush()
+                reader.update()
+            dashboard_writer.write_event(CompleteEvent(specification_id))
+        dashboard_writer.write_dropped(7)
+        dashboard_writer.write_event(BeginEvent(specification_ids[5]))
+        dashboard_writer.close()
+        # Every progress record would take 24 bytes, the log only holds a snapshot and what followed it
+        self.assertLess(os.path.getsize(get_dashboard_event_log_file("test")), 24 * 100)
+
+        for state in (reader, DashboardState("test")):
+            state.update()
+            self.assertEqual(specification_ids[6:], list(state.registered))
+            self.assertEqual(specification_ids[5:6], list(state.active))
+            self.assertEqual(specification_ids[:5], list(state.complete))
+            self.assertEqual((99, 100), state.specification_progress[specification_ids[4]])
+            self.assertEqual(7, state.dropped)
+            self.assertEqual(dashboard_writer.state.start_time, state.start_time)